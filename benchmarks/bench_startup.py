@@ -0,0 +1,79 @@
+# command line startup time benchmark
+#
+#   python -m benchmarks.bench_startup --budget 0.5
+#
+# every command runs in a fresh interpreter, the fastest of --runs is kept
+# so the number reflects import cost rather than scheduler noise
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+COMMANDS = (
+    ("--version",),
+    ("--help",),
+    ("vendor", "--help"),
+)
+
+# modules that only the commands solving or downloading should import
+HEAVY_MODULES = ("conda_build", "conda_lock", "requests", "urllib3", "yaml", "ruamel")
+
+
+def measure_startup(args, runs=5) -> float:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-m", "conda_vendor", *args], check=True, stdout=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+# top level packages imported by `python -m conda_vendor --help`
+def imported_heavy_modules() -> list:
+    script = (
+        "import json, runpy, sys\n"
+        "sys.argv = ['conda-vendor', '--help']\n"
+        "try:\n"
+        "    runpy.run_module('conda_vendor', run_name='__main__')\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        f"print(json.dumps(sorted({{m.split('.')[0] for m in sys.modules}} & set({HEAVY_MODULES!r}))), file=sys.stderr)\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    return json.loads(result.stderr)
+
+
+def run_benchmarks(runs=5) -> dict:
+    # interpreter startup alone, for reference
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    baseline = time.perf_counter() - start
+    return {
+        "python": baseline,
+        "commands": {" ".join(args): measure_startup(args, runs) for args in COMMANDS},
+        "heavy_modules": imported_heavy_modules(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark conda-vendor command line startup time")
+    parser.add_argument("--runs", type=int, default=5, help="runs per command, the fastest is reported")
+    parser.add_argument("--budget", type=float, help="fail when a command takes longer than this many seconds")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.runs)
+    print(f"{'python -c pass':<26} {report['python']:8.3f}s")
+    for command, seconds in report["commands"].items():
+        print(f"{'conda-vendor ' + command:<26} {seconds:8.3f}s")
+    print(f"heavy modules imported by --help: {', '.join(report['heavy_modules']) or 'none'}")
+    if args.budget is not None:
+        over = [command for command, seconds in report["commands"].items() if seconds > args.budget]
+        if over or report["heavy_modules"]:
+            print(f"Startup over budget: {', '.join(over + report['heavy_modules'])}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+# end-to-end vendoring benchmark against a local synthetic channel
+#
+#   python -m benchmarks.bench_vendoring --entries 500000 --packages 600
+#
+# each phase runs in a fresh process so its peak RSS is measured on its own.
+# with --baseline the run fails when a phase is slower than the recorded one
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import queue
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.channel_server import CHANNEL_NAME, ChannelServer, build_synthetic_channel, with_base_url
+
+
+def _peak_rss_bytes():
+    # VmHWM belongs to the current address space, while ru_maxrss survives
+    # exec and would report the parent's peak in a freshly spawned process
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on linux and bytes on macos
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _run_phase(phase, fetch_actions, work_dir, base_url, jobs, results):
+    from conda_vendor.conda_vendor import download_solved_pkgs, hotfix_vendored_repodata_json, reconstruct_repodata_json
+
+    vendored = Path(work_dir) / phase
+    for subdir in {pkg["subdir"] for pkg in fetch_actions} | {"noarch"}:
+        (vendored / subdir).mkdir(parents=True, exist_ok=True)
+
+    # progress bars and banners are part of the real cost but not worth reading
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        if phase == "reconstruct_repodata_json":
+            reconstruct_repodata_json(f"{base_url}/{CHANNEL_NAME}/linux-64/repodata.json", vendored / "linux-64", fetch_actions)
+        elif phase == "hotfix_vendored_repodata_json":
+            hotfix_vendored_repodata_json(fetch_actions, vendored)
+        elif phase == "download_solved_pkgs":
+            download_solved_pkgs(fetch_actions, vendored, "linux-64", jobs=jobs)
+        else:
+            raise ValueError(f"Unknown benchmark phase {phase}")
+        wall_time = time.perf_counter() - start
+    results.put({"wall_time": wall_time, "peak_rss": _peak_rss_bytes()})
+
+
+# the result put on results by process, or None when it exited without one,
+# e.g. after an exception in the phase
+def _wait_for_result(process, results, poll_interval=1.0):
+    while True:
+        try:
+            return results.get(timeout=poll_interval)
+        except queue.Empty:
+            if not process.is_alive():
+                # the result may have arrived just before the process exited
+                try:
+                    return results.get(timeout=poll_interval)
+                except queue.Empty:
+                    return None
+
+
+PHASES = ("reconstruct_repodata_json", "hotfix_vendored_repodata_json", "download_solved_pkgs")
+
+
+def run_benchmarks(entries=100_000, packages=200, jobs=4, phases=PHASES, work_dir=None):
+    ctx = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp:
+        channel_root = Path(tmp) / "channel"
+        fetch_actions = build_synthetic_channel(channel_root, n_entries=entries, n_packages=packages)
+        report = {"entries": entries, "packages": packages, "jobs": jobs, "phases": {}}
+        with ChannelServer(channel_root) as server:
+            fetch_actions = with_base_url(fetch_actions, server.url)
+            for phase in phases:
+                server.reset_counters()
+                results = ctx.Queue()
+                process = ctx.Process(target=_run_phase, args=(phase, fetch_actions, tmp, server.url, jobs, results))
+                process.start()
+                result = _wait_for_result(process, results)
+                process.join()
+                if result is None or process.exitcode != 0:
+                    raise RuntimeError(f"Benchmark phase {phase} failed with exit code {process.exitcode}")
+                result["bytes"] = server.bytes_sent
+                result["bytes_per_sec"] = server.bytes_sent / result["wall_time"] if result["wall_time"] else 0
+                report["phases"][phase] = result
+    return report
+
+
+# phases slower than baseline * (1 + tolerance)
+def find_regressions(report, baseline, tolerance):
+    regressions = []
+    for phase, result in report["phases"].items():
+        previous = baseline.get("phases", {}).get(phase)
+        if previous and result["wall_time"] > previous["wall_time"] * (1 + tolerance):
+            regressions.append(f"{phase}: {result['wall_time']:.2f}s vs baseline {previous['wall_time']:.2f}s")
+    return regressions
+
+
+def format_report(report):
+    lines = [f"{'phase':<32}{'wall (s)':>10}{'peak RSS (MiB)':>16}{'MiB/s':>10}"]
+    for phase, result in report["phases"].items():
+        lines.append(
+            f"{phase:<32}{result['wall_time']:>10.2f}{result['peak_rss'] / 2 ** 20:>16.1f}"
+            f"{result['bytes_per_sec'] / 2 ** 20:>10.1f}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark conda-vendor against a local synthetic channel")
+    parser.add_argument("--entries", type=int, default=100_000, help="repodata.json entries per subdir")
+    parser.add_argument("--packages", type=int, default=200, help="package files to download")
+    parser.add_argument("--jobs", type=int, default=4, help="concurrent package downloads")
+    parser.add_argument("--phase", action="append", choices=PHASES, help="only run these phases")
+    parser.add_argument("--json", type=Path, help="write the report to this file")
+    parser.add_argument("--baseline", type=Path, help="fail if slower than this earlier --json report")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown against --baseline")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.entries, args.packages, args.jobs, args.phase or PHASES)
+    print(format_report(report))
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+    if args.baseline:
+        regressions = find_regressions(report, json.loads(args.baseline.read_text()), args.tolerance)
+        if regressions:
+            print("Performance regressions:\n" + "\n".join(regressions), file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
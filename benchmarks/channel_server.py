@@ -0,0 +1,189 @@
+# a synthetic conda channel at conda-forge scale served from a local HTTP
+# server, so vendoring can be measured without touching anaconda.org
+import bz2
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from conda_vendor.repodata import zstd
+
+CHANNEL_NAME = "bench-forge"
+
+
+# write <root>/<CHANNEL_NAME>/<subdir>/repodata.json(.bz2/.zst) holding
+# n_entries entries per subdir, of which n_packages are backed by real
+# files, and return the FETCH actions of those packages
+def build_synthetic_channel(root, n_entries=100_000, n_packages=200, subdirs=("linux-64", "noarch"),
+                            median_size=256 * 1024, large_packages=2, large_size=32 * 1024 * 1024, seed=0):
+    rng = random.Random(seed)
+    channel_path = Path(root) / CHANNEL_NAME
+    fetch_actions = []
+    for subdir in subdirs:
+        subdir_path = channel_path / subdir
+        subdir_path.mkdir(parents=True, exist_ok=True)
+        packages = {}
+        conda_packages = {}
+        n_backed = n_packages // len(subdirs)
+        for i in range(n_entries):
+            name = f"pkg{i % (n_entries // 4 or 1)}"
+            build = f"h{i:07x}_{i % 3}"
+            fn = f"{name}-1.{i % 50}.0-{build}{'.conda' if i % 2 else '.tar.bz2'}"
+            entry = {
+                "build": build,
+                "build_number": i % 3,
+                "depends": [f"pkg{(i * 7) % 1000} >=1.0", "python >=3.8", "libzlib >=1.2.13,<2.0a0"],
+                "license": "BSD-3-Clause",
+                "md5": hashlib.md5(fn.encode()).hexdigest(),
+                "name": name,
+                "sha256": hashlib.sha256(fn.encode()).hexdigest(),
+                "size": 0,
+                "subdir": subdir,
+                "timestamp": 1600000000000 + i,
+                "version": f"1.{i % 50}.0",
+            }
+            if i < n_backed:
+                # package sizes are roughly log-normal with a few giant builds
+                # (think cudatoolkit or mkl) mixed in
+                if i < large_packages:
+                    size = large_size
+                else:
+                    size = max(1024, int(rng.lognormvariate(0, 1) * median_size))
+                content = os.urandom(size)
+                (subdir_path / fn).write_bytes(content)
+                entry["size"] = size
+                entry["sha256"] = hashlib.sha256(content).hexdigest()
+                entry["md5"] = hashlib.md5(content).hexdigest()
+            (conda_packages if fn.endswith(".conda") else packages)[fn] = entry
+            if i < n_backed:
+                channel_url = f"{{base_url}}/{CHANNEL_NAME}/{subdir}"
+                fetch_actions.append(dict(entry, fn=fn, channel=channel_url, url=f"{channel_url}/{fn}"))
+
+        repodata = json.dumps({
+            "info": {"subdir": subdir},
+            "packages": packages,
+            "packages.conda": conda_packages,
+            "repodata_version": 1,
+        }).encode()
+        (subdir_path / "repodata.json").write_bytes(repodata)
+        (subdir_path / "repodata.json.bz2").write_bytes(bz2.compress(repodata))
+        if zstd is not None:
+            (subdir_path / "repodata.json.zst").write_bytes(zstd.compress(repodata))
+    return fetch_actions
+
+
+# resolve the {base_url} placeholder of synthetic FETCH actions
+def with_base_url(fetch_actions, base_url):
+    return [
+        dict(pkg, channel=pkg["channel"].format(base_url=base_url), url=pkg["url"].format(base_url=base_url))
+        for pkg in fetch_actions
+    ]
+
+
+class _ChannelRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        path = (server.root / self.path.lstrip("/").split("?", 1)[0]).resolve()
+        if server.root not in path.parents or not path.is_file():
+            self._send_empty(404)
+            return
+        if server.delay:
+            threading.Event().wait(server.delay)
+
+        stat = path.stat()
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        if self.headers.get("If-None-Match") == etag:
+            self._send_empty(304, {"ETag": etag})
+            return
+
+        start, end = 0, stat.st_size - 1
+        status = 200
+        match = re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if match and server.ranges and self.headers.get("If-Range", etag) == etag:
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else end
+            if start > end:
+                self._send_empty(416, {"Content-Range": f"bytes */{stat.st_size}"})
+                return
+            status = 206
+
+        self.send_response(status)
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("ETag", etag)
+        self.send_header("Accept-Ranges", "bytes" if server.ranges else "none")
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{stat.st_size}")
+        self.end_headers()
+
+        remaining = end - start + 1
+        with path.open("rb") as f:
+            f.seek(start)
+            while remaining:
+                chunk = f.read(min(remaining, 256 * 1024))
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+                server.count_bytes(len(chunk))
+                if server.throttle:
+                    threading.Event().wait(len(chunk) / server.throttle)
+
+    def _send_empty(self, status, headers=None):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+# serve root over HTTP on localhost in a background thread. delay adds
+# latency to every request and throttle caps each response in bytes/sec
+class ChannelServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, root, delay=0.0, throttle=None, ranges=True):
+        super().__init__(("127.0.0.1", 0), _ChannelRequestHandler)
+        self.root = Path(root).resolve()
+        self.delay = delay
+        self.throttle = throttle
+        self.ranges = ranges
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    # clients closing a response early, e.g. once the repodata filter has
+    # found every wanted package, are expected
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+    def count_bytes(self, n):
+        with self._lock:
+            self.bytes_sent += n
+
+    def reset_counters(self):
+        with self._lock:
+            self.bytes_sent = 0
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
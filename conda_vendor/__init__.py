@@ -1,10 +1,15 @@
-import importlib.metadata
-
 from conda_vendor.conda_vendor import main
 
 __all__ = ["main"]
 
-try:
-    __version__ = importlib.metadata.version("conda_vendor")
-except Exception:
-    __version__ = "unknown"
+
+# the installed distribution's version is looked up on first access,
+# importlib.metadata scans every installed distribution to find it
+def __getattr__(name):
+    if name == "__version__":
+        import importlib.metadata
+        try:
+            return importlib.metadata.version("conda_vendor")
+        except Exception:
+            return "unknown"
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
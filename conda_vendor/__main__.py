@@ -1,3 +1,4 @@
-from .conda_vendor import main
+from conda_vendor.conda_vendor import main as cli
 
-main()
+if __name__ == "__main__":
+    cli()
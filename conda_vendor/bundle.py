@@ -0,0 +1,289 @@
+# single file transfer bundles of a vendored channel
+#
+# a bundle is a tar stream compressed as a series of independent gzip
+# members, so chunks are compressed on several threads at once while the
+# result stays readable by gzip / tar. its first member, MANIFEST.json,
+# lists the sha256 and size of every other file, which lets unbundle verify
+# each file as it is extracted, in one pass over a (possibly piped) stream.
+#
+# a delta bundle holds only the files that changed between two versions of
+# a channel, plus the list of removed files and the sizes of the unchanged
+# ones its receiving side must already have
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import tarfile
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
+
+from conda_vendor.fileio import write_atomic
+from conda_vendor.verify import PACKAGE_SUFFIXES, expected_files, hash_file
+
+BUNDLE_VERSION = 1
+MANIFEST_NAME = "MANIFEST.json"
+
+# uncompressed bytes per gzip member
+BUNDLE_CHUNK_SIZE = 4 * 1024 * 1024
+
+# read size when copying files into and out of the tar stream
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class BundleError(RuntimeError):
+    pass
+
+
+# binary writer compressing every BUNDLE_CHUNK_SIZE bytes written to it into
+# its own gzip member on a thread pool, writing the members to fp in order
+class ParallelGzipWriter(io.RawIOBase):
+    def __init__(self, fp, jobs=None, compresslevel=6, chunk_size=BUNDLE_CHUNK_SIZE):
+        self.fp = fp
+        self.jobs = jobs or os.cpu_count() or 1
+        self.compresslevel = compresslevel
+        self.chunk_size = chunk_size
+        self.buffer = bytearray()
+        self.executor = ThreadPoolExecutor(max_workers=self.jobs)
+        self.pending = deque()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.buffer += data
+        while len(self.buffer) >= self.chunk_size:
+            self._submit(bytes(self.buffer[:self.chunk_size]))
+            del self.buffer[:self.chunk_size]
+        return len(data)
+
+    def _submit(self, chunk):
+        # zlib releases the GIL, so members compress in parallel
+        self.pending.append(self.executor.submit(gzip.compress, chunk, self.compresslevel, mtime=0))
+        # bound memory to a few chunks per thread
+        while len(self.pending) > 2 * self.jobs:
+            self.fp.write(self.pending.popleft().result())
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self.buffer:
+                self._submit(bytes(self.buffer))
+                self.buffer.clear()
+            while self.pending:
+                self.fp.write(self.pending.popleft().result())
+            self.fp.flush()
+        finally:
+            self.executor.shutdown()
+            super().close()
+
+
+# file wrapper hashing everything read through it
+class _HashingReader:
+    def __init__(self, fp):
+        self.fp = fp
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def read(self, n=-1):
+        data = self.fp.read(n)
+        self.sha256.update(data)
+        self.size += len(data)
+        return data
+
+
+# leftovers of interrupted downloads (<fn>.part, <fn>.part.json) and of
+# hedged downloads that lost their race (<fn>.mirrorN and its .part files)
+PARTIAL_DOWNLOAD_PATTERN = re.compile(r".*\.(part|part\.json|mirror\d+(\.part(\.json)?)?)")
+
+
+def _is_channel_file(channel_path, path, expected):
+    if path.name.startswith(".") or PARTIAL_DOWNLOAD_PATTERN.fullmatch(path.name):
+        return False
+    if path.name.endswith(PACKAGE_SUFFIXES):
+        # only the packages the channel's repodata.json files list
+        relative = path.relative_to(channel_path)
+        return (relative.parent.as_posix(), path.name) in expected
+    return True
+
+
+# files of a channel, packages before the index files that reference them so
+# a channel being extracted over never lists a package it does not have yet
+def _channel_files(channel_path, expected=None):
+    channel_path = Path(channel_path)
+    if expected is None:
+        expected = expected_files(channel_path)
+    files = (p for p in channel_path.rglob("*") if p.is_file() and _is_channel_file(channel_path, p, expected))
+    return sorted(files, key=lambda p: (not p.name.endswith(PACKAGE_SUFFIXES), p))
+
+
+# manifest of every file in the channel. package sha256s are taken from the
+# repodata.json files and checked while the bundle is written, so packages
+# are read once; the remaining index files are small and hashed up front
+def bundle_manifest(channel_path, extra_files=()) -> dict:
+    channel_path = Path(channel_path)
+    expected = expected_files(channel_path)
+    files = {}
+    for path in _channel_files(channel_path, expected):
+        relative = path.relative_to(channel_path)
+        entry = expected.get((relative.parent.as_posix(), relative.name), {})
+        sha256 = entry.get("sha256") or hash_file(path)
+        files[f"{channel_path.name}/{relative.as_posix()}"] = {"sha256": sha256, "size": path.stat().st_size}
+    for extra in extra_files:
+        extra = Path(extra)
+        files[extra.name] = {"sha256": hash_file(extra), "size": extra.stat().st_size}
+    return {"version": BUNDLE_VERSION, "channel": channel_path.name, "files": files}
+
+
+def _add_file(tar, arcname, fp, size, mtime):
+    info = tarfile.TarInfo(arcname)
+    info.size = size
+    info.mtime = mtime
+    info.mode = 0o644
+    tar.addfile(info, fp)
+
+
+# stream channel_path (plus extra_files such as the IronBank manifest) into
+# a bundle written to out. on_file is called with each file's size. a delta
+# bundle passes its manifest, holding only the changed files, as manifest
+def write_bundle(channel_path, out, extra_files=(), jobs=None, compresslevel=6, on_file=None, manifest=None) -> dict:
+    channel_path = Path(channel_path)
+    if manifest is None:
+        manifest = bundle_manifest(channel_path, extra_files)
+    sources = {f"{channel_path.name}/{p.relative_to(channel_path).as_posix()}": p for p in _channel_files(channel_path)}
+    sources.update({Path(extra).name: Path(extra) for extra in extra_files})
+    sources = {arcname: path for arcname, path in sources.items() if arcname in manifest["files"]}
+
+    writer = ParallelGzipWriter(out, jobs=jobs, compresslevel=compresslevel)
+    with writer, tarfile.open(fileobj=writer, mode="w|", format=tarfile.PAX_FORMAT) as tar:
+        manifest_bytes = json.dumps(manifest, indent=2).encode()
+        _add_file(tar, MANIFEST_NAME, io.BytesIO(manifest_bytes), len(manifest_bytes), time.time())
+        for arcname, path in sources.items():
+            expected = manifest["files"][arcname]
+            with path.open("rb") as f:
+                reader = _HashingReader(f)
+                _add_file(tar, arcname, reader, expected["size"], path.stat().st_mtime)
+            if reader.sha256.hexdigest() != expected["sha256"]:
+                raise BundleError(f"{path} does not match its sha256 in repodata.json, run conda-vendor verify")
+            if on_file is not None:
+                on_file(expected["size"])
+    return manifest
+
+
+def _safe_destination(dest_dir, name) -> Path:
+    path = PurePosixPath(name)
+    if path.is_absolute() or ".." in path.parts:
+        raise BundleError(f"Refusing to extract {name} outside of {dest_dir}")
+    return Path(dest_dir, *path.parts)
+
+
+# extract a bundle read from fp into dest_dir, verifying every file against
+# the manifest as it is written. on_file is called with each file's size
+def extract_bundle(fp, dest_dir, on_file=None) -> dict:
+    dest_dir = Path(dest_dir)
+    # GzipFile reads every gzip member, tarfile's own r|gz stops after the first
+    with gzip.GzipFile(fileobj=fp, mode="rb") as decompressed, tarfile.open(fileobj=decompressed, mode="r|") as tar:
+        manifest = None
+        extracted = set()
+        for member in tar:
+            if manifest is None:
+                if member.name != MANIFEST_NAME:
+                    raise BundleError(f"Not a conda-vendor bundle, it does not start with {MANIFEST_NAME}")
+                manifest = json.load(tar.extractfile(member))
+                if manifest.get("version") != BUNDLE_VERSION:
+                    raise BundleError(f"Unsupported bundle version {manifest.get('version')}")
+                if "delta" in manifest:
+                    _check_delta_base(manifest, dest_dir)
+                continue
+            if not member.isfile():
+                raise BundleError(f"Unexpected non-regular file {member.name} in bundle")
+            expected = manifest["files"].get(member.name)
+            if expected is None:
+                raise BundleError(f"{member.name} is not listed in the bundle manifest")
+
+            dest = _safe_destination(dest_dir, member.name)
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            reader = _HashingReader(tar.extractfile(member))
+            # write_atomic only renames the file into place once it is complete
+            write_atomic(dest, iter(lambda: reader.read(COPY_CHUNK_SIZE), b""))
+            if reader.sha256.hexdigest() != expected["sha256"] or reader.size != expected["size"]:
+                dest.unlink()
+                raise BundleError(f"{member.name} failed SHA256 verification")
+            os.utime(dest, (member.mtime, member.mtime))
+            extracted.add(member.name)
+            if on_file is not None:
+                on_file(reader.size)
+
+    if manifest is None:
+        raise BundleError("Empty bundle")
+    missing = sorted(set(manifest["files"]) - extracted)
+    if missing:
+        raise BundleError(f"Bundle is truncated, {len(missing)} files missing: {', '.join(missing[:5])}")
+    if "delta" in manifest:
+        for name in manifest["delta"]["removed"]:
+            _safe_destination(dest_dir, name).unlink(missing_ok=True)
+    return manifest
+
+
+# {path relative to the channel: sha256} of an old channel, given either its
+# directory or the MANIFEST.json of a bundle made from it
+def _base_files(old) -> dict:
+    old = Path(old)
+    manifest = bundle_manifest(old) if old.is_dir() else json.loads(old.read_text())
+    base = {}
+    for arcname, entry in manifest["files"].items():
+        _, _, relative = arcname.partition("/")
+        # files outside the channel such as the IronBank manifest are always shipped
+        if relative:
+            base[relative] = entry
+    return base
+
+
+# manifest of a delta bundle bringing old (a channel directory or bundle
+# manifest) up to date with new_channel: the files that are new or whose
+# sha256 changed, the files that were removed, and the unchanged files
+def delta_manifest(old, new_channel, extra_files=()) -> dict:
+    new_channel = Path(new_channel)
+    base = _base_files(old)
+    full = bundle_manifest(new_channel, extra_files)
+
+    files, unchanged, current = {}, {}, set()
+    for arcname, entry in full["files"].items():
+        _, _, relative = arcname.partition("/")
+        current.add(relative)
+        old_entry = base.get(relative) if relative else None
+        if old_entry is not None and old_entry["sha256"] == entry["sha256"]:
+            unchanged[arcname] = entry["size"]
+        else:
+            files[arcname] = entry
+    removed = sorted(f"{new_channel.name}/{relative}" for relative in set(base) - current)
+    return {
+        "version": BUNDLE_VERSION,
+        "channel": new_channel.name,
+        "files": files,
+        "delta": {"removed": removed, "unchanged": unchanged},
+    }
+
+
+# write a delta bundle of new_channel against old to out
+def write_delta_bundle(old, new_channel, out, extra_files=(), jobs=None, compresslevel=6, on_file=None) -> dict:
+    manifest = delta_manifest(old, new_channel, extra_files)
+    return write_bundle(new_channel, out, extra_files, jobs=jobs, compresslevel=compresslevel, on_file=on_file, manifest=manifest)
+
+
+# a delta only applies to a copy of the channel it was made against
+def _check_delta_base(manifest, dest_dir):
+    mismatched = []
+    for name, size in manifest["delta"]["unchanged"].items():
+        try:
+            if _safe_destination(dest_dir, name).stat().st_size != size:
+                mismatched.append(name)
+        except FileNotFoundError:
+            mismatched.append(name)
+    if mismatched:
+        raise BundleError(f"{dest_dir} does not hold the channel this delta was made against, "
+                          f"{len(mismatched)} files missing or different: {', '.join(sorted(mismatched)[:5])}")
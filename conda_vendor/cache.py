@@ -0,0 +1,337 @@
+# on-disk caches shared across conda-vendor runs
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from conda_vendor.fileio import write_atomic
+from conda_vendor.lock_file import read_lock, write_lock
+
+# linux ioctl used to reflink (copy-on-write clone) a file on btrfs/xfs
+FICLONE = 0x40049409
+
+# seconds a cached solve is reused before the environment is solved again
+DEFAULT_SOLVE_MAX_AGE = 24 * 60 * 60
+
+_SIZE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+
+# raised in offline mode for a repodata.json that was never cached
+class CacheMiss(RuntimeError):
+    pass
+
+
+# location of the cache, overridable with CONDA_VENDOR_CACHE_DIR
+def default_cache_dir() -> Path:
+    if os.environ.get("CONDA_VENDOR_CACHE_DIR"):
+        return Path(os.environ["CONDA_VENDOR_CACHE_DIR"])
+    xdg_cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(xdg_cache_home) / "conda-vendor"
+
+
+# parse sizes such as "512M", "20G" or a plain number of bytes
+def parse_size(size) -> int:
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*", str(size), re.IGNORECASE)
+    if match is None:
+        raise ValueError(f"Invalid size: {size}")
+    number, unit = match.groups()
+    return int(float(number) * _SIZE_UNITS[unit.upper()])
+
+
+def _reflink(src, dest):
+    import fcntl
+    with open(src, "rb") as src_file, open(dest, "wb") as dest_file:
+        fcntl.ioctl(dest_file.fileno(), FICLONE, src_file.fileno())
+
+
+# place a copy of src at dest without duplicating data where possible:
+# hardlink, then reflink, then a plain copy, or a symlink to src instead of
+# the copy when symlink=True. dest is replaced atomically. with copy=False
+# dest is left alone and None returned when only a plain copy would do
+def link_or_copy(src, dest, symlink=False, copy=True):
+    dest = Path(dest)
+    fd, tmp_name = tempfile.mkstemp(dir=dest.parent, prefix=f".{dest.name}.", suffix=".tmp")
+    os.close(fd)
+    tmp_path = Path(tmp_name)
+    try:
+        try:
+            tmp_path.unlink()
+            os.link(src, tmp_path)
+            method = "hardlink"
+        except OSError:
+            try:
+                if not sys.platform.startswith("linux"):
+                    raise OSError("reflink is only supported on linux")
+                _reflink(src, tmp_path)
+                method = "reflink"
+            except OSError:
+                if symlink:
+                    os.symlink(Path(src).absolute(), tmp_path)
+                    method = "symlink"
+                elif copy:
+                    shutil.copyfile(src, tmp_path)
+                    method = "copy"
+                else:
+                    # a failed reflink leaves an empty file behind
+                    tmp_path.unlink(missing_ok=True)
+                    return None
+        os.replace(tmp_path, dest)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return method
+
+
+# content-addressed store of verified package files keyed by the FETCH
+# action's sha256, evicting least recently used entries past max_size.
+# without a max_size, files that cannot be hardlinked or reflinked into
+# the store (e.g. a cache on another filesystem) are not added, since a
+# copy would double their disk use with nothing to ever evict it
+class PackageCache:
+    def __init__(self, root, max_size=None):
+        self.root = Path(root) / "pkgs"
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def path_for(self, sha256) -> Path:
+        return self.root / sha256[:2] / sha256
+
+    # return the cached entry for sha256, marking it as recently used
+    def get(self, sha256):
+        entry = self.path_for(sha256)
+        try:
+            os.utime(entry)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return entry
+
+    # add an already verified file to the store, returns None when it was
+    # skipped because only a copy was possible and the store is unbounded
+    def add(self, sha256, src_path):
+        entry = self.path_for(sha256)
+        if entry.exists():
+            return entry
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        if link_or_copy(src_path, entry, copy=self.max_size is not None) is None:
+            with self._lock:
+                self.skipped += 1
+            return None
+        return entry
+
+    # materialise the cached entry for sha256 at dest_path, returns False
+    # when sha256 is not in the cache
+    def materialize(self, sha256, dest_path) -> bool:
+        entry = self.get(sha256)
+        if entry is None:
+            return False
+        try:
+            link_or_copy(entry, dest_path)
+        except FileNotFoundError:
+            # evicted by a concurrent run between get() and the link
+            return False
+        return True
+
+    def entries(self):
+        if not self.root.exists():
+            return []
+        return [entry for entry in self.root.glob("??/*") if not entry.name.startswith(".")]
+
+    def size(self) -> int:
+        return sum(entry.stat().st_size for entry in self.entries())
+
+    # remove least recently used entries until the store fits in max_size
+    def evict(self):
+        if self.max_size is None:
+            return []
+        entries = []
+        for entry in self.entries():
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry))
+        total = sum(size for _, size, _ in entries)
+        evicted = []
+        for _, size, entry in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_size:
+                break
+            entry.unlink(missing_ok=True)
+            total -= size
+            evicted.append(entry)
+        return evicted
+
+
+# shared pool of package files keyed by sha256 that vendored channels link
+# into, so identical packages are stored once on a volume. unlike the
+# cache, entries are never evicted while a channel still references them
+class PackagePool(PackageCache):
+    def __init__(self, root):
+        super().__init__(root)
+        self.channels_root = Path(root) / "channels"
+
+    # link the pool entry into the channel; symlinks are the last resort so
+    # the channel never holds a duplicate copy of the entry
+    def materialize(self, sha256, dest_path) -> bool:
+        entry = self.get(sha256)
+        if entry is None:
+            return False
+        link_or_copy(entry, dest_path, symlink=True)
+        return True
+
+    # move a downloaded and verified file into the pool, leaving a link to
+    # the pool entry in its place
+    def add(self, sha256, src_path):
+        entry = self.path_for(sha256)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        if not entry.exists():
+            tmp_entry = entry.with_name(f".{entry.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            shutil.move(src_path, tmp_entry)
+            os.replace(tmp_entry, entry)
+        link_or_copy(entry, src_path, symlink=True)
+        return entry
+
+    # remember a vendored channel so gc() can find its symlinks into the pool
+    def register_channel(self, channel_path):
+        channel_path = Path(channel_path).absolute()
+        self.channels_root.mkdir(parents=True, exist_ok=True)
+        key = hashlib.sha256(str(channel_path).encode()).hexdigest()[:32]
+        write_atomic(self.channels_root / f"{key}.json", [json.dumps({"path": str(channel_path)}).encode()])
+
+    def channels(self):
+        channels = []
+        for registration in sorted(self.channels_root.glob("*.json")):
+            channel_path = Path(json.loads(registration.read_text())["path"])
+            if channel_path.is_dir():
+                channels.append(channel_path)
+            else:
+                # the channel was deleted, forget it
+                registration.unlink(missing_ok=True)
+        return channels
+
+    # delete pool entries no channel links to: hardlinked entries are
+    # referenced while their link count is above one, symlinked ones while a
+    # registered channel holds a symlink to them
+    def gc(self, dry_run=False):
+        symlinked = set()
+        for channel_path in self.channels():
+            for pkg_path in channel_path.glob("*/*"):
+                if pkg_path.is_symlink():
+                    symlinked.add(os.path.realpath(pkg_path))
+        removed = []
+        for entry in self.entries():
+            stat = entry.stat()
+            if stat.st_nlink > 1 or os.path.realpath(entry) in symlinked:
+                continue
+            if not dry_run:
+                entry.unlink(missing_ok=True)
+            removed.append((entry, stat.st_size))
+        return removed
+
+
+# persistent cache of upstream repodata.json bodies, revalidated with
+# conditional requests using the stored ETag / Last-Modified headers
+class RepodataCache:
+    def __init__(self, root, max_age=None, offline=False):
+        self.root = Path(root) / "repodata"
+        self.max_age = max_age
+        self.offline = offline
+        self.hits = 0
+        self.revalidated = 0
+        self.downloads = 0
+        self._lock = threading.Lock()
+
+    def _paths_for(self, url):
+        key = hashlib.sha256(url.encode()).hexdigest()[:32]
+        return self.root / f"{key}.json", self.root / f"{key}.meta.json"
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    # return the path of an up to date copy of url, downloading it only
+    # when the cached copy is missing or has changed upstream
+    def fetch(self, url, client) -> Path:
+        body_path, meta_path = self._paths_for(url)
+        meta = {}
+        if body_path.exists() and meta_path.exists():
+            meta = json.loads(meta_path.read_text())
+
+        if meta:
+            age = time.time() - meta.get("fetched_at", 0)
+            if self.offline or (self.max_age is not None and age <= self.max_age):
+                self._count("hits")
+                return body_path
+        elif self.offline:
+            raise CacheMiss(f"{url} is not in the repodata cache and offline mode is enabled")
+
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+        response = client.get(url, stream=True, headers=headers)
+        try:
+            if response.status_code == 304 and meta:
+                self._count("revalidated")
+            else:
+                response.raise_for_status()
+                self.root.mkdir(parents=True, exist_ok=True)
+                write_atomic(body_path, _counted(response.iter_content(chunk_size=1024 * 1024), url, client))
+                meta = {
+                    "url": url,
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                }
+                self._count("downloads")
+        finally:
+            response.close()
+
+        meta["fetched_at"] = time.time()
+        write_atomic(meta_path, [json.dumps(meta).encode()])
+        return body_path
+
+
+# record body chunks in the client's metrics as they are consumed
+def _counted(chunks, url, client):
+    metrics = getattr(client, "metrics", None)
+    for chunk in chunks:
+        if metrics is not None:
+            metrics.record_transfer(url, len(chunk))
+        yield chunk
+
+
+# lock artifacts of previous solves, keyed by lock_file.solve_key. a solve
+# is reused while younger than max_age seconds, so unpinned specs still
+# pick up new package versions; max_age=None reuses a solve forever
+class SolveCache:
+    def __init__(self, root, max_age=DEFAULT_SOLVE_MAX_AGE):
+        self.root = Path(root) / "solves"
+        self.max_age = max_age
+
+    def path_for(self, key) -> Path:
+        return self.root / f"{key}.json"
+
+    def get(self, key):
+        try:
+            lock = read_lock(self.path_for(key))
+        except (FileNotFoundError, ValueError, json.JSONDecodeError):
+            return None
+        # entries written before solves were timed count as expired
+        if self.max_age is not None and time.time() - lock.get("solved_at", 0) >= self.max_age:
+            return None
+        return lock
+
+    def put(self, key, lock):
+        self.root.mkdir(parents=True, exist_ok=True)
+        write_lock(self.path_for(key), lock)
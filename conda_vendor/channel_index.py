@@ -0,0 +1,146 @@
+# index files written next to each vendored repodata.json so conda / mamba
+# solving against the vendored channel can skip loading the full index:
+#
+#   <subdir>/current_repodata.json        latest version of every package
+#   channeldata.json                      per package summary of the channel
+#   <subdir>/repodata_shards.msgpack.zst  CEP-16 sharded repodata index, with
+#   <subdir>/shards/<sha256>.msgpack.zst  one shard per package name
+import hashlib
+import shutil
+from pathlib import Path
+
+from conda_vendor.fileio import write_atomic, write_json_atomic
+from conda_vendor.repodata import REPODATA_SECTIONS, zstd
+
+CHANNELDATA_VERSION = 1
+
+# package fields copied from repodata.json entries into channeldata.json
+CHANNELDATA_FIELDS = ("license", "license_family")
+
+# repodata fields holding hex digests, stored as raw bytes inside shards
+SHARD_DIGEST_FIELDS = ("md5", "sha256")
+
+
+# conda's ordering of an entry: version, then build number, then timestamp
+def _version_key(entry):
+    # imported here so that importing conda_vendor stays fast
+    from conda_lock._vendor.conda.models.version import VersionOrder
+    try:
+        version = VersionOrder(str(entry.get("version", "0")))
+    except ValueError:
+        version = VersionOrder("0")
+    return version, entry.get("build_number", 0), entry.get("timestamp", 0)
+
+
+def _newest(entries):
+    return max(entries, key=_version_key)
+
+
+# group the entries of repodata by package name, keeping their filenames
+def _entries_by_name(repodata):
+    by_name = {}
+    for section in REPODATA_SECTIONS:
+        for fn, entry in repodata.get(section, {}).items():
+            by_name.setdefault(entry.get("name", fn.rsplit("-", 2)[0]), []).append((section, fn, entry))
+    return by_name
+
+
+# repodata reduced to the newest version of every package name, with all of
+# that version's builds in both the .tar.bz2 and .conda sections
+def current_repodata(repodata) -> dict:
+    current = {"info": repodata.get("info", {}), **{section: {} for section in REPODATA_SECTIONS}}
+    for records in _entries_by_name(repodata).values():
+        version = _newest(entry for _, _, entry in records).get("version")
+        for section, fn, entry in records:
+            if entry.get("version") == version:
+                current[section][fn] = entry
+    return current
+
+
+def write_current_repodata(subdir_path, repodata):
+    write_json_atomic(Path(subdir_path) / "current_repodata.json", current_repodata(repodata))
+
+
+# channeldata.json for a vendored channel, given {subdir: repodata}
+def channeldata(subdir_repodata) -> dict:
+    packages = {}
+    newest_keys = {}
+    for subdir, repodata in sorted(subdir_repodata.items()):
+        for name, records in _entries_by_name(repodata).items():
+            newest = _newest(entry for _, _, entry in records)
+            package = packages.setdefault(name, {"subdirs": []})
+            package["subdirs"].append(subdir)
+            key = _version_key(newest)
+            if name not in newest_keys or key >= newest_keys[name]:
+                newest_keys[name] = key
+                package["version"] = newest.get("version")
+                package["timestamp"] = newest.get("timestamp", 0)
+                for field in CHANNELDATA_FIELDS:
+                    if field in newest:
+                        package[field] = newest[field]
+    return {
+        "channeldata_version": CHANNELDATA_VERSION,
+        "packages": dict(sorted(packages.items())),
+        "subdirs": sorted(subdir_repodata),
+    }
+
+
+def write_channeldata(channel_path, subdir_repodata):
+    write_json_atomic(Path(channel_path) / "channeldata.json", channeldata(subdir_repodata), indent=2)
+
+
+def _shard_entry(entry):
+    shard_entry = dict(entry)
+    for field in SHARD_DIGEST_FIELDS:
+        if isinstance(shard_entry.get(field), str):
+            shard_entry[field] = bytes.fromhex(shard_entry[field])
+    return shard_entry
+
+
+# write the CEP-16 sharded form of repodata, one zstd compressed msgpack
+# shard per package name named by its sha256, plus the index mapping each
+# name to its shard
+def write_shards(subdir_path, repodata):
+    try:
+        import msgpack
+    except ImportError:
+        msgpack = None
+    if msgpack is None or zstd is None:
+        raise RuntimeError("Writing sharded repodata requires the msgpack package and Python 3.14+ or the backports.zstd package")
+
+    subdir_path = Path(subdir_path)
+    shards_path = subdir_path / "shards"
+    shards_path.mkdir(exist_ok=True)
+
+    index = {
+        "version": 1,
+        "info": {"base_url": "", "shards_base_url": "./shards/", "subdir": repodata.get("info", {}).get("subdir", subdir_path.name)},
+        "repodata_version": 2,
+        "removed": [],
+        "shards": {},
+    }
+    for name, records in sorted(_entries_by_name(repodata).items()):
+        shard = {section: {} for section in REPODATA_SECTIONS}
+        for section, fn, entry in records:
+            shard[section][fn] = _shard_entry(entry)
+        compressed = zstd.compress(msgpack.packb(shard))
+        digest = hashlib.sha256(compressed).digest()
+        shard_file = shards_path / f"{digest.hex()}.msgpack.zst"
+        if not shard_file.exists():
+            write_atomic(shard_file, [compressed])
+        index["shards"][name] = digest
+
+    write_atomic(subdir_path / "repodata_shards.msgpack.zst", [zstd.compress(msgpack.packb(index))])
+    # shards left over from an earlier run are no longer referenced
+    referenced = {f"{digest.hex()}.msgpack.zst" for digest in index["shards"].values()}
+    for shard_file in shards_path.iterdir():
+        if shard_file.name not in referenced:
+            shard_file.unlink()
+
+
+# remove the sharded repodata of subdir_path, e.g. left by an earlier run
+# with --shards that would otherwise describe an older repodata.json
+def remove_shards(subdir_path):
+    subdir_path = Path(subdir_path)
+    (subdir_path / "repodata_shards.msgpack.zst").unlink(missing_ok=True)
+    shutil.rmtree(subdir_path / "shards", ignore_errors=True)
@@ -1,40 +1,75 @@
+# heavy dependencies (conda_lock, requests, yaml) are imported inside the
+# functions that use them, so --help, --version and commands that never
+# solve or download start quickly
+from __future__ import annotations
+
 import click
-import yaml
 import sys
+import os
 import struct
-import requests
+import tarfile
+import time
 import hashlib
+import io
 import json
+import queue
+import re
+import threading
+from collections import deque
+from contextlib import ExitStack, contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from conda_vendor.version import __version__
-from conda_vendor.conda_lock_wrapper import CondaLockWrapper
-from conda_lock.src_parser import LockSpecification
-from conda_lock.conda_solver import DryRunInstall, VersionedDependency, FetchAction
 from pathlib import Path
-from typing import List
-from requests.packages.urllib3.util.retry import Retry
-from requests.adapters import HTTPAdapter
-from conda_build import api
+from typing import TYPE_CHECKING, List
 from conda_vendor.iron_bank_generator import yaml_dump_ironbank_manifest
+from conda_vendor import events
+from conda_vendor.events import OUTPUT_FORMATS
+from conda_vendor.http_client import DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT, HttpClient, classify_error
+from conda_vendor.channel_index import remove_shards, write_channeldata, write_current_repodata, write_shards
+from conda_vendor.fileio import write_json_atomic
+from conda_vendor.scheduler import ConcurrencyController, DownloadScheduler
+from conda_vendor.metrics import CountingReader, Metrics, phase
+from conda_vendor.mirrors import MirrorSet
+from conda_vendor.repodata import COMPRESSION_FORMATS, REPODATA_SECTIONS, iter_repodata_entries, open_compressed, repodata_suffixes, write_compressed_repodata
+from conda_vendor.cache import DEFAULT_SOLVE_MAX_AGE, CacheMiss, PackageCache, PackagePool, RepodataCache, SolveCache, default_cache_dir, parse_size
+from conda_vendor.verify import expected_files, verify_channel
+from conda_vendor.bundle import BundleError, extract_bundle, write_bundle, write_delta_bundle
+from conda_vendor.lock_file import make_lock, read_lock, solve_key, write_lock as write_lock_file
+
+if TYPE_CHECKING:
+    from conda_lock.src_parser import LockSpecification
+    from conda_lock.conda_solver import DryRunInstall, FetchAction
 
 def get_lock_spec_for_environment_file(environment_file, platform) -> LockSpecification:
     # conda lock expects a list
     if isinstance(platform, str):
         platform = [platform]
 
+    from conda_vendor.conda_lock_wrapper import CondaLockWrapper
     lock_spec = CondaLockWrapper.parse_environment_file(Path(environment_file), platform)
     return lock_spec
 
 
-# create the vendored channel directory, given the name in the environment.yaml
-def create_vendored_dir(environment_file, platform, desired_path=None) -> Path:
+# read the environment name from the environment.yaml
+def get_environment_name(environment_file) -> str:
+    import yaml
     with open(environment_file, 'r') as env_file:
         try:
             environment_yaml = yaml.safe_load(env_file)
-            environment_name = environment_yaml['name']
+            return environment_yaml['name']
         except yaml.YAMLError as err:
-            click.echo(err)
+            events.emit("error", str(err), error=str(err), path=environment_file)
             sys.exit(f"Failed to read environment name from {environment_file}")
 
+
+# create the vendored channel directory, given the name in the environment.yaml
+def create_vendored_dir(environment_file, platform, desired_path=None) -> Path:
+    return create_vendored_channel_dir(get_environment_name(environment_file), platform, desired_path)
+
+
+# create the vendored channel directory named environment_name
+# update=True reuses an existing directory for incremental re-vendoring
+def create_vendored_channel_dir(environment_name, platform, desired_path=None, update=False) -> Path:
     # use current working directory if no path specified
 
     def _create_vendored_dir(root_dir, env_name, platform):
@@ -43,8 +78,11 @@ def create_vendored_dir(environment_file, platform, desired_path=None) -> Path:
             root_dir = Path(root_dir)
 
         path = root_dir / env_name
-        Path.mkdir(path)
-        create_platform_dir(path, platform)
+        Path.mkdir(path, exist_ok=update)
+        # one subdir per platform when vendoring for several platforms
+        platforms = [platform] if isinstance(platform, str) else platform
+        for p in platforms:
+            create_platform_dir(path, p)
         create_noarch_dir(path)
         return path
 
@@ -52,13 +90,13 @@ def create_vendored_dir(environment_file, platform, desired_path=None) -> Path:
         try:
             return _create_vendored_dir(Path.cwd(), environment_name, platform)
         except FileExistsError as err:
-            click.echo(err)
+            events.emit("error", str(err), error=str(err), path=err.filename)
             sys.exit(f"Directory \"{environment_name}\" already exists")
     else:
         try:
             return _create_vendored_dir(desired_path, environment_name, platform)
         except FileExistsError as err:
-            click.echo(err)
+            events.emit("error", str(err), error=str(err), path=err.filename)
             sys.exit(f"Directory \"{desired_path}/{environment_name}\" already exists")
 
 def create_platform_dir(path, platform, overwrite=True):
@@ -66,7 +104,7 @@ def create_platform_dir(path, platform, overwrite=True):
         platform_path = path / platform
         Path.mkdir(platform_path, exist_ok=overwrite)
     except FileExistsError as err:
-        click.echo(err)
+        events.emit("error", str(err), error=str(err), path=platform_path)
         sys.exit(f"Directory \"{platform_path}\" already exists")
 
 def create_noarch_dir(path, overwrite=True):
@@ -74,7 +112,7 @@ def create_noarch_dir(path, overwrite=True):
         noarch_path = path / "noarch"
         Path.mkdir(noarch_path, exist_ok=overwrite)
     except FileExistsError as err:
-        click.echo(err)
+        events.emit("error", str(err), error=str(err), path=noarch_path)
         sys.exit(f"Directory \"{noarch_path}\" already exists")
 
 def _scrub_virtual_pkgs(dry_run_install, chan):
@@ -98,10 +136,10 @@ def _scrub_virtual_pkgs(dry_run_install, chan):
 def solve_environment(lock_spec, solver, platform) -> DryRunInstall:
     specs = get_specs(lock_spec, platform)
 
-    click.echo(click.style(f"Using Solver: {solver}", bold=True, bg='black', fg='cyan'))
-    click.echo(click.style(f"Solving for Platform: {platform}", bold=True, bg='black', fg='cyan'))
-    click.echo(click.style(f"Solving for Spec: {specs}", bold=True, bg='black', fg='cyan'))
+    events.emit("solve_start", f"Using Solver: {solver}\nSolving for Platform: {platform}\nSolving for Spec: {specs}",
+                dict(bold=True, bg='black', fg='cyan'), solver=solver, platform=platform, specs=specs)
 
+    from conda_vendor.conda_lock_wrapper import CondaLockWrapper
     virtual_package_repodata = CondaLockWrapper.default_virtual_package_repodata()
     virtual_package_chan = virtual_package_repodata.channel
     channels = [*lock_spec.channels, virtual_package_chan]
@@ -116,7 +154,7 @@ def solve_environment(lock_spec, solver, platform) -> DryRunInstall:
 
     if not dry_run_install['success']:
         sys.exit("Failed to Solve for {specs}\n Using {solver} for {platform}")
-    click.echo(click.style("Successfull Solve", bold=True, fg='green', blink=True))
+    events.emit("solve_complete", "Successfull Solve", dict(bold=True, fg='green', blink=True), solver=solver, platform=platform)
 
     return dry_run_install
 
@@ -141,76 +179,624 @@ def get_fetch_actions(solver, platform, dry_run_install) -> List[FetchAction]:
     return fetch_actions
 
 
+# solve an environment file into a lock artifact holding its FETCH actions,
+# reusing the result of an earlier identical solve from solve_cache
+def resolve_environment(environment_file, solver, platform, solve_cache=None, metrics=None) -> dict:
+    # generate conda-locks LockSpecification
+    with phase(metrics, f"parse_environment[{platform}]"):
+        lock_spec = get_lock_spec_for_environment_file(environment_file, platform)
+        specs = get_specs(lock_spec, platform)
+        channels = [channel.url for channel in lock_spec.channels]
+
+    key = solve_key(specs, channels, platform, solver)
+    if solve_cache is not None:
+        lock = solve_cache.get(key)
+        if metrics is not None:
+            metrics.increment("solve_cache_hits" if lock is not None else "solve_cache_misses")
+        if lock is not None:
+            age = time.time() - lock.get("solved_at", time.time())
+            events.emit("solve_cached", f"Reusing Cached Solve for Platform: {platform} from {age / 60:.0f} Minutes Ago ({solve_cache.path_for(key)})", dict(bold=True, fg='cyan'),
+                        platform=platform, path=solve_cache.path_for(key), age_seconds=round(age))
+            # the key leaves out the name, the solve may be another environment file's
+            lock["name"] = get_environment_name(environment_file)
+            return lock
+
+    # generate DryRunInstall
+    with phase(metrics, f"solve[{platform}]"):
+        dry_run_install = solve_environment(lock_spec, solver, platform)
+
+    # generate List[FetchAction]
+    # a FetchAction object includes all the entries from the corresponding
+    # package's repodata.json
+    with phase(metrics, f"reconstruct_fetch_actions[{platform}]"):
+        fetch_action_packages = get_fetch_actions(solver, platform, dry_run_install)
+
+    lock = make_lock(get_environment_name(environment_file), platform, solver, channels, specs, fetch_action_packages)
+    if solve_cache is not None:
+        solve_cache.put(key, lock)
+    return lock
+
+
+# compare FETCH actions against an already vendored channel, returning the
+# packages that must be downloaded and the package files no longer needed
+def diff_vendored_channel(fetch_action_packages, vendored_dir_path):
+    vendored_dir_path = Path(vendored_dir_path)
+    vendored = {}
+    for repodata_path in vendored_dir_path.glob("*/repodata.json"):
+        with repodata_path.open() as f:
+            repodata = json.load(f)
+        for section in REPODATA_SECTIONS:
+            for fn, entry in repodata.get(section, {}).items():
+                vendored[(repodata_path.parent.name, fn)] = entry.get("sha256")
+
+    wanted = set()
+    to_download = []
+    for pkg in fetch_action_packages:
+        key = (pkg["subdir"], pkg["fn"])
+        wanted.add(key)
+        pkg_path = vendored_dir_path / pkg["subdir"] / pkg["fn"]
+        unchanged = (
+            vendored.get(key) == pkg["sha256"]
+            and pkg_path.is_file()
+            and ("size" not in pkg or pkg_path.stat().st_size == pkg["size"]))
+        if not unchanged:
+            to_download.append(pkg)
+
+    stale = []
+    for subdir_path in sorted(p for p in vendored_dir_path.iterdir() if is_subdir(p)):
+        for pkg_path in sorted(subdir_path.iterdir()):
+            if pkg_path.name.endswith((".tar.bz2", ".conda")) and (subdir_path.name, pkg_path.name) not in wanted:
+                stale.append(pkg_path)
+    return to_download, stale
+
+
+# resolve several platforms at once, each solve running in its own worker
+# process, returning the lock artifacts in platform order
+def resolve_platforms(environment_file, solver, platforms, solve_cache=None, metrics=None) -> List[dict]:
+    return resolve_environments([(environment_file, platform) for platform in platforms], solver, solve_cache, metrics=metrics)
+
+
+# worker process entry point, returns the lock with the worker's metrics
+def _resolve_environment_worker(environment_file, solver, platform, solve_cache):
+    metrics = Metrics()
+    with events.capture() as captured:
+        lock = resolve_environment(environment_file, solver, platform, solve_cache, metrics)
+    return lock, metrics.phases, dict(metrics.counters), captured
+
+
+# resolve (environment_file, platform) pairs concurrently in worker
+# processes, returning the lock artifacts in the order given
+def resolve_environments(environments, solver, solve_cache=None, max_workers=None, metrics=None) -> List[dict]:
+    if len(environments) == 1:
+        environment_file, platform = environments[0]
+        return [resolve_environment(environment_file, solver, platform, solve_cache, metrics)]
+
+    locks = []
+    with ProcessPoolExecutor(max_workers=max_workers or min(len(environments), os.cpu_count() or 1)) as executor:
+        futures = [executor.submit(_resolve_environment_worker, environment_file, solver, platform, solve_cache) for environment_file, platform in environments]
+        for future in futures:
+            lock, phases, counters, captured = future.result()
+            locks.append(lock)
+            events.replay(captured)
+            if metrics is not None:
+                for name, timing in phases.items():
+                    metrics.add_phase(name, timing["wall_time"], timing["cpu_time"])
+                for counter, n in counters.items():
+                    metrics.increment(counter, n)
+    return locks
+
+
+# union the FETCH actions of several lock artifacts, so packages shared
+# between platforms or environments are only kept once
+def merge_fetch_actions(locks) -> List[FetchAction]:
+    merged = {}
+    for lock in locks:
+        for pkg in lock["fetch_actions"]:
+            key = (pkg["subdir"], pkg["fn"])
+            kept = merged.setdefault(key, pkg)
+            # two different files can't share a name in one channel subdir
+            if kept["sha256"] != pkg["sha256"]:
+                raise ValueError(f"Conflicting packages for {pkg['subdir']}/{pkg['fn']}: {kept['sha256']} and {pkg['sha256']}")
+    return list(merged.values())
+
+
+# list of packages each environment needs from a merged channel
+def environment_manifest(lock_group) -> dict:
+    packages = merge_fetch_actions(lock_group)
+    return {
+        "name": lock_group[0]["name"],
+        "platforms": [lock["platform"] for lock in lock_group],
+        "packages": [{"subdir": pkg["subdir"], "fn": pkg["fn"], "sha256": pkg["sha256"]} for pkg in packages],
+    }
+
+
+# path a platform's lock is written to when several platforms are vendored
+def platform_lock_path(path, platform) -> Path:
+    path = Path(path)
+    return path.with_name(f"{path.stem}.{platform}{path.suffix}")
+
+
+# load a lock artifact given with --from-lock
+def load_lock(lock_file) -> dict:
+    try:
+        return read_lock(lock_file)
+    except (OSError, ValueError) as err:
+        events.emit("error", str(err), error=str(err), path=lock_file)
+        sys.exit(f"Failed to read lock file {lock_file}")
+
+
 # append DryRunInstall witn LINK action items
 def patch_link_actions(solver, platform, dry_run_install) -> DryRunInstall:
+    from conda_vendor.conda_lock_wrapper import CondaLockWrapper
     patched_dry_run_install = CondaLockWrapper.reconstruct_fetch_actions(solver, platform, dry_run_install)
     return patched_dry_run_install
 
 
+# open a single upstream url as a binary stream, from the repodata
+# cache when one is given, otherwise streamed straight from the network
+@contextmanager
+def _open_upstream_url(url, client=None, repodata_cache=None):
+    if repodata_cache is not None:
+        cached_repodata = repodata_cache.fetch(url, client or HttpClient())
+        with cached_repodata.open("rb") as f:
+            yield f
+        return
+
+    response = improved_download(url, stream=True, client=client)
+    try:
+        response.raise_for_status()
+        response.raw.decode_content = True
+        if client is not None and client.metrics is not None:
+            yield io.BufferedReader(CountingReader(response.raw, url, client.metrics))
+        else:
+            yield response.raw
+    finally:
+        response.close()
+
+# open an upstream repodata.json as a decompressed binary stream, preferring
+# the channel's repodata.json.zst / repodata.json.bz2 over the plain file
+@contextmanager
+def open_upstream_repodata(repodata_url, client=None, repodata_cache=None):
+    from requests import HTTPError
+    suffixes = repodata_suffixes()
+    for suffix in suffixes:
+        with ExitStack() as stack:
+            try:
+                compressed = stack.enter_context(_open_upstream_url(repodata_url + suffix, client, repodata_cache))
+            except (HTTPError, CacheMiss) as err:
+                unavailable = isinstance(err, CacheMiss) or err.response is not None and err.response.status_code in (403, 404)
+                if suffix == suffixes[-1] or not unavailable:
+                    raise
+                continue
+            yield stack.enter_context(open_compressed(compressed, suffix))
+            return
+
 # reconstruct repodata.json for subdirs
-def reconstruct_repodata_json(repodata_url, dest_dir, fetch_actions):
+def reconstruct_repodata_json(repodata_url, dest_dir, fetch_actions, client=None, repodata_cache=None, compression_formats=()):
     if isinstance(dest_dir, str):
         dest_dir = Path(dest_dir)
 
+    # only the packages served from this repodata.json's channel need to be
+    # found in it, which lets the upstream file be read only as far as needed
+    channel_url = repodata_url.rsplit("/", 1)[0]
+    valid_names = {pkg["fn"] for pkg in fetch_actions if pkg["url"].rsplit("/", 1)[0] == channel_url}
+    if not valid_names:
+        valid_names = {pkg["fn"] for pkg in fetch_actions}
+
+    with events.progressbar(len(valid_names), "Hotfix Patching repodata.json") as progress:
+        entries = fetch_repodata_entries(repodata_url, valid_names, client, repodata_cache, progress.update)
+    write_subdir_repodata_json(dest_dir, [entries], compression_formats)
+
+# read the entries named in wanted from an upstream repodata.json, as
+# {"packages": {fn: entry}, "packages.conda": {fn: entry}}
+def fetch_repodata_entries(repodata_url, wanted, client=None, repodata_cache=None, on_entry=None):
+    entries = {section: {} for section in REPODATA_SECTIONS}
+    with open_upstream_repodata(repodata_url, client, repodata_cache) as live_repodata:
+        for section, name, entry in iter_repodata_entries(io.TextIOWrapper(live_repodata, encoding="utf-8"), wanted):
+            entries[section][name] = entry
+            if on_entry is not None:
+                on_entry(1)
+    return entries
+
+# merge the entries read from every upstream channel of one vendored subdir
+# into its repodata.json
+def write_subdir_repodata_json(dest_dir, channel_entries, compression_formats=(), shards=False) -> dict:
+    dest_dir = Path(dest_dir)
     repo_data = {
         "info": {"subdir": dest_dir.name},
         "packages": {},
         "packages.conda": {},
     }
+    for entries in channel_entries:
+        for section in REPODATA_SECTIONS:
+            repo_data[section].update(entries[section])
+
+    # write to destination, atomically so a channel being updated in place
+    # never serves a partial index. compressed copies and shards this run
+    # does not write are removed rather than left describing an older one
+    dest_file = dest_dir / "repodata.json"
+    write_json_atomic(dest_file, repo_data)
+    write_compressed_repodata(dest_file, compression_formats)
+    write_current_repodata(dest_dir, repo_data)
+    if shards:
+        write_shards(dest_dir, repo_data)
+    else:
+        remove_shards(dest_dir)
+    return repo_data
 
-    valid_names = [pkg["fn"] for pkg in fetch_actions]
+# see https://stackoverflow.com/questions/21371809/cleanly-setting-max-retries-on-python-requests-get-or-post-method
+# pass the HttpClient shared by the running command to reuse its connection
+# pool, otherwise a one-off client is created for this request
+def improved_download(url, stream=False, client=None, headers=None):
+    if client is None:
+        client = HttpClient()
+    return client.get(url, stream=stream, headers=headers)
+
+# size of the chunks read from the network and fed to the SHA256 hash
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# errors after which an interrupted download is resumed from its .part file
+def _resumable_errors():
+    from requests.exceptions import ChunkedEncodingError, ConnectionError, Timeout
+    return (ConnectionError, ChunkedEncodingError, Timeout)
+
+# load the resume state of dest_path's .part file, ignoring state recorded
+# for a different package
+def _read_part_state(state_path, fetch_action_sha256):
+    try:
+        state = json.loads(state_path.read_text())
+    except (OSError, ValueError):
+        return None
+    if state.get("sha256") != fetch_action_sha256:
+        return None
+    return state
+
+def _content_range_start(response):
+    match = re.match(r"bytes (\d+)-", response.headers.get("Content-Range", ""))
+    return int(match.group(1)) if match else None
+
+# a package download answered with an HTTP error status
+class DownloadHTTPError(RuntimeError):
+    pass
 
-    live_repodata_json = improved_download(repodata_url).json()
-    with click.progressbar(live_repodata_json["packages"].items(), label="Hotfix Patching repodata.json") as repodata_packages:
-        if live_repodata_json.get("packages"):
-            for name, entry in repodata_packages:
-                if name in valid_names:
-                    repo_data["packages"][name] = entry
+# a downloaded package whose SHA256 differs from the one in its FETCH action
+class ChecksumMismatch(RuntimeError):
+    pass
 
-        if live_repodata_json.get("packages.conda"):
-            for name, entry in repodata_packages:
-                if name in valid_names:
-                    repo_data["packages.conda"][name] = entry
+# download url into part_path, continuing from the offset recorded in
+# state_path with a Range request when the server supports it. returns the
+# SHA256 hexdigest of the complete .part file. setting the cancel event
+# stops the transfer at the next chunk
+def _download_part(url, part_path, state_path, fetch_action_sha256, client=None, cancel=None):
+    state = _read_part_state(state_path, fetch_action_sha256)
+    offset = 0
+    headers = {}
+    if state is not None and part_path.exists():
+        offset = min(state.get("offset", 0), part_path.stat().st_size)
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+        # only resume if the file has not changed upstream since
+        validator = state.get("etag") or state.get("last_modified")
+        if validator:
+            headers["If-Range"] = validator
+
+    response = improved_download(url, stream=True, client=client, headers=headers)
+    try:
+        if offset and (response.status_code == 416 or response.status_code == 206 and _content_range_start(response) != offset):
+            # the server refused the range or sent a different one, ask for the whole file
+            response.close()
+            response = improved_download(url, stream=True, client=client, headers={})
+        # fail before touching the .part file, so an error response neither
+        # replaces the bytes downloaded so far nor is hashed as the package
+        if response.status_code >= 400:
+            raise DownloadHTTPError(f"Downloading {url} failed with HTTP {response.status_code}")
+        if response.status_code != 206:
+            # a full body, e.g. from a server without range support
+            offset = 0
+        elif _content_range_start(response) != offset:
+            raise RuntimeError(f"Downloading {url} returned an unexpected Content-Range")
+
+        state = {
+            "url": url,
+            "sha256": fetch_action_sha256,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "offset": offset,
+        }
+        write_json_atomic(state_path, state)
+
+        sha256 = hashlib.sha256()
+        with open(part_path, "r+b" if offset else "wb") as part_file:
+            # hash the bytes kept from the previous attempt
+            remaining = offset
+            while remaining:
+                chunk = part_file.read(min(DOWNLOAD_CHUNK_SIZE, remaining))
+                if not chunk:
+                    raise RuntimeError(f"{part_path} is shorter than its recorded offset")
+                sha256.update(chunk)
+                remaining -= len(chunk)
+            part_file.truncate(offset)
+
+            try:
+                metrics = client.metrics if client is not None else None
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    if cancel is not None and cancel.is_set():
+                        raise DownloadCancelled(url)
+                    sha256.update(chunk)
+                    part_file.write(chunk)
+                    state["offset"] += len(chunk)
+                    if metrics is not None:
+                        metrics.record_transfer(url, len(chunk))
+            except _resumable_errors() as err:
+                # errors while streaming the body are not seen by the client's retries
+                if client is not None:
+                    client.record_error(classify_error(err))
+                raise
+            finally:
+                # record how far we got so an interrupted download can resume
+                part_file.flush()
+                write_json_atomic(state_path, state)
+    finally:
+        response.close()
+    return sha256.hexdigest()
+
+# stream url into dest_path through a .part file in the same directory,
+# hashing each chunk as it arrives. interrupted transfers are resumed, in
+# this run or a later one, from the bytes already on disk. the .part file
+# is atomically renamed into place once the checksum matches and removed
+# otherwise
+def stream_download(url, dest_path, fetch_action_sha256, client=None, resume_attempts=3, cancel=None):
+    dest_path = Path(dest_path)
+    part_path = dest_path.with_name(f"{dest_path.name}.part")
+    state_path = dest_path.with_name(f"{dest_path.name}.part.json")
+
+    for attempt in range(resume_attempts + 1):
+        try:
+            calculated_sha256 = _download_part(url, part_path, state_path, fetch_action_sha256, client, cancel)
+            break
+        except _resumable_errors():
+            if attempt == resume_attempts:
+                raise
 
-        # write to destination
-        dest_file = Path(f"{dest_dir}/repodata.json")
-        with dest_file.open("w") as f:
-            json.dump(repo_data, f)
+    try:
+        compare_sha256_digest(calculated_sha256, fetch_action_sha256)
+    except RuntimeError:
+        part_path.unlink(missing_ok=True)
+        raise
+    finally:
+        state_path.unlink(missing_ok=True)
+    os.replace(part_path, dest_path)
+
+# download of a package that lost its race against a hedged request, or
+# of a run that failed
+class DownloadCancelled(Exception):
+    pass
 
-# see https://stackoverflow.com/questions/21371809/cleanly-setting-max-retries-on-python-requests-get-or-post-method
-def improved_download(url):
-    session = requests.Session()
-    retry = Retry(connect=5, backoff_factor=0.5)
-    adapter = HTTPAdapter(max_retries=retry)
-    session.mount("http://", adapter)
-    session.mount("https://", adapter)
-    return session.get(url)
+# set once any of the given events is set, for downloads that stop both
+# when they lose a race and when the whole run is cancelled
+class _AnyEvent:
+    def __init__(self, *events):
+        self.events = [event for event in events if event is not None]
+
+    def is_set(self):
+        return any(event.is_set() for event in self.events)
+
+# download url like stream_download, from the best of its channel and the
+# channel's mirrors. a transfer still running after the mirrors' hedge delay
+# gets a second request to the next best mirror, and the first of them to
+# pass the sha256 check wins. mirrors that fail are replaced by the next
+# one. setting cancel stops every attempt. returns the url the package was
+# downloaded from
+def hedged_download(url, dest_path, fetch_action_sha256, client, size=None, cancel=None):
+    dest_path = Path(dest_path)
+    mirrors = client.mirrors
+    # the attempts pick their mirror themselves
+    direct = client.without_mirrors()
+    candidates = deque(mirrors.candidates(url, size))
+    results = queue.Queue()
+    won = threading.Event()
+    stop = _AnyEvent(won, cancel)
+    # attempts finishing once this call has returned clean up after themselves
+    lock = threading.Lock()
+    returned = False
+
+    # remove what an attempt that did not win left in the channel
+    def _discard(target):
+        for leftover in (f"{target.name}.part", f"{target.name}.part.json"):
+            target.with_name(leftover).unlink(missing_ok=True)
+        if target != dest_path:
+            target.unlink(missing_ok=True)
+
+    def _attempt(candidate, target):
+        start = time.perf_counter()
+        err = None
+        try:
+            stream_download(candidate, target, fetch_action_sha256, client=direct, cancel=stop)
+            mirrors.record_transfer(candidate, target.stat().st_size, time.perf_counter() - start)
+        except BaseException as error:
+            err = error
+        with lock:
+            if not returned:
+                results.put((candidate, target, err))
+                return
+        _discard(target)
+
+    launched = 0
+    running = 0
+    started = 0.0
+    finished = []
+    winner = None
+
+    def _launch():
+        nonlocal launched, running, started
+        # later attempts download next to dest_path and are moved into place if they win
+        target = dest_path if not launched else dest_path.with_name(f"{dest_path.name}.mirror{launched}")
+        threading.Thread(target=_attempt, args=(candidates.popleft(), target), daemon=True).start()
+        launched += 1
+        running += 1
+        started = time.monotonic()
 
-def download_solved_pkgs(fetch_action_pkgs, vendored_path, platform):
-    click.echo(click.style("Downloading and Verifying SHA256 Checksums for Solved Packages", bold=True, fg='green'))
+    try:
+        _launch()
+        hedged = False
+        errors = []
+        while True:
+            timeout = None
+            if not hedged and candidates:
+                delay = mirrors.hedge_delay(size)
+                if delay is not None:
+                    timeout = max(0.0, started + delay - time.monotonic())
+            try:
+                candidate, target, err = results.get(timeout=timeout)
+                finished.append(target)
+            except queue.Empty:
+                hedged = True
+                if cancel is not None and cancel.is_set():
+                    # the running attempt is stopping, nothing to race
+                    continue
+                # falling behind the other transfers, race the next best mirror
+                mirrors.record_hedge(candidates[0])
+                events.emit("download_hedged", fn=dest_path.name, url=candidates[0], after=round(time.monotonic() - started, 3))
+                _launch()
+                continue
+            running -= 1
+            if err is None:
+                won.set()
+                winner = target
+                if target != dest_path:
+                    os.replace(target, dest_path)
+                return candidate
+            if cancel is not None and cancel.is_set():
+                raise DownloadCancelled(url)
+            mirrors.record_failure(candidate)
+            errors.append(err)
+            if candidates:
+                _launch()
+            elif not running:
+                raise errors[0]
+    finally:
+        # stop the attempts still running, they clean up on their own
+        won.set()
+        with lock:
+            returned = True
+        # the others failed or lost the race, some by moments
+        while not results.empty():
+            finished.append(results.get()[1])
+        for target in finished:
+            if target != winner:
+                _discard(target)
+
+# packages are downloaded largest first by a DownloadScheduler, so the few
+# huge packages of an environment overlap with the many small ones instead
+# of finishing the run alone. host_limit caps the concurrent downloads from
+# any one host. adaptive lets a ConcurrencyController run between 1 and
+# jobs downloads at once, following the client's response latencies and errors
+def download_solved_pkgs(fetch_action_pkgs, vendored_path, platform, jobs=1, client=None, cache=None, metrics=None, host_limit=None, adaptive=False):
+    controller = None
+    if adaptive:
+        controller = ConcurrencyController(max(1, jobs),
+                                           errors=client.error_counts if client is not None else None,
+                                           latencies=client.response_latencies if client is not None else None)
+    scheduler = DownloadScheduler(fetch_action_pkgs, host_limit=host_limit, controller=controller)
+    events.emit("download_start", "Downloading and Verifying SHA256 Checksums for Solved Packages", dict(bold=True, fg='green'),
+                packages=len(fetch_action_pkgs), bytes=scheduler.total_bytes, jobs=jobs, host_limit=host_limit,
+                concurrency=None if controller is None else controller.limit)
 
     def _download_solved_pkgs(pkg, vendored_path, platform):
-        platform_path = vendored_path / platform
-        response = improved_download(pkg['url'])
-        content = response.content
-
-        # verify checksum
-        compare_sha256(content, pkg['sha256'])
-        with open(platform_path / pkg['fn'], "wb") as conda_pkg:
-            conda_pkg.write(content)
-
-    with click.progressbar(fetch_action_pkgs, label="Downloading Progress") as pkgs:
-        for pkg in pkgs:
-            if pkg['subdir'] == 'noarch':
-                _download_solved_pkgs(pkg, vendored_path, "noarch")
+        dest_path = vendored_path / platform / pkg['fn']
+        # packages already in the cache were verified when they were added
+        if cache is not None and cache.materialize(pkg['sha256'], dest_path):
+            return "cache", 0.0
+        # verify checksum while streaming to disk
+        start = time.perf_counter()
+        if client is not None and client.mirrors is not None and client.mirrors.is_mirrored(pkg['url']):
+            hedged_download(pkg['url'], dest_path, pkg['sha256'], client, size=pkg.get('size'), cancel=cancel)
+        else:
+            stream_download(pkg['url'], dest_path, pkg['sha256'], client=client, cancel=cancel)
+        seconds = time.perf_counter() - start
+        if metrics is not None:
+            metrics.record_download(seconds)
+        if cache is not None:
+            cache.add(pkg['sha256'], dest_path)
+        return "network", seconds
+
+    def _download_pkg(pkg):
+        if pkg['subdir'] == 'noarch':
+            return _download_solved_pkgs(pkg, vendored_path, "noarch")
+        # packages merged from several platform solves carry their own subdir
+        return _download_solved_pkgs(pkg, vendored_path, pkg.get('subdir') or platform)
+
+    # each worker takes the next package from the scheduler until none are
+    # left, handing results back to this thread for progress reporting
+    results = queue.Queue()
+    # set when the run fails, so downloads in flight stop at their next chunk
+    cancel = threading.Event()
+
+    def _worker():
+        while (pkg := scheduler.next()) is not None:
+            try:
+                result = _download_pkg(pkg)
+            except BaseException as err:
+                scheduler.done(pkg, network=False)
+                results.put((pkg, None, err))
             else:
-                _download_solved_pkgs(pkg, vendored_path, platform)
+                scheduler.done(pkg, network=result[0] == "network")
+                results.put((pkg, result, None))
+
+    # progress is measured in bytes so its ETA follows the observed throughput
+    weight = scheduler.size if scheduler.total_bytes else (lambda pkg: 1)
+    reported = 0
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        for _ in range(max(1, jobs)):
+            executor.submit(_worker)
+        with events.progressbar(scheduler.total_bytes or len(fetch_action_pkgs), "Downloading Progress") as progress:
+            for _ in fetch_action_pkgs:
+                pkg, result, err = results.get()
+                if err is not None:
+                    # stop scheduling the remaining downloads, stop those in
+                    # flight and fail the run
+                    cancel.set()
+                    scheduler.cancel()
+                    events.emit("package_failed", f"{pkg['fn']}: {err}", fn=pkg['fn'], url=pkg['url'], error=str(err))
+                    if isinstance(err, ChecksumMismatch):
+                        sys.exit("SHA256 Checksum Validation Failed")
+                    if not isinstance(err, RuntimeError):
+                        raise err
+                    sys.exit(f"Failed to download {pkg['fn']}: {err}")
+                source, seconds = result
+                eta = scheduler.eta()
+                events.emit("package_verified", fn=pkg['fn'], subdir=pkg['subdir'], sha256=pkg['sha256'], source=source, seconds=round(seconds, 3),
+                            size=pkg.get('size'), eta_seconds=None if eta is None else round(eta, 1))
+                if controller is not None:
+                    while reported < len(controller.decisions):
+                        events.emit("concurrency_change", **controller.decisions[reported])
+                        reported += 1
+                progress.update(weight(pkg))
+
+    if controller is not None:
+        report = controller.report()
+        if metrics is not None:
+            metrics.concurrency = report
+        events.emit("concurrency", f"Download Concurrency: {report['initial']} to {report['final']} of at most {report['max']} after {len(report['decisions'])} adjustments", dict(fg='cyan'),
+                    **report)
+
+    if cache is not None:
+        cache.evict()
+        skipped = getattr(cache, "skipped", 0)
+        message = f"Package Cache: {cache.hits} reused from {cache.root}, {cache.misses} downloaded"
+        if skipped:
+            message += f", {skipped} not cached (a copy would be needed, set --cache-max-size to cache them)"
+        events.emit("package_cache", message, dict(fg='cyan'),
+                    root=cache.root, hits=cache.hits, misses=cache.misses, skipped=skipped)
+        if metrics is not None:
+            metrics.record_cache("packages", cache.hits, cache.misses)
 
 def compare_sha256(byte_array, fetch_action_sha256):
-    calculated_sha256 = hashlib.sha256(byte_array).hexdigest()
+    compare_sha256_digest(hashlib.sha256(byte_array).hexdigest(), fetch_action_sha256)
+
+def compare_sha256_digest(calculated_sha256, fetch_action_sha256):
     if calculated_sha256 != fetch_action_sha256:
-        raise RuntimeError(f"Calculated SHA256 does not match repodata.json SHA256")
-        sys.exit("SHA256 Checksum Validation Failed")
+        raise ChecksumMismatch(f"Calculated SHA256 does not match repodata.json SHA256")
 
 #see https://github.com/conda/conda/blob/248741a843e8ce9283fa94e6e4ec9c2fafeb76fd/conda/base/context.py#L51
 def get_conda_platform(platform=sys.platform, custom_platform=None) -> str:
@@ -229,26 +815,114 @@ def get_conda_platform(platform=sys.platform, custom_platform=None) -> str:
     bits = struct.calcsize("P") * 8
     return f"{_platform_map[platform]}-{bits}"
 
+# conda subdirs are noarch or <os>-<arch>, other directories in a vendored
+# channel such as the vendor-batch environments/ manifests are left alone
+SUBDIR_PATTERN = re.compile(r"noarch|[a-z0-9]+-[a-z0-9_]+")
+
+def is_subdir(path) -> bool:
+    return path.is_dir() and SUBDIR_PATTERN.fullmatch(path.name) is not None
+
+# write an empty repodata.json to vendored subdirs without any packages, so
+# every subdir is a valid part of the channel and subdirs emptied by an
+# update stop listing packages that were removed
+def write_empty_repodata_json(fetch_action_packages, vendored_dir_path, compression_formats=(), shards=False):
+    subdirs_with_pkgs = {pkg["subdir"] for pkg in fetch_action_packages}
+    for subdir_path in sorted(Path(vendored_dir_path).iterdir()):
+        if not is_subdir(subdir_path) or subdir_path.name in subdirs_with_pkgs:
+            continue
+        write_subdir_repodata_json(subdir_path, [], compression_formats, shards)
+
+# text mode banner describing a package whose repodata entry is vendored
+def _package_banner(pkg):
+    rule = click.style("========================================================================", fg='blue', bold=True)
+    details = click.style(f"Channel: {pkg['channel']}\nPackage: {pkg['fn']}\nURL: {pkg['url']}\nSHA256: {pkg['sha256']}\nSubdirectory: {pkg['subdir']}\nTimestamp: {pkg['timestamp']}", fg='yellow')
+    return f"{rule}\n{details}\n{rule}"
+
 # hotfix vendored repodata.json given the input of FETCH action packages
-# from conda-lock's solve results
-def hotfix_vendored_repodata_json(fetch_action_packages, vendored_dir_path):
-    channels = []
-    subdirs = []
+# from conda-lock's solve results. every upstream (channel, subdir)
+# repodata.json is fetched and filtered concurrently, so several channels
+# take as long as the slowest of them
+def hotfix_vendored_repodata_json(fetch_action_packages, vendored_dir_path, client=None, repodata_cache=None, compression_formats=(), shards=False):
+    # group the packages by the upstream repodata.json listing them
+    groups = {}
     for pkg in fetch_action_packages:
-        channels.append(pkg["channel"])
-        subdirs.append(pkg["subdir"])
-        click.echo(click.style("========================================================================", fg='blue', bold=True))
-        click.echo(click.style(f"Channel: {pkg['channel']}\nPackage: {pkg['fn']}\nURL: {pkg['url']}\nSHA256: {pkg['sha256']}\nSubdirectory: {pkg['subdir']}\nTimestamp: {pkg['timestamp']}", fg='yellow'))
-        click.echo(click.style("========================================================================", fg='blue', bold=True))
-
-    # patch repodata.json for each channel + subdir
-    channels = list(set(channels))
-    subdirs = list(set(subdirs))
-    for channel in channels:
-        for subdir in subdirs:
-            if subdir in channel:
-                click.echo(click.style(f"Reconstructing repodata.json with Hotfix for {subdir} using {channel}/repodata.json", bold=True, fg='red'))
-                reconstruct_repodata_json(f"{channel}/repodata.json", vendored_dir_path / subdir, fetch_action_packages)
+        groups.setdefault((pkg["channel"], pkg["subdir"]), set()).add(pkg["fn"])
+        events.emit("package", _package_banner(pkg), banner=True,
+                    channel=pkg['channel'], fn=pkg['fn'], url=pkg['url'], sha256=pkg['sha256'], subdir=pkg['subdir'], timestamp=pkg.get('timestamp'))
+
+    write_empty_repodata_json(fetch_action_packages, vendored_dir_path, compression_formats, shards)
+
+    subdir_entries = {}
+    with ThreadPoolExecutor(max_workers=max(1, len(groups))) as executor:
+        futures = {}
+        for (channel, subdir), wanted in groups.items():
+            events.emit("repodata_fetch", f"Reconstructing repodata.json with Hotfix for {subdir} using {channel}/repodata.json", dict(bold=True, fg='red'),
+                        channel=channel, subdir=subdir, packages=len(wanted))
+            futures[executor.submit(fetch_repodata_entries, f"{channel}/repodata.json", wanted, client, repodata_cache)] = subdir
+        with events.progressbar(len(fetch_action_packages), "Hotfix Patching repodata.json") as progress:
+            for future in as_completed(futures):
+                entries = future.result()
+                subdir_entries.setdefault(futures[future], []).append(entries)
+                progress.update(sum(len(entries[section]) for section in REPODATA_SECTIONS))
+
+    # patch repodata.json once per vendored subdir
+    subdir_repodata = {}
+    for subdir, channel_entries in subdir_entries.items():
+        subdir_repodata[subdir] = write_subdir_repodata_json(vendored_dir_path / subdir, channel_entries, compression_formats, shards)
+    write_channeldata(vendored_dir_path, subdir_repodata)
+
+# download fetch_action_packages (or only pkgs_to_download) into the
+# vendored channel and write its repodata.json, sharing one pooled HTTP
+# client between both steps. cache_dir=None disables every cache, pool_dir
+# stores the packages in a shared pool the channel links into instead
+def vendor_fetch_actions(fetch_action_packages, vendored_dir_path, platform, pkgs_to_download=None, jobs=1, client_options=None,
+                         cache_dir=None, cache_max_size=None, repodata_max_age=None, offline=False, compression_formats=(), shards=False, pool_dir=None, metrics=None, host_limit=None, adaptive=False):
+    if pkgs_to_download is None:
+        pkgs_to_download = fetch_action_packages
+
+    # one pooled client for every repodata.json and package download
+    with HttpClient(metrics=metrics, **(client_options or {})) as client:
+        # download and verify packages to appropriate subdir, before the
+        # repodata.json that references them is (re)written
+        if pool_dir is not None:
+            cache = PackagePool(pool_dir)
+            cache.register_channel(vendored_dir_path)
+        else:
+            cache = None if cache_dir is None else PackageCache(cache_dir, max_size=cache_max_size)
+        with phase(metrics, "download_packages"):
+            download_solved_pkgs(pkgs_to_download, vendored_dir_path, platform, jobs=jobs, client=client, cache=cache, metrics=metrics, host_limit=host_limit, adaptive=adaptive)
+        events.emit("download_complete", f"SHA256 Checksum Validation and Solved Packages Downloads Complete for {vendored_dir_path}", dict(bold=True, fg='green'),
+                    channel=vendored_dir_path, packages=len(pkgs_to_download))
+
+        repodata_cache = None if cache_dir is None else RepodataCache(cache_dir, max_age=repodata_max_age, offline=offline)
+        try:
+            with phase(metrics, "repodata_hotfix"):
+                hotfix_vendored_repodata_json(fetch_action_packages, vendored_dir_path, client=client, repodata_cache=repodata_cache, compression_formats=compression_formats, shards=shards)
+        except RuntimeError as err:
+            events.emit("error", str(err), error=str(err))
+            sys.exit("Failed to reconstruct repodata.json")
+        if repodata_cache is not None:
+            events.emit("repodata_cache", f"Repodata Cache: {repodata_cache.hits} reused, {repodata_cache.revalidated} revalidated, {repodata_cache.downloads} downloaded", dict(fg='cyan'),
+                        hits=repodata_cache.hits, revalidated=repodata_cache.revalidated, downloads=repodata_cache.downloads)
+            if metrics is not None:
+                metrics.record_cache("repodata", repodata_cache.hits + repodata_cache.revalidated, repodata_cache.downloads)
+
+        stats = client.connection_stats()
+        errors = client.error_counts()
+        if metrics is not None:
+            metrics.http = {**stats, "errors": errors, "timeout": client.timeout}
+        if errors:
+            summary = ", ".join(f"{count} {error_class}" for error_class, count in sorted(errors.items()))
+            events.emit("http_errors", f"HTTP Errors Retried: {summary}", dict(fg='yellow'), errors=errors)
+        if client.mirrors is not None:
+            report = client.mirrors.report()
+            if metrics is not None:
+                metrics.mirrors = report
+            for channel, bases in report.items():
+                summary = ", ".join(f"{base} {stats['requests']} requests {stats['failures']} failures {stats['hedges']} hedges" for base, stats in bases.items())
+                events.emit("mirrors", f"Mirrors of {channel}: {summary}", dict(fg='cyan'), channel=channel, mirrors=bases)
+        events.emit("http_connections", f"HTTP Connections: {stats['connections']} opened across {stats['hosts']} hosts, {stats['reused']} of {stats['requests']} requests reused a connection", dict(fg='cyan'),
+                    **stats)
 
 @click.group()
 @click.version_option(__version__)
@@ -261,6 +935,16 @@ def main() -> None:
     "--file",
     default=None,
     help="Path to environment.yaml")
+@click.option(
+    "--from-lock",
+    multiple=True,
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="Vendor the packages recorded in a lock file written by --write-lock instead of solving. Repeat for several platforms.")
+@click.option(
+    "--write-lock",
+    default=None,
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Save the solved FETCH actions to this lock file. With several platforms one file per platform is written, e.g. env.linux-64.json.")
 @click.option(
     "--solver",
     default="conda",
@@ -268,8 +952,9 @@ def main() -> None:
 @click.option(
     "--platform",
     "-p",
-    default=get_conda_platform(),
-    help="Platform to solve for.")
+    multiple=True,
+    default=lambda: [get_conda_platform()],
+    help="Platform to solve for. Repeat to vendor several platforms into one channel.")
 @click.option(
     "--dry-run",
     default=False,
@@ -278,47 +963,242 @@ def main() -> None:
     "--ironbank-gen",
     default=False,
     help="Save IronBank Resources 'ib_manifest.yaml' in current directory")
-def vendor(file,solver, platform, dry_run, ironbank_gen):
-
-    click.echo(click.style(f"Vendoring Local Channel for file: {file}", fg='green'))
-
-    # handle environment.yaml
-    environment_yaml = Path(file)
-
-    # create vendored channel directory if dry_run=False
-    if not dry_run:
-        vendored_dir_path = create_vendored_dir(environment_yaml, platform)
-    else:
-        click.echo(click.style("Dry Run - Will Not Download Files", bold=True, fg='red'))
-
-    # generate conda-locks LockSpecification
-    lock_spec = get_lock_spec_for_environment_file(environment_yaml, platform)
-
-    # generate DryRunInstall
-    dry_run_install = solve_environment(lock_spec, solver, platform)
-
-    # generate List[FetchAction]
-    # a FetchAction object includes all the entries from the corresponding
-    # package's repodata.json
-    fetch_action_packages = get_fetch_actions(solver, platform, dry_run_install)
+@click.option(
+    "--jobs",
+    "-j",
+    default=4,
+    type=click.IntRange(min=1),
+    help="Number of packages to download concurrently.")
+@click.option(
+    "--host-limit",
+    default=None,
+    type=click.IntRange(min=1),
+    help="Most packages downloaded concurrently from any one host. Defaults to --jobs.")
+@click.option(
+    "--mirror",
+    multiple=True,
+    metavar="CHANNEL=URL",
+    help="Also fetch packages and repodata.json of CHANNEL from the mirror at URL, using whichever responds fastest. Can be repeated.")
+@click.option(
+    "--hedge-percentile",
+    default=95,
+    type=click.IntRange(min=50, max=99),
+    help="Send a second request to another mirror when a download is slower than this percentile of those seen so far.")
+@click.option(
+    "--pool-size",
+    default=None,
+    type=click.IntRange(min=1),
+    help="Keep-alive connections kept per host. Defaults to --jobs.")
+@click.option(
+    "--retries",
+    default=5,
+    type=click.IntRange(min=0),
+    help="Connection retries per request.")
+@click.option(
+    "--timeout",
+    default=None,
+    type=click.FloatRange(min=0, min_open=True),
+    help="Seconds to wait on the network before failing a request. Replaces both --connect-timeout and --read-timeout.")
+@click.option(
+    "--connect-timeout",
+    default=DEFAULT_CONNECT_TIMEOUT,
+    show_default=True,
+    type=click.FloatRange(min=0, min_open=True),
+    help="Seconds to wait for a connection to a server.")
+@click.option(
+    "--read-timeout",
+    default=DEFAULT_READ_TIMEOUT,
+    show_default=True,
+    type=click.FloatRange(min=0, min_open=True),
+    help="Seconds to wait for each read from a connected server before retrying.")
+@click.option(
+    "--adaptive-jobs",
+    is_flag=True,
+    default=False,
+    help="Adapt the downloads run at once between 1 and --jobs to server latency and errors, instead of always running --jobs.")
+@click.option(
+    "--cache-dir",
+    default=None,
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Directory of the package cache shared across runs. Defaults to ~/.cache/conda-vendor.")
+@click.option(
+    "--cache-max-size",
+    default=None,
+    help="Evict least recently used cached packages above this size, e.g. 20G. Without it, packages are only cached where they can be hardlinked or reflinked into the cache.")
+@click.option(
+    "--no-cache",
+    is_flag=True,
+    default=False,
+    help="Disable the package, repodata.json and solve caches.")
+@click.option(
+    "--solve-max-age",
+    default=DEFAULT_SOLVE_MAX_AGE,
+    show_default=True,
+    type=click.IntRange(min=0),
+    help="Solve again instead of reusing a cached solve older than this many seconds, 0 always solves.")
+@click.option(
+    "--repodata-max-age",
+    default=None,
+    type=click.IntRange(min=0),
+    help="Reuse cached upstream repodata.json younger than this many seconds without revalidating it.")
+@click.option(
+    "--offline",
+    is_flag=True,
+    default=False,
+    help="Only use cached upstream repodata.json, never fetch it.")
+@click.option(
+    "--compress-repodata",
+    multiple=True,
+    type=click.Choice(COMPRESSION_FORMATS),
+    help="Also write repodata.json.bz2 / repodata.json.zst for each vendored subdir. Can be repeated.")
+@click.option(
+    "--shards",
+    is_flag=True,
+    default=False,
+    help="Also write CEP-16 sharded repodata (repodata_shards.msgpack.zst) for each vendored subdir.")
+@click.option(
+    "--pool",
+    "pool_dir",
+    default=None,
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Store packages once in this shared pool and hardlink them into the channel. Use `conda-vendor gc` to reclaim unused entries.")
+@click.option(
+    "--update",
+    is_flag=True,
+    default=False,
+    help="Update an existing vendored channel in place, downloading only new or changed packages.")
+@click.option(
+    "--prune",
+    is_flag=True,
+    default=False,
+    help="With --update, delete vendored packages that are no longer needed.")
+@click.option(
+    "--metrics-json",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="Write per-phase timings, transfer sizes, download latencies and cache hit rates to this JSON file.")
+@click.option(
+    "--output",
+    default="text",
+    type=click.Choice(OUTPUT_FORMATS),
+    help="text for styled progress output, ndjson for one JSON event per line.")
+@click.option(
+    "--output-file",
+    default=None,
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Write progress output to this file instead of stdout.")
+@click.option(
+    "--quiet",
+    "-q",
+    is_flag=True,
+    default=False,
+    help="Drop the per-package banners and progress bars.")
+def vendor(file, from_lock, write_lock, solver, platform, dry_run, ironbank_gen, jobs, host_limit, mirror, hedge_percentile, pool_size, retries, timeout, connect_timeout, read_timeout, adaptive_jobs, cache_dir, cache_max_size, no_cache, solve_max_age, repodata_max_age, offline, compress_repodata, shards, pool_dir, update, prune, metrics_json, output, output_file, quiet):
 
-    # generate hotfix repodata.json for each channel and subdir
-    if not dry_run:
-        hotfix_vendored_repodata_json(fetch_action_packages, vendored_dir_path)
+    if (file is None) == (not from_lock):
+        raise click.UsageError("Exactly one of --file or --from-lock is required")
+    try:
+        cache_max_size = parse_size(cache_max_size) if cache_max_size is not None else None
+    except ValueError as err:
+        raise click.BadParameter(str(err), param_hint="--cache-max-size")
+    if offline and no_cache:
+        raise click.UsageError("--offline requires the cache, it cannot be combined with --no-cache")
+    if prune and not update:
+        raise click.UsageError("--prune can only be used with --update")
+    try:
+        mirrors = MirrorSet.from_options(mirror, hedge_percentile) if mirror else None
+    except ValueError as err:
+        raise click.BadParameter(str(err), param_hint="--mirror")
+
+    with events.event_stream(output, output_file, quiet):
+        _vendor(file=file, from_lock=from_lock, write_lock=write_lock, solver=solver, platform=platform,
+                dry_run=dry_run, ironbank_gen=ironbank_gen, jobs=jobs, host_limit=host_limit,
+                mirrors=mirrors, pool_size=pool_size, retries=retries, timeout=timeout,
+                connect_timeout=connect_timeout, read_timeout=read_timeout, adaptive_jobs=adaptive_jobs,
+                cache_dir=cache_dir, cache_max_size=cache_max_size, no_cache=no_cache, solve_max_age=solve_max_age,
+                repodata_max_age=repodata_max_age, offline=offline, compress_repodata=compress_repodata,
+                shards=shards, pool_dir=pool_dir, update=update, prune=prune, metrics_json=metrics_json)
+
+
+# body of the vendor command, run with its events routed to --output. the
+# options are keyword only, several of them are flags that would be easy to swap
+def _vendor(*, file, from_lock, write_lock, solver, platform, dry_run, ironbank_gen, jobs, host_limit, mirrors, pool_size, retries, timeout, connect_timeout, read_timeout, adaptive_jobs, cache_dir, cache_max_size, no_cache, solve_max_age, repodata_max_age, offline, compress_repodata, shards, pool_dir, update, prune, metrics_json):
+    events.emit("vendor_start", f"Vendoring Local Channel for file: {file or ', '.join(map(str, from_lock))}", dict(fg='green'),
+                file=file, from_lock=list(from_lock))
+
+    metrics = Metrics() if metrics_json is not None else None
+    with phase(metrics, "total"):
+        platforms = list(dict.fromkeys(platform))
+        if from_lock:
+            locks = [load_lock(lock_file) for lock_file in from_lock]
+            platforms = [lock["platform"] for lock in locks]
+            environment_name = locks[0]["name"]
+        else:
+            # handle environment.yaml
+            environment_yaml = Path(file)
+            environment_name = get_environment_name(environment_yaml)
 
-        # download and verify packages to appropriate subdir
-        download_solved_pkgs(fetch_action_packages, vendored_dir_path, platform)
-        click.echo(click.style(f"SHA256 Checksum Validation and Solved Packages Downloads Complete for {vendored_dir_path}", bold=True, fg='green'))
+        # create vendored channel directory if dry_run=False
+        if not dry_run:
+            vendored_dir_path = create_vendored_channel_dir(environment_name, platforms, update=update)
+        else:
+            events.emit("dry_run_start", "Dry Run - Will Not Download Files", dict(bold=True, fg='red'))
+
+        if not from_lock:
+            # platforms are solved concurrently in worker processes
+            solve_cache = None if no_cache else SolveCache(cache_dir or default_cache_dir(), max_age=solve_max_age)
+            locks = resolve_platforms(environment_yaml, solver, platforms, solve_cache, metrics=metrics)
+        if write_lock is not None:
+            for lock in locks:
+                write_lock_file(write_lock if len(locks) == 1 else platform_lock_path(write_lock, lock["platform"]), lock)
+        fetch_action_packages = merge_fetch_actions(locks)
+
+        # generate hotfix repodata.json for each channel and subdir
+        if not dry_run:
+            pkgs_to_download = fetch_action_packages
+            if update:
+                pkgs_to_download, stale_pkgs = diff_vendored_channel(fetch_action_packages, vendored_dir_path)
+                events.emit("update_plan", f"Updating {vendored_dir_path}: {len(pkgs_to_download)} of {len(fetch_action_packages)} packages new or changed, {len(stale_pkgs)} no longer needed", dict(bold=True, fg='cyan'),
+                            channel=vendored_dir_path, packages=len(fetch_action_packages), download=len(pkgs_to_download), stale=len(stale_pkgs))
+
+            vendor_fetch_actions(
+                fetch_action_packages,
+                vendored_dir_path,
+                platforms[0],
+                pkgs_to_download=pkgs_to_download,
+                jobs=jobs,
+                host_limit=host_limit,
+                adaptive=adaptive_jobs,
+                client_options=dict(pool_size=pool_size or jobs, retries=retries, timeout=timeout, connect_timeout=connect_timeout, read_timeout=read_timeout, mirrors=mirrors),
+                cache_dir=None if no_cache else cache_dir or default_cache_dir(),
+                cache_max_size=cache_max_size,
+                repodata_max_age=repodata_max_age,
+                offline=offline,
+                compression_formats=compress_repodata,
+                shards=shards,
+                pool_dir=pool_dir,
+                metrics=metrics)
+
+            if prune:
+                for stale_pkg in stale_pkgs:
+                    stale_pkg.unlink()
+                events.emit("pruned", f"Pruned {len(stale_pkgs)} packages no longer needed", dict(fg='cyan'), packages=[p.name for p in stale_pkgs])
+
+            events.emit("vendor_complete", f"Vendoring Complete!\nVendored Channel: {vendored_dir_path}", dict(bold=True, fg='green'), channel=vendored_dir_path)
+        else:
+            events.emit("dry_run_complete", "Dry Run Complete!", dict(bold=True, fg='red'))
+            json_formatted_packages = json.dumps(fetch_action_packages, indent=4)
+            events.emit("fetch_actions", json_formatted_packages, dict(fg='green'), fetch_actions=fetch_action_packages)
 
-        click.echo(click.style(f"Vendoring Complete!\nVendored Channel: {vendored_dir_path}", bold=True, fg='green'))
-    else:
-        click.echo(click.style("Dry Run Complete!", bold=True, fg='red'))
-        json_formatted_packages = json.dumps(fetch_action_packages, indent=4)
-        click.echo(click.style(json_formatted_packages, fg='green'))
+        if ironbank_gen:
+            events.emit("ironbank_start", "Generating IronBank Resources Formatted Text", dict(bold=True, fg='cyan'))
+            yaml_dump_ironbank_manifest(fetch_action_packages)
 
-    if ironbank_gen:
-        click.echo(click.style("Generating IronBank Resources Formatted Text Below:", bold=True, fg='cyan'))
-        yaml_dump_ironbank_manifest(fetch_action_packages)
+    if metrics is not None:
+        if not from_lock and solve_cache is not None:
+            metrics.record_cache("solves", metrics.counters["solve_cache_hits"], metrics.counters["solve_cache_misses"])
+        write_json_atomic(metrics_json, metrics.report(), indent=2)
+        events.emit("metrics_written", f"Metrics written to {metrics_json}", dict(fg='cyan'), path=metrics_json)
 
 @click.command("ironbank-gen", help="Generate Formatted Text to use in IronBank's Hardening Manifest")
 @click.option(
@@ -332,28 +1212,376 @@ def vendor(file,solver, platform, dry_run, ironbank_gen):
 @click.option(
     "--platform",
     "-p",
-    default=get_conda_platform(),
+    default=get_conda_platform,
     help="Platform to solve for.")
-def ironbank_gen(file, solver, platform):
+@click.option(
+    "--from-lock",
+    default=None,
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="Use the packages recorded in a lock file written by 'vendor --write-lock' instead of solving.")
+@click.option(
+    "--cache-dir",
+    default=None,
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Directory of the solve cache shared across runs. Defaults to ~/.cache/conda-vendor.")
+@click.option(
+    "--no-cache",
+    is_flag=True,
+    default=False,
+    help="Always solve instead of reusing a cached solve.")
+@click.option(
+    "--solve-max-age",
+    default=DEFAULT_SOLVE_MAX_AGE,
+    show_default=True,
+    type=click.IntRange(min=0),
+    help="Solve again instead of reusing a cached solve older than this many seconds, 0 always solves.")
+def ironbank_gen(file, solver, platform, from_lock, cache_dir, no_cache, solve_max_age):
     click.echo(click.style("Generating Formatted Text for IronBank Hardening Manifest", bold=True, fg='green'))
-     # handle environment.yaml
-    environment_yaml = Path(file)
 
-    # generate conda-locks LockSpecification
-    lock_spec = get_lock_spec_for_environment_file(environment_yaml)
+    if (file is None) == (from_lock is None):
+        raise click.UsageError("Exactly one of --file or --from-lock is required")
 
-    # generate DryRunInstall
-    dry_run_install = solve_environment(lock_spec, solver, platform)
+    if from_lock is not None:
+        lock = load_lock(from_lock)
+    else:
+        # handle environment.yaml
+        environment_yaml = Path(file)
+        solve_cache = None if no_cache else SolveCache(cache_dir or default_cache_dir(), max_age=solve_max_age)
+        lock = resolve_environment(environment_yaml, solver, platform, solve_cache)
 
-    # generate List[FetchAction]
-    # a FetchAction object includes all the entries from the corresponding
-    # package's repodata.json
-    fetch_action_packages = get_fetch_actions(solver, platform, dry_run_install)
+    yaml_dump_ironbank_manifest(lock["fetch_actions"])
 
-    yaml_dump_ironbank_manifest(fetch_action_packages)
+@click.command("vendor-batch", help="Vendor many environment files into one deduplicated channel")
+@click.option(
+    "--file",
+    "files",
+    multiple=True,
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="Path to an environment.yaml. Can be repeated.")
+@click.option(
+    "--dir",
+    "env_dir",
+    default=None,
+    type=click.Path(exists=True, file_okay=False, path_type=Path),
+    help="Directory whose *.yaml / *.yml environment files are all vendored.")
+@click.option(
+    "--name",
+    default="vendored-batch",
+    help="Name of the merged vendored channel directory.")
+@click.option(
+    "--solver",
+    default="conda",
+    help="Solver to use. conda, mamba, micromamba")
+@click.option(
+    "--platform",
+    "-p",
+    multiple=True,
+    default=lambda: [get_conda_platform()],
+    help="Platform to solve for. Can be repeated.")
+@click.option(
+    "--jobs",
+    "-j",
+    default=4,
+    type=click.IntRange(min=1),
+    help="Number of packages to download concurrently.")
+@click.option(
+    "--host-limit",
+    default=None,
+    type=click.IntRange(min=1),
+    help="Most packages downloaded concurrently from any one host. Defaults to --jobs.")
+@click.option(
+    "--adaptive-jobs",
+    is_flag=True,
+    default=False,
+    help="Adapt the downloads run at once between 1 and --jobs to server latency and errors, instead of always running --jobs.")
+@click.option(
+    "--mirror",
+    multiple=True,
+    metavar="CHANNEL=URL",
+    help="Also fetch packages and repodata.json of CHANNEL from the mirror at URL, using whichever responds fastest. Can be repeated.")
+@click.option(
+    "--hedge-percentile",
+    default=95,
+    type=click.IntRange(min=50, max=99),
+    help="Send a second request to another mirror when a download is slower than this percentile of those seen so far.")
+@click.option(
+    "--solve-jobs",
+    default=None,
+    type=click.IntRange(min=1),
+    help="Number of environments solved concurrently. Defaults to the number of CPUs.")
+@click.option(
+    "--cache-dir",
+    default=None,
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Directory of the cache shared across runs. Defaults to ~/.cache/conda-vendor.")
+@click.option(
+    "--no-cache",
+    is_flag=True,
+    default=False,
+    help="Disable the package, repodata.json and solve caches.")
+@click.option(
+    "--solve-max-age",
+    default=DEFAULT_SOLVE_MAX_AGE,
+    show_default=True,
+    type=click.IntRange(min=0),
+    help="Solve again instead of reusing a cached solve older than this many seconds, 0 always solves.")
+@click.option(
+    "--compress-repodata",
+    multiple=True,
+    type=click.Choice(COMPRESSION_FORMATS),
+    help="Also write repodata.json.bz2 / repodata.json.zst for each vendored subdir. Can be repeated.")
+@click.option(
+    "--shards",
+    is_flag=True,
+    default=False,
+    help="Also write CEP-16 sharded repodata (repodata_shards.msgpack.zst) for each vendored subdir.")
+@click.option(
+    "--pool",
+    "pool_dir",
+    default=None,
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Store packages once in this shared pool and hardlink them into the channel. Use `conda-vendor gc` to reclaim unused entries.")
+@click.option(
+    "--output",
+    default="text",
+    type=click.Choice(OUTPUT_FORMATS),
+    help="text for styled progress output, ndjson for one JSON event per line.")
+@click.option(
+    "--output-file",
+    default=None,
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Write progress output to this file instead of stdout.")
+@click.option(
+    "--quiet",
+    "-q",
+    is_flag=True,
+    default=False,
+    help="Drop the per-package banners and progress bars.")
+def vendor_batch(files, env_dir, name, solver, platform, jobs, host_limit, adaptive_jobs, mirror, hedge_percentile, solve_jobs, cache_dir, no_cache, solve_max_age, compress_repodata, shards, pool_dir, output, output_file, quiet):
+    environment_files = list(files)
+    if env_dir is not None:
+        environment_files += sorted(p for p in env_dir.iterdir() if p.suffix in (".yaml", ".yml"))
+    environment_files = list(dict.fromkeys(environment_files))
+    if not environment_files:
+        raise click.UsageError("At least one --file or a --dir containing environment files is required")
+    try:
+        mirrors = MirrorSet.from_options(mirror, hedge_percentile) if mirror else None
+    except ValueError as err:
+        raise click.BadParameter(str(err), param_hint="--mirror")
+
+    with events.event_stream(output, output_file, quiet):
+        platforms = list(dict.fromkeys(platform))
+        events.emit("vendor_start", f"Vendoring {len(environment_files)} Environment Files into Channel: {name}", dict(fg='green'),
+                    files=environment_files, name=name)
+        vendored_dir_path = create_vendored_channel_dir(name, platforms)
+
+        # every environment and platform is solved concurrently
+        cache_dir = None if no_cache else cache_dir or default_cache_dir()
+        solve_cache = None if cache_dir is None else SolveCache(cache_dir, max_age=solve_max_age)
+        environments = [(environment_file, p) for environment_file in environment_files for p in platforms]
+        locks = resolve_environments(environments, solver, solve_cache, max_workers=solve_jobs)
+
+        try:
+            fetch_action_packages = merge_fetch_actions(locks)
+        except ValueError as err:
+            events.emit("error", str(err), error=str(err))
+            sys.exit("Environment files resolve to conflicting packages")
+        total_pkgs = sum(len(lock["fetch_actions"]) for lock in locks)
+        events.emit("merged", f"{len(fetch_action_packages)} Unique Packages Needed Across {total_pkgs} Solved Packages", dict(bold=True, fg='cyan'),
+                    packages=len(fetch_action_packages), solved=total_pkgs)
+
+        vendor_fetch_actions(
+            fetch_action_packages,
+            vendored_dir_path,
+            platforms[0],
+            jobs=jobs,
+            host_limit=host_limit,
+            adaptive=adaptive_jobs,
+            client_options=dict(pool_size=jobs, mirrors=mirrors),
+            cache_dir=cache_dir,
+            compression_formats=compress_repodata,
+            shards=shards,
+            pool_dir=pool_dir)
+
+        # record which packages each environment needs from the merged channel
+        manifest_dir = vendored_dir_path / "environments"
+        manifest_dir.mkdir(exist_ok=True)
+        lock_groups = {}
+        for environment_file, lock in zip((environment_file for environment_file, _ in environments), locks):
+            lock_groups.setdefault(environment_file, []).append(lock)
+        for environment_file, lock_group in lock_groups.items():
+            manifest_path = manifest_dir / f"{lock_group[0]['name']}.json"
+            if manifest_path.exists():
+                manifest_path = manifest_dir / f"{lock_group[0]['name']}-{environment_file.stem}.json"
+            write_json_atomic(manifest_path, environment_manifest(lock_group), indent=2)
+
+        events.emit("vendor_complete", f"Vendoring Complete!\nVendored Channel: {vendored_dir_path}", dict(bold=True, fg='green'), channel=vendored_dir_path)
+
+@click.command("gc", help="Delete package pool entries that no vendored channel links to")
+@click.option(
+    "--pool",
+    "pool_dir",
+    required=True,
+    type=click.Path(exists=True, file_okay=False, path_type=Path),
+    help="Package pool given to vendor --pool.")
+@click.option(
+    "--dry-run",
+    is_flag=True,
+    default=False,
+    help="Only report what would be deleted.")
+def gc(pool_dir, dry_run):
+    pool = PackagePool(pool_dir)
+    removed = pool.gc(dry_run=dry_run)
+    reclaimed = sum(size for _, size in removed)
+    action = "Would Reclaim" if dry_run else "Reclaimed"
+    click.echo(click.style(f"{action} {len(removed)} Unreferenced Pool Entries ({reclaimed / 1024 ** 2:.1f} MiB) from {pool.root}", bold=True, fg='green'))
+
+@click.command("verify", help="Check the packages of a vendored channel against its repodata.json files")
+@click.argument(
+    "channel",
+    type=click.Path(exists=True, file_okay=False, path_type=Path))
+@click.option(
+    "--jobs",
+    "-j",
+    default=None,
+    type=click.IntRange(min=1),
+    help="Number of processes hashing files. Defaults to the number of CPUs.")
+@click.option(
+    "--output",
+    default="text",
+    type=click.Choice(OUTPUT_FORMATS),
+    help="text for styled output, ndjson for one JSON event per line.")
+def verify(channel, jobs, output):
+    with events.event_stream(output):
+        events.emit("verify_start", f"Verifying Vendored Channel: {channel}", dict(fg='green'), channel=channel)
+        expected = expected_files(channel)
+        with events.progressbar(len(expected), "Verifying SHA256 Checksums") as progress:
+            report = verify_channel(channel, jobs=jobs, on_file=progress.update, expected=expected)
+
+        for problem, style in (("missing", dict(fg='red')), ("corrupt", dict(fg='red', bold=True)), ("extra", dict(fg='yellow'))):
+            for path in report[problem]:
+                events.emit(f"file_{problem}", f"{problem.capitalize()}: {path}", style, path=path)
+        events.emit("verify_complete",
+                    f"{report['verified']} of {report['expected']} Packages Verified ({report['bytes'] / 1024 ** 2:.1f} MiB), "
+                    f"{len(report['missing'])} missing, {len(report['corrupt'])} corrupt, {len(report['extra'])} extra",
+                    dict(bold=True, fg='green' if report['verified'] == report['expected'] else 'red'),
+                    **{key: len(value) if isinstance(value, list) else value for key, value in report.items()})
+
+    if report["missing"] or report["corrupt"]:
+        sys.exit("Channel Verification Failed")
+
+@click.command("bundle", help="Pack a vendored channel into one verified, parallel-compressed transfer file")
+@click.argument(
+    "channel",
+    type=click.Path(exists=True, file_okay=False, path_type=Path))
+@click.option(
+    "--bundle-file",
+    "-o",
+    "bundle_file",
+    required=True,
+    type=click.File("wb"),
+    help="Bundle to write, e.g. my-env.tar.gz. - writes to stdout.")
+@click.option(
+    "--ironbank-manifest",
+    default=None,
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="Also include this IronBank manifest (ib_manifest.yaml) in the bundle.")
+@click.option(
+    "--jobs",
+    "-j",
+    default=None,
+    type=click.IntRange(min=1),
+    help="Number of compression threads. Defaults to the number of CPUs.")
+@click.option(
+    "--compress-level",
+    default=6,
+    type=click.IntRange(min=1, max=9),
+    help="gzip compression level.")
+def bundle(channel, bundle_file, ironbank_manifest, jobs, compress_level):
+    extra_files = [ironbank_manifest] if ironbank_manifest is not None else []
+    total = sum(p.stat().st_size for p in channel.rglob("*") if p.is_file()) + sum(p.stat().st_size for p in extra_files)
+    # progress goes to stderr, stdout may be the bundle itself
+    with click.progressbar(length=total, label=f"Bundling {channel}", file=sys.stderr) as progress:
+        try:
+            manifest = write_bundle(channel, bundle_file, extra_files, jobs=jobs, compresslevel=compress_level, on_file=progress.update)
+        except BundleError as err:
+            click.echo(err, err=True)
+            sys.exit("Failed to bundle vendored channel")
+    click.echo(click.style(f"Bundled {len(manifest['files'])} Files from {channel}", bold=True, fg='green'), err=True)
+
+
+@click.command("delta", help="Pack only what changed between two versions of a vendored channel")
+@click.argument(
+    "old",
+    type=click.Path(exists=True, path_type=Path))
+@click.argument(
+    "new_channel",
+    type=click.Path(exists=True, file_okay=False, path_type=Path))
+@click.option(
+    "--bundle-file",
+    "-o",
+    "bundle_file",
+    required=True,
+    type=click.File("wb"),
+    help="Delta bundle to write, e.g. my-env.delta.tar.gz. - writes to stdout.")
+@click.option(
+    "--ironbank-manifest",
+    default=None,
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="Also include this IronBank manifest (ib_manifest.yaml) in the bundle.")
+@click.option(
+    "--jobs",
+    "-j",
+    default=None,
+    type=click.IntRange(min=1),
+    help="Number of compression threads. Defaults to the number of CPUs.")
+@click.option(
+    "--compress-level",
+    default=6,
+    type=click.IntRange(min=1, max=9),
+    help="gzip compression level.")
+def delta(old, new_channel, bundle_file, ironbank_manifest, jobs, compress_level):
+    # OLD is the previously transferred channel directory or its bundle's MANIFEST.json
+    extra_files = [ironbank_manifest] if ironbank_manifest is not None else []
+    try:
+        manifest = write_delta_bundle(old, new_channel, bundle_file, extra_files, jobs=jobs, compresslevel=compress_level)
+    except (BundleError, ValueError, KeyError) as err:
+        click.echo(err, err=True)
+        sys.exit("Failed to write delta bundle")
+    changed = sum(entry["size"] for entry in manifest["files"].values())
+    click.echo(click.style(f"Delta of {new_channel} against {old}: {len(manifest['files'])} new or changed files ({changed / 1024 ** 2:.1f} MiB), "
+                           f"{len(manifest['delta']['removed'])} removed, {len(manifest['delta']['unchanged'])} unchanged", bold=True, fg='green'), err=True)
+
+
+@click.command("unbundle", help="Extract a bundle written by conda-vendor bundle, verifying every file. Delta bundles are applied to the channel in --dest")
+@click.argument(
+    "bundle_file",
+    type=click.File("rb"))
+@click.option(
+    "--dest",
+    default=".",
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Directory to extract the vendored channel into.")
+def unbundle(bundle_file, dest):
+    # the bundle is read as a stream, so it can be piped in with - as well
+    click.echo(click.style(f"Extracting and Verifying {bundle_file.name} into {dest}", fg='green'))
+    try:
+        manifest = extract_bundle(bundle_file, dest)
+    except (BundleError, tarfile.TarError, OSError, EOFError) as err:
+        click.echo(err)
+        sys.exit("Failed to unbundle vendored channel")
+    if "delta" in manifest:
+        click.echo(click.style(f"Applied Delta: {len(manifest['files'])} Files Updated, {len(manifest['delta']['removed'])} Removed", bold=True, fg='cyan'))
+    click.echo(click.style(f"Unbundled and Verified {len(manifest['files'])} Files\nVendored Channel: {dest / manifest['channel']}", bold=True, fg='green'))
 
 main.add_command(vendor)
 main.add_command(ironbank_gen)
+main.add_command(vendor_batch)
+main.add_command(gc)
+main.add_command(verify)
+main.add_command(bundle)
+main.add_command(unbundle)
+main.add_command(delta)
 
 if __name__ == "main":
     main()
@@ -0,0 +1,136 @@
+# progress and results of a conda-vendor run, reported as styled text for
+# people (the default) or, with --output ndjson, as one compact JSON object
+# per line for automation
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import click
+
+OUTPUT_FORMATS = ("text", "ndjson")
+
+# NDJSON events are written out once this many characters are pending
+BUFFER_SIZE = 64 * 1024
+
+
+class _NullProgress:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def update(self, n):
+        pass
+
+
+class EventStream:
+    # file=None writes to stdout, quiet=True drops the per-package banners
+    def __init__(self, output="text", file=None, quiet=False):
+        self.output = output
+        self.file = file
+        self.quiet = quiet
+        self._pending = []
+        self._pending_size = 0
+        self._captured = None
+        self._lock = threading.Lock()
+
+    # report event with its fields. message is the text shown in text mode,
+    # styled with the click.style keyword arguments in style; banner marks
+    # per-package detail that --quiet drops
+    def emit(self, event, message=None, style=None, banner=False, **fields):
+        if banner and self.quiet:
+            return
+        record = {"event": event, "time": round(time.time(), 3), **fields}
+        with self._lock:
+            if self._captured is not None:
+                self._captured.append((record, message, style))
+                return
+        self._write(record, message, style)
+
+    def _write(self, record, message, style):
+        if self.output == "ndjson":
+            line = json.dumps(record, separators=(",", ":"), default=str) + "\n"
+            with self._lock:
+                self._pending.append(line)
+                self._pending_size += len(line)
+                if self._pending_size >= BUFFER_SIZE:
+                    self._flush_locked()
+        elif message is not None:
+            click.echo(message if style is None else click.style(message, **style), file=self.file)
+
+    def _flush_locked(self):
+        if self._pending:
+            out = self.file if self.file is not None else sys.stdout
+            out.write("".join(self._pending))
+            out.flush()
+        self._pending = []
+        self._pending_size = 0
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    # click.progressbar in text mode, a no-op when its redraws would corrupt
+    # the NDJSON stream or --quiet is set
+    def progressbar(self, length, label):
+        if self.output != "text" or self.quiet or self._captured is not None:
+            return _NullProgress()
+        return click.progressbar(length=length, label=label, file=self.file)
+
+    # collect events instead of writing them, for a worker process to hand
+    # back to the parent with its result
+    @contextmanager
+    def capture(self):
+        self._captured = captured = []
+        try:
+            yield captured
+        finally:
+            self._captured = None
+
+    def replay(self, captured):
+        for record, message, style in captured:
+            if self._captured is not None:
+                self._captured.append((record, message, style))
+            else:
+                self._write(record, message, style)
+
+
+# the stream of the running command, plain text to stdout unless the
+# command was invoked with --output / --output-file / --quiet
+_stream = EventStream()
+
+
+def emit(event, message=None, style=None, banner=False, **fields):
+    _stream.emit(event, message, style, banner, **fields)
+
+
+def progressbar(length, label):
+    return _stream.progressbar(length, label)
+
+
+def capture():
+    return _stream.capture()
+
+
+def replay(captured):
+    _stream.replay(captured)
+
+
+# route the events of one command to output / output_file, restoring the
+# default text stream afterwards
+@contextmanager
+def event_stream(output="text", output_file=None, quiet=False):
+    global _stream
+    previous = _stream
+    file = None if output_file is None else open(output_file, "w", encoding="utf-8")
+    _stream = EventStream(output, file, quiet)
+    try:
+        yield _stream
+    finally:
+        _stream.flush()
+        if file is not None:
+            file.close()
+        _stream = previous
@@ -0,0 +1,24 @@
+# helpers for writing files that readers must never see half written
+import json
+import os
+import tempfile
+from pathlib import Path
+
+
+# write chunks of bytes to a temp file next to dest, then atomically
+# rename it over dest
+def write_atomic(dest, chunks):
+    dest = Path(dest)
+    fd, tmp_name = tempfile.mkstemp(dir=dest.parent, prefix=f".{dest.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as tmp_file:
+            for chunk in chunks:
+                tmp_file.write(chunk)
+        os.replace(tmp_name, dest)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+def write_json_atomic(dest, data, indent=None):
+    write_atomic(dest, [json.dumps(data, indent=indent).encode()])
@@ -0,0 +1,179 @@
+# shared HTTP client used for every request made by a single
+# conda-vendor invocation, so packages and repodata.json files fetched
+# from the same host reuse pooled keep-alive connections
+import copy
+import threading
+import time
+from collections import Counter
+
+# seconds to establish a connection, and to wait for each read from it
+# once connected. a stalled socket fails the request instead of hanging
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 60
+
+# responses retried with backoff, honouring Retry-After
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# error classes, as reported in the run's diagnostics. connection errors
+# and timeouts are retried since nothing was downloaded or a download
+# resumes from its .part file, throttled and server errors are retried
+# after a backoff, anything else fails the request
+ERROR_CLASSES = ("connect", "connect_timeout", "read_timeout", "reset", "throttled", "server", "other")
+
+
+# class of an error raised by requests / urllib3, or of an HTTP status
+def classify_error(error=None, status=None):
+    from requests import exceptions
+    from urllib3 import exceptions as urllib3_exceptions
+
+    if status is not None:
+        return "throttled" if status == 429 else "server" if status >= 500 else "other"
+    # urllib3 derives NewConnectionError (e.g. connection refused) from ConnectTimeoutError
+    if isinstance(error, urllib3_exceptions.NewConnectionError):
+        return "connect"
+    if isinstance(error, (exceptions.ConnectTimeout, urllib3_exceptions.ConnectTimeoutError)):
+        return "connect_timeout"
+    if isinstance(error, (exceptions.ReadTimeout, urllib3_exceptions.ReadTimeoutError, TimeoutError)):
+        return "read_timeout"
+    # requests wraps the urllib3 error, which MaxRetryError wraps in turn
+    wrapped = error.args[0] if isinstance(error, exceptions.RequestException) and error.args else None
+    wrapped = getattr(wrapped, "reason", wrapped)
+    if isinstance(wrapped, BaseException):
+        error_class = classify_error(wrapped)
+        if error_class != "other":
+            return error_class
+    if isinstance(error, (exceptions.ChunkedEncodingError, urllib3_exceptions.ProtocolError, ConnectionResetError)):
+        return "reset"
+    if isinstance(error, (exceptions.ConnectionError, ConnectionError)):
+        return "connect"
+    return "other"
+
+
+_retry_class = None
+
+
+# urllib3 Retry reporting the class of every error it retries to on_retry
+def _classified_retry(on_retry, **kwargs):
+    global _retry_class
+    if _retry_class is None:
+        from urllib3.util.retry import Retry
+
+        class ClassifiedRetry(Retry):
+            on_retry = None
+
+            def new(self, **kw):
+                retry = super().new(**kw)
+                retry.on_retry = self.on_retry
+                return retry
+
+            def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+                if self.on_retry is not None:
+                    self.on_retry(classify_error(error, None if error or response is None else response.status))
+                return super().increment(method, url, response, error, _pool, _stacktrace)
+
+        _retry_class = ClassifiedRetry
+    retry = _retry_class(**kwargs)
+    retry.on_retry = on_retry
+    return retry
+
+
+class HttpClient:
+    # metrics, when given, is a conda_vendor.metrics.Metrics that response
+    # consumers record transferred bytes into. mirrors, when given, is a
+    # conda_vendor.mirrors.MirrorSet choosing where files of mirrored
+    # channels are fetched from. timeout, when given, replaces both the
+    # connect and the read timeout
+    def __init__(self, pool_size=10, retries=5, backoff_factor=0.5, timeout=None, metrics=None, mirrors=None,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT):
+        self.timeout = timeout if timeout is not None else (connect_timeout, read_timeout)
+        self.metrics = metrics
+        self.mirrors = mirrors
+        self.errors = Counter()
+        self.latencies = []
+        self._lock = threading.Lock()
+        # requests is imported here so that importing conda_vendor stays fast
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.session = requests.Session()
+        retry = _classified_retry(
+            self.record_error,
+            total=None,
+            connect=retries,
+            read=retries,
+            status=retries,
+            other=0,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({"GET", "HEAD"}),
+            backoff_factor=backoff_factor,
+            respect_retry_after_header=True,
+            # hand the last throttled / server error response to the caller
+            raise_on_status=False)
+        # pool_connections is the number of per-host pools kept around,
+        # pool_maxsize the number of keep-alive connections per host
+        self.adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=retry)
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get(self, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        start = time.perf_counter()
+        if self.mirrors is not None and self.mirrors.is_mirrored(url):
+            # hedged once it is slower than the responses seen so far
+            hedge_delay = self.mirrors.request_hedge_delay(self.response_latencies())
+            response = self.mirrors.get(url, lambda candidate: self.session.get(candidate, **kwargs), hedge_delay)
+        else:
+            response = self.session.get(url, **kwargs)
+        # seconds until the response headers arrived, streamed bodies are read later
+        with self._lock:
+            self.latencies.append(time.perf_counter() - start)
+        return response
+
+    # this client, sharing its connection pool, fetching every url as given
+    # rather than from the best mirror. used by hedged downloads, which pick
+    # their mirrors themselves
+    def without_mirrors(self):
+        client = copy.copy(self)
+        client.mirrors = None
+        return client
+
+    def close(self):
+        self.session.close()
+
+    # count an error of class error_class, retried here or by the caller
+    def record_error(self, error_class):
+        with self._lock:
+            self.errors[error_class] += 1
+
+    # response latencies in seconds, from the start-th one seen on
+    def response_latencies(self, start=0):
+        with self._lock:
+            return self.latencies[start:]
+
+    # {error class: count} of the errors seen so far
+    def error_counts(self):
+        with self._lock:
+            return dict(self.errors)
+
+    # connection reuse counters summed over every per-host pool
+    def connection_stats(self):
+        pools = self.adapter.poolmanager.pools
+        stats = {"hosts": 0, "connections": 0, "requests": 0}
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            stats["hosts"] += 1
+            stats["connections"] += pool.num_connections
+            stats["requests"] += pool.num_requests
+        stats["reused"] = max(0, stats["requests"] - stats["connections"])
+        return stats
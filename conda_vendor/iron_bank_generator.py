@@ -1,12 +1,11 @@
 # this generates formatted text to insert into the DoD IronBank's 
 # hardening_manifest.yaml "resources" block
-import click
-import sys
-from ruamel.yaml import YAML
+from conda_vendor import events
 
-# dump ironbank resources yaml block to stdout
+IRONBANK_MANIFEST = "ib_manifest.yaml"
+
+# dump ironbank resources yaml block to ib_manifest.yaml
 def yaml_dump_ironbank_manifest(fetch_action_packages):
-    click.echo(click.style("You can copy this text below to your IronBank Hardening Manifest", bold=True, fg='cyan'))
     # IronBank formatted 'resources' block
     resources = {
         "resources": [],
@@ -24,6 +23,9 @@ def yaml_dump_ironbank_manifest(fetch_action_packages):
         }
 
         resources["resources"].append(resource)
+    from ruamel.yaml import YAML
     yaml = YAML()
-    with open("ib_manifest.yaml", 'w') as f:
-        ironbank_resources = yaml.dump(resources, f)
+    with open(IRONBANK_MANIFEST, 'w') as f:
+        yaml.dump(resources, f)
+    events.emit("ironbank_manifest", f"You can copy the text in {IRONBANK_MANIFEST} to your IronBank Hardening Manifest", dict(bold=True, fg='cyan'),
+                path=IRONBANK_MANIFEST, resources=len(resources["resources"]))
@@ -0,0 +1,51 @@
+# lock artifacts persist the FETCH actions of a solve so that vendoring and
+# IronBank manifest generation can be repeated without running the solver
+import hashlib
+import json
+import time
+
+from conda_vendor.fileio import write_json_atomic
+
+LOCK_FILE_VERSION = 1
+
+
+# key a solve by everything that can change its result
+def solve_key(specs, channels, platform, solver) -> str:
+    payload = json.dumps({
+        "version": LOCK_FILE_VERSION,
+        "specs": sorted(specs),
+        "channels": list(channels),
+        "platform": platform,
+        "solver": solver,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def make_lock(name, platform, solver, channels, specs, fetch_actions) -> dict:
+    return {
+        "version": LOCK_FILE_VERSION,
+        "key": solve_key(specs, channels, platform, solver),
+        "name": name,
+        "platform": platform,
+        "solver": solver,
+        "channels": list(channels),
+        "specs": list(specs),
+        # when the solve ran, a cached solve older than --solve-max-age is redone
+        "solved_at": time.time(),
+        "fetch_actions": list(fetch_actions),
+    }
+
+
+def read_lock(path) -> dict:
+    with open(path, "r") as f:
+        lock = json.load(f)
+    if lock.get("version") != LOCK_FILE_VERSION:
+        raise ValueError(f"Unsupported lock file version {lock.get('version')} in {path}")
+    for field in ("name", "platform", "fetch_actions"):
+        if field not in lock:
+            raise ValueError(f"Lock file {path} is missing '{field}'")
+    return lock
+
+
+def write_lock(path, lock):
+    write_json_atomic(path, lock, indent=2)
@@ -0,0 +1,149 @@
+# per-phase timing and resource metrics for a vendoring run, written out
+# as one JSON report with --metrics-json
+import bisect
+import io
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from urllib.parse import urlparse
+
+# upper bounds in seconds of the per-package download latency histogram
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+# resource usage of this process ("self") or its finished children, None
+# where the resource module is missing (windows)
+def _rusage(who):
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF if who == "self" else resource.RUSAGE_CHILDREN)
+
+
+def _cpu_time():
+    cpu_time = time.process_time()
+    children = _rusage("children")
+    # solver subprocesses and worker processes count towards a phase too
+    if children is not None:
+        cpu_time += children.ru_utime + children.ru_stime
+    return cpu_time
+
+
+def _peak_rss_bytes(who):
+    usage = _rusage(who)
+    if usage is None:
+        return None
+    # ru_maxrss is in kilobytes on linux and bytes on macos
+    return usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+
+
+class Metrics:
+    def __init__(self):
+        self.phases = {}
+        self.bytes_by_host = defaultdict(int)
+        self.download_latencies = []
+        self.caches = {}
+        self.counters = defaultdict(int)
+        self.http = {}
+        self.mirrors = {}
+        self.concurrency = {}
+        self._lock = threading.Lock()
+
+    # time the body of the with block as phase name, adding up repeated phases
+    @contextmanager
+    def phase(self, name):
+        wall_start = time.perf_counter()
+        cpu_start = _cpu_time()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.perf_counter() - wall_start, _cpu_time() - cpu_start)
+
+    def add_phase(self, name, wall_time, cpu_time):
+        with self._lock:
+            phase = self.phases.setdefault(name, {"wall_time": 0.0, "cpu_time": 0.0})
+            phase["wall_time"] += wall_time
+            phase["cpu_time"] += cpu_time
+
+    def increment(self, counter, n=1):
+        with self._lock:
+            self.counters[counter] += n
+
+    def record_transfer(self, url, nbytes):
+        host = urlparse(url).netloc
+        with self._lock:
+            self.bytes_by_host[host] += nbytes
+
+    def record_download(self, seconds):
+        with self._lock:
+            self.download_latencies.append(seconds)
+
+    def record_cache(self, name, hits, misses):
+        total = hits + misses
+        self.caches[name] = {"hits": hits, "misses": misses, "hit_rate": hits / total if total else None}
+
+    def _latency_report(self):
+        latencies = sorted(self.download_latencies)
+        histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+        for latency in latencies:
+            histogram[bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+        buckets = [{"le": le, "count": count} for le, count in zip(LATENCY_BUCKETS, histogram)]
+        buckets.append({"le": None, "count": histogram[-1]})
+
+        def _percentile(p):
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+        return {
+            "count": len(latencies),
+            "p50": _percentile(0.50),
+            "p95": _percentile(0.95),
+            "max": latencies[-1] if latencies else None,
+            "histogram": buckets,
+        }
+
+    def report(self) -> dict:
+        with self._lock:
+            return {
+                "phases": {name: dict(phase) for name, phase in self.phases.items()},
+                "bytes_by_host": dict(self.bytes_by_host),
+                "bytes_total": sum(self.bytes_by_host.values()),
+                "download_latency": self._latency_report(),
+                "caches": dict(self.caches),
+                "counters": dict(self.counters),
+                "http": dict(self.http),
+                "mirrors": dict(self.mirrors),
+                "concurrency": dict(self.concurrency),
+                "peak_memory": {
+                    "self_bytes": _peak_rss_bytes("self"),
+                    "children_bytes": _peak_rss_bytes("children"),
+                },
+            }
+
+
+# metrics.phase(name) or a no-op when metrics are not being collected
+def phase(metrics, name):
+    return nullcontext() if metrics is None else metrics.phase(name)
+
+
+# binary stream wrapper recording every byte read from an HTTP response
+class CountingReader(io.RawIOBase):
+    def __init__(self, raw, url, metrics):
+        self.raw = raw
+        self.url = url
+        self.metrics = metrics
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.raw.read(len(buffer))
+        n = len(data)
+        buffer[:n] = data
+        if n:
+            self.metrics.record_transfer(self.url, n)
+        return n
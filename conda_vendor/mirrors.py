@@ -0,0 +1,222 @@
+# mirror lists per upstream channel. every request for a file of a mirrored
+# channel goes to whichever of the channel and its mirrors has done best so
+# far, failing over to the next on connection errors and 5xx responses.
+# package downloads that fall behind the observed transfer rates are hedged
+# with a second request to another mirror (see hedged_download), requests
+# such as the repodata.json fetch whose response is slower than the observed
+# response latencies likewise (see MirrorSet.get)
+import queue
+import threading
+import time
+from collections import defaultdict
+
+# weight of the newest sample in the latency / throughput moving averages
+EWMA_WEIGHT = 0.3
+
+# completed transfers needed before slow ones are hedged
+MIN_HEDGE_SAMPLES = 5
+
+# size assumed when ranking mirrors for a file of unknown size
+NOMINAL_SIZE = 1024 * 1024
+
+
+# "CHANNEL=MIRROR" as given to --mirror
+def parse_mirror(value):
+    channel, sep, mirror = value.partition("=")
+    if not sep or not channel or not mirror:
+        raise ValueError(f"Expected CHANNEL=MIRROR_URL, got {value}")
+    return channel.rstrip("/"), mirror.rstrip("/")
+
+
+def _ewma(previous, sample):
+    return sample if previous is None else EWMA_WEIGHT * sample + (1 - EWMA_WEIGHT) * previous
+
+
+class MirrorSet:
+    # mirrors is {channel url: [mirror url, ...]}. transfers slower than
+    # hedge_percentile percent of those seen so far get a hedged request,
+    # never sooner than min_hedge_delay seconds after the first one
+    def __init__(self, mirrors, hedge_percentile=95, min_hedge_delay=1.0):
+        self.mirrors = {channel.rstrip("/"): [m.rstrip("/") for m in urls] for channel, urls in mirrors.items()}
+        self.hedge_percentile = hedge_percentile
+        self.min_hedge_delay = min_hedge_delay
+        self.stats = defaultdict(lambda: {"latency": None, "throughput": None, "requests": 0, "failures": 0, "bytes": 0, "hedges": 0})
+        self.rates = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_options(cls, values, hedge_percentile=95):
+        mirrors = {}
+        for value in values:
+            channel, mirror = parse_mirror(value)
+            mirrors.setdefault(channel, []).append(mirror)
+        return cls(mirrors, hedge_percentile=hedge_percentile)
+
+    # the channel url and the mirror url ("base") url is served from, or
+    # (None, None) when it is not a file of a mirrored channel
+    def _split(self, url):
+        for channel, mirrors in self.mirrors.items():
+            for base in (channel, *mirrors):
+                if url.startswith(base + "/"):
+                    return channel, base
+        return None, None
+
+    def is_mirrored(self, url):
+        return self._split(url)[0] is not None
+
+    # estimated seconds to fetch size bytes from base. bases that failed go
+    # last, bases not measured yet first so every mirror gets measured
+    def _rank(self, base, size):
+        stats = self.stats[base]
+        if stats["latency"] is None and stats["throughput"] is None:
+            return stats["failures"], 0.0
+        seconds = stats["latency"] or 0.0
+        if stats["throughput"]:
+            seconds += (size or NOMINAL_SIZE) / stats["throughput"]
+        return stats["failures"], seconds
+
+    # url on the channel and every mirror of it, best first
+    def candidates(self, url, size=None):
+        channel, base = self._split(url)
+        if channel is None:
+            return [url]
+        path = url[len(base):]
+        with self._lock:
+            bases = sorted((channel, *self.mirrors[channel]), key=lambda b: self._rank(b, size))
+        return [b + path for b in bases]
+
+    def _stats(self, url):
+        return self.stats[self._split(url)[1] or url]
+
+    def record_latency(self, url, seconds):
+        with self._lock:
+            stats = self._stats(url)
+            stats["requests"] += 1
+            stats["latency"] = _ewma(stats["latency"], seconds)
+
+    def record_transfer(self, url, nbytes, seconds):
+        if seconds <= 0:
+            return
+        with self._lock:
+            stats = self._stats(url)
+            stats["bytes"] += nbytes
+            stats["throughput"] = _ewma(stats["throughput"], nbytes / seconds)
+            self.rates.append((nbytes, seconds))
+
+    def record_failure(self, url):
+        with self._lock:
+            self._stats(url)["failures"] += 1
+
+    def record_hedge(self, url):
+        with self._lock:
+            self._stats(url)["hedges"] += 1
+
+    # seconds after which a transfer of size bytes is slower than
+    # hedge_percentile percent of the transfers seen so far, or None
+    # until there are enough of them to tell
+    def hedge_delay(self, size=None):
+        with self._lock:
+            if len(self.rates) < MIN_HEDGE_SAMPLES:
+                return None
+            if size:
+                # the rate only 100 - hedge_percentile percent of transfers were slower than
+                samples = sorted(nbytes / seconds for nbytes, seconds in self.rates)
+                rate = samples[int((100 - self.hedge_percentile) / 100 * (len(samples) - 1))]
+                delay = size / rate if rate else None
+            else:
+                samples = sorted(seconds for _, seconds in self.rates)
+                delay = samples[int(self.hedge_percentile / 100 * (len(samples) - 1))]
+        return None if delay is None else max(self.min_hedge_delay, delay)
+
+    # seconds after which a request still waiting for its response is slower
+    # than hedge_percentile percent of latencies, the response latencies seen
+    # so far, or None until there are enough of them to tell
+    def request_hedge_delay(self, latencies):
+        if len(latencies) < MIN_HEDGE_SAMPLES:
+            return None
+        samples = sorted(latencies)
+        return max(self.min_hedge_delay, samples[int(self.hedge_percentile / 100 * (len(samples) - 1))])
+
+    # request(url) against the best candidate of url, failing over to the
+    # next on connection errors and server errors. with a hedge_delay, a
+    # request without a response after that many seconds is raced by one
+    # to the next best candidate, and the first good response wins
+    def get(self, url, request, hedge_delay=None):
+        candidates = self.candidates(url)
+        if hedge_delay is None or len(candidates) < 2:
+            return self._failover(candidates, request)
+
+        results = queue.Queue()
+        won = threading.Event()
+        lock = threading.Lock()
+
+        def _attempt(candidates):
+            try:
+                response = self._failover(candidates, request)
+            except BaseException as err:
+                results.put((None, err))
+                return
+            with lock:
+                if not won.is_set():
+                    results.put((response, None))
+                    return
+            # the other attempt already answered
+            response.close()
+
+        threading.Thread(target=_attempt, args=(candidates,), daemon=True).start()
+        running = 1
+        hedged = False
+        failed = None
+        while True:
+            try:
+                response, err = results.get(timeout=None if hedged else hedge_delay)
+            except queue.Empty:
+                # slower than the responses seen so far, ask the next best candidate too
+                hedged = True
+                self.record_hedge(candidates[1])
+                threading.Thread(target=_attempt, args=(candidates[1:] + candidates[:1],), daemon=True).start()
+                running += 1
+                continue
+            running -= 1
+            if response is not None and (response.status_code < 500 or not running):
+                with lock:
+                    won.set()
+                # close a response that arrived at the same time
+                while not results.empty():
+                    other, _ = results.get()
+                    if other is not None:
+                        other.close()
+                return response
+            if response is not None:
+                response.close()
+            failed = failed or err
+            if not running:
+                raise failed
+
+    # request(candidate) against candidates in turn until one answers
+    def _failover(self, candidates, request):
+        from requests.exceptions import ConnectionError, Timeout
+        for i, candidate in enumerate(candidates):
+            last = i == len(candidates) - 1
+            start = time.perf_counter()
+            try:
+                response = request(candidate)
+            except (ConnectionError, Timeout):
+                self.record_failure(candidate)
+                if last:
+                    raise
+                continue
+            if response.status_code >= 500 and not last:
+                self.record_failure(candidate)
+                response.close()
+                continue
+            self.record_latency(candidate, time.perf_counter() - start)
+            return response
+
+    # per channel and mirror latency, throughput, failure and hedge counts
+    def report(self) -> dict:
+        with self._lock:
+            report = {}
+            for channel, mirrors in self.mirrors.items():
+                report[channel] = {base: dict(self.stats[base]) for base in (channel, *mirrors)}
+            return report
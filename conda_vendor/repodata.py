@@ -0,0 +1,172 @@
+# incremental reader for upstream repodata.json files
+#
+# the packages / packages.conda sections of a large channel hold hundreds of
+# thousands of entries, so rather than loading the whole document with
+# json.load each entry is decoded on its own from a sliding text buffer and
+# dropped straight away unless its filename is wanted
+import bz2
+import json
+import os
+import re
+from pathlib import Path
+
+# zstd support is optional, it ships with python 3.14+ or the backports.zstd package
+try:
+    from compression import zstd
+except ImportError:
+    try:
+        from backports import zstd
+    except ImportError:
+        zstd = None
+
+REPODATA_SECTIONS = ("packages", "packages.conda")
+
+# compressed formats a vendored repodata.json can be written in
+COMPRESSION_FORMATS = ("bz2", "zst")
+
+# characters read from the underlying file per refill
+READ_CHUNK_SIZE = 1024 * 1024
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# characters that may continue a number
+_NUMBER_TAIL = re.compile(r"[0-9.eE+-]*")
+
+
+class _JSONStream:
+    def __init__(self, fp, chunk_size=READ_CHUNK_SIZE):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        data = self.fp.read(self.chunk_size)
+        if not data:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    # return the next non whitespace character without consuming it
+    def peek(self) -> str:
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of repodata.json")
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected '{char}' at offset {self.pos} of repodata.json, found '{found}'")
+        self.pos += 1
+
+    def decode_value(self):
+        while True:
+            self.peek()
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # the value is cut off by the end of the buffer
+                if not self._fill():
+                    raise
+                continue
+            # a number reaching the end of the buffer may continue in the next
+            # chunk, raw_decode("1.") returns 1 and leaves the "." behind
+            if (isinstance(value, (int, float)) and not isinstance(value, bool)
+                    and _NUMBER_TAIL.fullmatch(self.buf, end) and not self.eof and self._fill()):
+                continue
+            self.pos = end
+            return value
+
+    # yield the keys of the object at the current position, the caller
+    # must consume each key's value before asking for the next key
+    def iter_object(self):
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.decode_value()
+            self.expect(":")
+            yield key
+            separator = self.peek()
+            self.pos += 1
+            if separator == "}":
+                return
+            if separator != ",":
+                raise ValueError(f"Expected ',' or '}}' at offset {self.pos - 1} of repodata.json")
+
+
+# yield (section, filename, entry) for the package entries of a
+# repodata.json text stream. when wanted is given only those filenames are
+# decoded and reading stops as soon as all of them have been found
+def iter_repodata_entries(fp, wanted=None, chunk_size=READ_CHUNK_SIZE):
+    remaining = set(wanted) if wanted is not None else None
+    if remaining is not None and not remaining:
+        return
+    stream = _JSONStream(fp, chunk_size)
+    for key in stream.iter_object():
+        if key not in REPODATA_SECTIONS:
+            stream.decode_value()
+            continue
+        for fn in stream.iter_object():
+            entry = stream.decode_value()
+            if remaining is None:
+                yield key, fn, entry
+            elif fn in remaining:
+                yield key, fn, entry
+                remaining.discard(fn)
+                if not remaining:
+                    return
+
+
+
+# repodata.json variants to request from a channel, smallest first
+def repodata_suffixes():
+    suffixes = [".bz2", ""]
+    if zstd is not None:
+        suffixes.insert(0, ".zst")
+    return suffixes
+
+
+# wrap a binary stream of a repodata.json variant in a decompressing reader
+def open_compressed(fp, suffix):
+    if suffix == ".zst":
+        return zstd.open(fp, "rb")
+    if suffix == ".bz2":
+        return bz2.open(fp, "rb")
+    return fp
+
+
+# write repodata.json.<fmt> next to repodata_path for each requested format
+# and remove those of the other formats, left by an earlier run they would
+# describe an older repodata.json
+def write_compressed_repodata(repodata_path, formats):
+    repodata_path = Path(repodata_path)
+    for fmt in set(COMPRESSION_FORMATS) - set(formats):
+        repodata_path.with_name(f"{repodata_path.name}.{fmt}").unlink(missing_ok=True)
+    written = []
+    for fmt in formats:
+        if fmt == "zst" and zstd is None:
+            raise RuntimeError("Writing repodata.json.zst requires Python 3.14+ or the backports.zstd package")
+        dest = repodata_path.with_name(f"{repodata_path.name}.{fmt}")
+        tmp_dest = dest.with_name(f".{dest.name}.tmp")
+        opener = zstd.open if fmt == "zst" else bz2.open
+        try:
+            with repodata_path.open("rb") as src, opener(tmp_dest, "wb") as compressed:
+                while True:
+                    chunk = src.read(READ_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    compressed.write(chunk)
+            os.replace(tmp_dest, dest)
+        except BaseException:
+            tmp_dest.unlink(missing_ok=True)
+            raise
+        written.append(dest)
+    return written
@@ -0,0 +1,164 @@
+# size aware ordering of package downloads
+#
+# packages are handed to the download workers largest first (longest
+# processing time first scheduling), so the few huge packages of an
+# environment start straight away instead of being left to a single worker
+# at the end of the run. an optional per-host limit caps the downloads
+# running against any one server at a time, and an optional
+# ConcurrencyController the downloads running in total
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlparse
+
+# rise of response latency over its lowest level taken as a sign of congestion
+LATENCY_RISE = 2.0
+# latency differences smaller than this many seconds are taken as noise
+LATENCY_SLACK = 0.05
+
+
+class DownloadScheduler:
+    def __init__(self, pkgs, host_limit=None, controller=None):
+        self.queue = sorted(pkgs, key=self.size, reverse=True)
+        self.host_limit = host_limit
+        self.controller = controller
+        self.active = Counter()
+        self.running = 0
+        self.total_bytes = sum(self.size(pkg) for pkg in self.queue)
+        self.done_bytes = 0
+        self.started = time.monotonic()
+        self._cond = threading.Condition()
+
+    @staticmethod
+    def size(pkg) -> int:
+        return pkg.get("size") or 0
+
+    @staticmethod
+    def host(pkg) -> str:
+        return urlparse(pkg["url"]).netloc
+
+    # the largest waiting package whose host is below host_limit, blocking
+    # while every waiting package's host is busy or the controller's limit
+    # is reached. None once all are handed out
+    def next(self):
+        with self._cond:
+            while self.queue:
+                if self.controller is None or self.running < self.controller.limit:
+                    for i, pkg in enumerate(self.queue):
+                        host = self.host(pkg)
+                        if self.host_limit is None or self.active[host] < self.host_limit:
+                            self.active[host] += 1
+                            self.running += 1
+                            return self.queue.pop(i)
+                self._cond.wait()
+            return None
+
+    # pkg finished, downloaded over the network unless network is False
+    def done(self, pkg, network=True):
+        with self._cond:
+            self.active[self.host(pkg)] -= 1
+            self.running -= 1
+            self.done_bytes += self.size(pkg)
+            if self.controller is not None:
+                self.controller.observe(network)
+            self._cond.notify_all()
+
+    # drop the packages not handed out yet, e.g. after a failed download
+    def cancel(self):
+        with self._cond:
+            self.queue.clear()
+            self._cond.notify_all()
+
+    # estimated seconds until every package is downloaded, from the bytes
+    # per second completed so far. None until there is a rate to go by
+    def eta(self):
+        with self._cond:
+            elapsed = time.monotonic() - self.started
+            if not self.done_bytes or not elapsed:
+                return None
+            return (self.total_bytes - self.done_bytes) / (self.done_bytes / elapsed)
+
+
+# additive increase / multiplicative decrease of the downloads in flight,
+# between 1 and max_limit, starting at max_limit. the congestion signal is
+# the time servers take to answer a request, reported by latencies(start),
+# a callable returning the response latencies in seconds from the start-th
+# one seen on. unlike
+# throughput it does not depend on package sizes, which shrink over a run
+# since the scheduler hands out the largest packages first. after every
+# window of limit network downloads the window's median latency is compared
+# with the lowest window median seen: more than LATENCY_RISE times that
+# halves the limit, otherwise it grows by one. new errors reported by
+# errors(), a callable returning {error class: count}, halve it straight
+# away. every change is kept in decisions
+class ConcurrencyController:
+    def __init__(self, max_limit, errors=None, latencies=None, initial=None):
+        self.max_limit = max_limit
+        self.limit = initial or max_limit
+        self.initial = self.limit
+        self.errors = errors
+        self.latencies = latencies
+        self.decisions = []
+        self.started = time.monotonic()
+        self._errors_seen = dict(errors()) if errors is not None else {}
+        self._latencies_seen = len(latencies(0)) if latencies is not None else 0
+        self._baseline = None
+        self._window_done = 0
+
+    def _decide(self, limit, reason, latency=None):
+        if limit == self.limit:
+            return
+        self.limit = limit
+        self.decisions.append({
+            "time": round(time.monotonic() - self.started, 3),
+            "limit": limit,
+            "reason": reason,
+            "latency": None if latency is None else round(latency, 4),
+        })
+
+    def _new_errors(self):
+        if self.errors is None:
+            return {}
+        errors = dict(self.errors())
+        new = {error_class: count - self._errors_seen.get(error_class, 0) for error_class, count in errors.items()}
+        self._errors_seen = errors
+        return {error_class: count for error_class, count in new.items() if count > 0}
+
+    def _new_latencies(self):
+        if self.latencies is None:
+            return []
+        new = self.latencies(self._latencies_seen)
+        self._latencies_seen += len(new)
+        return new
+
+    # a download finished, over the network unless network is False
+    def observe(self, network=True):
+        new_errors = self._new_errors()
+        if new_errors:
+            reason = "errors " + ", ".join(f"{error_class}={count}" for error_class, count in sorted(new_errors.items()))
+            self._decide(max(1, self.limit // 2), reason)
+            # measure the new limit from scratch
+            self._new_latencies()
+            self._window_done = 0
+            return
+        # packages from the cache say nothing about the network
+        if not network:
+            return
+        self._window_done += 1
+        if self._window_done < self.limit:
+            return
+        self._window_done = 0
+
+        window = sorted(self._new_latencies())
+        if not window:
+            return
+        latency = window[len(window) // 2]
+        if self._baseline is None or latency < self._baseline:
+            self._baseline = latency
+        if latency > self._baseline * LATENCY_RISE + LATENCY_SLACK:
+            self._decide(max(1, self.limit // 2), "latency rose", latency)
+        else:
+            self._decide(min(self.max_limit, self.limit + 1), "latency held", latency)
+
+    def report(self) -> dict:
+        return {"initial": self.initial, "final": self.limit, "max": self.max_limit, "decisions": list(self.decisions)}
@@ -0,0 +1,113 @@
+# re-check a vendored channel against its repodata.json, e.g. after it was
+# carried across an air gap. files are hashed in a process pool so large
+# channels verify at disk speed rather than at the speed of one core
+import hashlib
+import json
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from conda_vendor.repodata import REPODATA_SECTIONS
+
+# read size when a file cannot be memory mapped
+VERIFY_CHUNK_SIZE = 8 * 1024 * 1024
+
+PACKAGE_SUFFIXES = (".tar.bz2", ".conda")
+
+
+# sha256 of path, or None when it does not exist
+def hash_file(path):
+    sha256 = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    sha256.update(mapped)
+            except (ValueError, OSError):
+                # empty files and filesystems without mmap support
+                buffer = bytearray(VERIFY_CHUNK_SIZE)
+                view = memoryview(buffer)
+                while True:
+                    n = f.readinto(buffer)
+                    if not n:
+                        break
+                    sha256.update(view[:n])
+    except FileNotFoundError:
+        return None
+    return sha256.hexdigest()
+
+
+# {(subdir, fn): repodata entry} for every subdir repodata.json of a channel
+def expected_files(channel_path) -> dict:
+    expected = {}
+    for repodata_path in sorted(Path(channel_path).glob("*/repodata.json")):
+        with repodata_path.open() as f:
+            repodata = json.load(f)
+        for section in REPODATA_SECTIONS:
+            for fn, entry in repodata.get(section, {}).items():
+                expected[(repodata_path.parent.name, fn)] = entry
+    return expected
+
+
+# compare the package files of channel_path with its repodata.json files
+# (or the already loaded expected_files). on_file is called once per
+# checked file, for progress reporting
+def verify_channel(channel_path, jobs=None, on_file=None, expected=None) -> dict:
+    channel_path = Path(channel_path)
+    if expected is None:
+        expected = expected_files(channel_path)
+    report = {"verified": 0, "bytes": 0, "missing": [], "corrupt": [], "extra": []}
+
+    to_hash = []
+    for (subdir, fn), entry in expected.items():
+        path = channel_path / subdir / fn
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError:
+            report["missing"].append(f"{subdir}/{fn}")
+            if on_file is not None:
+                on_file(1)
+            continue
+        # a size mismatch is corrupt without reading the file
+        if "size" in entry and entry["size"] != size:
+            report["corrupt"].append(f"{subdir}/{fn}")
+            if on_file is not None:
+                on_file(1)
+            continue
+        to_hash.append((size, subdir, fn, entry.get("sha256")))
+
+    # largest files first so no worker is left hashing a big file alone at the end
+    to_hash.sort(reverse=True)
+    paths = [channel_path / subdir / fn for _, subdir, fn, _ in to_hash]
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(paths) < 2:
+        digests = map(hash_file, paths)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=jobs)
+        digests = executor.map(hash_file, paths, chunksize=max(1, len(paths) // (jobs * 16)))
+    try:
+        for (size, subdir, fn, sha256), digest in zip(to_hash, digests):
+            if digest is None:
+                report["missing"].append(f"{subdir}/{fn}")
+            elif sha256 is not None and digest != sha256:
+                report["corrupt"].append(f"{subdir}/{fn}")
+            else:
+                report["verified"] += 1
+                report["bytes"] += size
+            if on_file is not None:
+                on_file(1)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    for subdir in sorted(p.parent.name for p in channel_path.glob("*/repodata.json")):
+        for path in sorted((channel_path / subdir).iterdir()):
+            if path.name.endswith(PACKAGE_SUFFIXES) and (subdir, path.name) not in expected:
+                report["extra"].append(f"{subdir}/{path.name}")
+
+    for problems in ("missing", "corrupt"):
+        report[problems].sort()
+    report["expected"] = len(expected)
+    return report
@@ -19,7 +19,7 @@ setup(
     name="conda_vendor",
     version=__version__,
     package_dir={"": "."},
-    packages=find_packages(exclude=("tests",), where="."),
+    packages=find_packages(exclude=("tests", "benchmarks", "benchmarks.*"), where="."),
     url="https://github.com/MetroStar/conda-vendor",
     entry_points={"console_scripts": ["conda-vendor = conda_vendor.__main__:cli"]},
     install_requires=["ruamel.yaml", "conda-lock", "click"],
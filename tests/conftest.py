@@ -98,7 +98,9 @@ def mock_response(
         mock_resp.raise_for_status.side_effect = raise_for_status
     # set status code and content
     mock_resp.status_code = status
+    mock_resp.headers = {}
     mock_resp.content = content
+    mock_resp.iter_content = Mock(side_effect=lambda chunk_size=None: iter([content]))
     # add json data if provided
     if json_data:
         mock_resp.json = Mock(return_value=json_data)
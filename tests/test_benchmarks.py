@@ -0,0 +1,31 @@
+import json
+
+import pytest
+
+from benchmarks.bench_vendoring import PHASES, find_regressions, run_benchmarks
+
+
+# small end-to-end run of the benchmark suite against the local channel server
+def test_run_benchmarks_smoke(tmp_path):
+    report = run_benchmarks(entries=200, packages=6, jobs=2, work_dir=tmp_path)
+
+    assert list(report["phases"]) == list(PHASES)
+    for result in report["phases"].values():
+        assert result["wall_time"] > 0
+        assert result["peak_rss"] > 0
+        assert result["bytes"] > 0
+    json.dumps(report)
+
+
+# a phase failing in its worker process fails the run instead of hanging it
+def test_run_benchmarks_failing_phase(tmp_path):
+    with pytest.raises(RuntimeError, match="unknown_phase"):
+        run_benchmarks(entries=20, packages=2, phases=("unknown_phase",), work_dir=tmp_path)
+
+
+def test_find_regressions():
+    baseline = {"phases": {"download_solved_pkgs": {"wall_time": 10.0}}}
+    fast = {"phases": {"download_solved_pkgs": {"wall_time": 11.0}}}
+    slow = {"phases": {"download_solved_pkgs": {"wall_time": 13.0}}}
+    assert find_regressions(fast, baseline, 0.25) == []
+    assert len(find_regressions(slow, baseline, 0.25)) == 1
@@ -0,0 +1,153 @@
+import gzip
+import hashlib
+import io
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from conda_vendor.bundle import BundleError, ParallelGzipWriter, extract_bundle, write_bundle, write_delta_bundle
+from conda_vendor.conda_vendor import bundle, delta, unbundle
+
+
+def _channel(tmp_path):
+    channel = tmp_path / "my-env"
+    (channel / "linux-64").mkdir(parents=True)
+    (channel / "noarch").mkdir()
+    packages = {"linux-64/python-3.11-0.conda": b"P" * 100_000, "noarch/tzdata-2024a-0.conda": b"TZ"}
+    for path, content in packages.items():
+        (channel / path).write_bytes(content)
+    for subdir in ("linux-64", "noarch"):
+        entries = {path.split("/")[1]: {"sha256": hashlib.sha256(content).hexdigest()} for path, content in packages.items() if path.startswith(subdir)}
+        (channel / subdir / "repodata.json").write_text(json.dumps({"packages": {}, "packages.conda": entries}))
+    return channel
+
+
+def test_parallel_gzip_writer_writes_members_in_order():
+    out = io.BytesIO()
+    data = bytes(range(256)) * 1000
+    with ParallelGzipWriter(out, jobs=4, chunk_size=1000) as writer:
+        for i in range(0, len(data), 777):
+            writer.write(data[i:i + 777])
+
+    assert gzip.decompress(out.getvalue()) == data
+
+
+def test_bundle_roundtrip(tmp_path):
+    channel = _channel(tmp_path)
+    manifest_file = tmp_path / "ib_manifest.yaml"
+    manifest_file.write_text("resources: []\n")
+    out = io.BytesIO()
+
+    manifest = write_bundle(channel, out, extra_files=[manifest_file], jobs=2)
+    extracted = extract_bundle(io.BytesIO(out.getvalue()), tmp_path / "dest")
+
+    assert extracted == manifest
+    assert sorted(manifest["files"]) == [
+        "ib_manifest.yaml",
+        "my-env/linux-64/python-3.11-0.conda",
+        "my-env/linux-64/repodata.json",
+        "my-env/noarch/repodata.json",
+        "my-env/noarch/tzdata-2024a-0.conda",
+    ]
+    assert (tmp_path / "dest" / "my-env" / "linux-64" / "python-3.11-0.conda").read_bytes() == b"P" * 100_000
+    assert (tmp_path / "dest" / "ib_manifest.yaml").read_text() == "resources: []\n"
+
+
+def test_bundle_skips_leftover_downloads(tmp_path):
+    channel = _channel(tmp_path)
+    for leftover in ("numpy-1.26-0.conda.part", "numpy-1.26-0.conda.part.json", "numpy-1.26-0.conda.mirror1",
+                     "numpy-1.26-0.conda.mirror1.part", "numpy-1.26-0.conda.mirror1.part.json", "unlisted-1.0-0.conda"):
+        (channel / "linux-64" / leftover).write_bytes(b"LEFTOVER")
+
+    manifest = write_bundle(channel, io.BytesIO(), jobs=1)
+
+    assert sorted(manifest["files"]) == [
+        "my-env/linux-64/python-3.11-0.conda",
+        "my-env/linux-64/repodata.json",
+        "my-env/noarch/repodata.json",
+        "my-env/noarch/tzdata-2024a-0.conda",
+    ]
+
+
+def test_bundle_refuses_corrupt_channel(tmp_path):
+    channel = _channel(tmp_path)
+    (channel / "noarch" / "tzdata-2024a-0.conda").write_bytes(b"XX")
+
+    with pytest.raises(BundleError):
+        write_bundle(channel, io.BytesIO())
+
+
+def test_unbundle_detects_tampering(tmp_path):
+    channel = _channel(tmp_path)
+    out = io.BytesIO()
+    write_bundle(channel, out, jobs=1)
+    tampered = gzip.decompress(out.getvalue()).replace(b"TZ", b"XY")
+
+    with pytest.raises(BundleError, match="tzdata"):
+        extract_bundle(io.BytesIO(gzip.compress(tampered)), tmp_path / "dest")
+    assert not (tmp_path / "dest" / "my-env" / "noarch" / "tzdata-2024a-0.conda").exists()
+
+
+def test_bundle_commands(tmp_path):
+    channel = _channel(tmp_path)
+    runner = CliRunner()
+
+    bundled = runner.invoke(bundle, [str(channel), "--bundle-file", str(tmp_path / "my-env.tar.gz")])
+    unbundled = runner.invoke(unbundle, [str(tmp_path / "my-env.tar.gz"), "--dest", str(tmp_path / "dest")])
+
+    assert bundled.exit_code == 0, bundled.output
+    assert unbundled.exit_code == 0, unbundled.output
+    assert "Unbundled and Verified 4 Files" in unbundled.output
+
+
+def _update_channel(channel):
+    # python is replaced by a new build, tzdata is dropped, zlib is added
+    (channel / "linux-64" / "python-3.11-0.conda").unlink()
+    (channel / "noarch" / "tzdata-2024a-0.conda").unlink()
+    packages = {"python-3.11-1.conda": b"Q" * 1000, "zlib-1.3-0.conda": b"Z"}
+    for fn, content in packages.items():
+        (channel / "linux-64" / fn).write_bytes(content)
+    entries = {fn: {"sha256": hashlib.sha256(content).hexdigest()} for fn, content in packages.items()}
+    (channel / "linux-64" / "repodata.json").write_text(json.dumps({"packages": {}, "packages.conda": entries}))
+    (channel / "noarch" / "repodata.json").write_text(json.dumps({"packages": {}, "packages.conda": {}}))
+
+
+def test_delta_bundle_applies_changes(tmp_path):
+    channel = _channel(tmp_path)
+    full = io.BytesIO()
+    write_bundle(channel, full)
+    extract_bundle(io.BytesIO(full.getvalue()), tmp_path / "airgap")
+    base_manifest = tmp_path / "MANIFEST.json"
+    base_manifest.write_text(json.dumps(extract_bundle(io.BytesIO(full.getvalue()), tmp_path / "copy")))
+    _update_channel(channel)
+
+    out = io.BytesIO()
+    manifest = write_delta_bundle(base_manifest, channel, out)
+    extract_bundle(io.BytesIO(out.getvalue()), tmp_path / "airgap")
+
+    assert sorted(manifest["files"]) == [
+        "my-env/linux-64/python-3.11-1.conda",
+        "my-env/linux-64/repodata.json",
+        "my-env/linux-64/zlib-1.3-0.conda",
+        "my-env/noarch/repodata.json",
+    ]
+    assert manifest["delta"]["removed"] == ["my-env/linux-64/python-3.11-0.conda", "my-env/noarch/tzdata-2024a-0.conda"]
+    assert len(out.getvalue()) < len(full.getvalue())
+    applied = tmp_path / "airgap" / "my-env"
+    assert sorted(p.relative_to(applied).as_posix() for p in applied.rglob("*") if p.is_file()) == sorted(
+        p.relative_to(channel).as_posix() for p in channel.rglob("*") if p.is_file())
+
+
+def test_delta_refuses_wrong_base(tmp_path):
+    channel = _channel(tmp_path)
+    old = tmp_path / "old"
+    (old / "my-env").mkdir(parents=True)
+    runner = CliRunner()
+
+    result = runner.invoke(delta, [str(channel), str(channel), "-o", str(tmp_path / "delta.tar.gz")])
+    assert result.exit_code == 0, result.output
+    applied = runner.invoke(unbundle, [str(tmp_path / "delta.tar.gz"), "--dest", str(old)])
+
+    assert applied.exit_code == 1
+    assert "does not hold the channel this delta was made against" in applied.output
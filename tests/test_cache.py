@@ -0,0 +1,183 @@
+import hashlib
+import os
+from unittest.mock import patch
+
+import pytest
+
+from conda_vendor.cache import PackageCache, PackagePool, RepodataCache, link_or_copy, parse_size
+from conda_vendor.conda_vendor import download_solved_pkgs
+
+from .conftest import mock_response
+
+
+def _add_to_cache(cache, tmp_path, content):
+    sha256 = hashlib.sha256(content).hexdigest()
+    src = tmp_path / f"src-{sha256}"
+    src.write_bytes(content)
+    cache.add(sha256, src)
+    return sha256
+
+
+def test_parse_size():
+    assert parse_size("1024") == 1024
+    assert parse_size("2K") == 2048
+    assert parse_size("1.5GB") == int(1.5 * 1024 ** 3)
+    with pytest.raises(ValueError):
+        parse_size("lots")
+
+
+def test_link_or_copy_falls_back_to_copy(tmp_path):
+    src = tmp_path / "src"
+    src.write_bytes(b"DATA")
+    with patch("os.link", side_effect=OSError), patch("conda_vendor.cache._reflink", side_effect=OSError):
+        assert link_or_copy(src, tmp_path / "dest") == "copy"
+    assert (tmp_path / "dest").read_bytes() == b"DATA"
+
+
+def test_PackageCache_skips_copies_without_max_size(tmp_path):
+    src = tmp_path / "pkg.tar.bz2"
+    src.write_bytes(b"PACKAGE")
+    sha256 = hashlib.sha256(b"PACKAGE").hexdigest()
+    unbounded = PackageCache(tmp_path / "unbounded")
+    bounded = PackageCache(tmp_path / "bounded", max_size=1024)
+
+    # e.g. the cache lives on another filesystem than the channel
+    with patch("os.link", side_effect=OSError), patch("conda_vendor.cache._reflink", side_effect=OSError):
+        assert unbounded.add(sha256, src) is None
+        assert bounded.add(sha256, src) == bounded.path_for(sha256)
+
+    assert unbounded.entries() == [] and unbounded.skipped == 1
+    assert list(unbounded.path_for(sha256).parent.iterdir()) == []
+    assert bounded.path_for(sha256).read_bytes() == b"PACKAGE"
+
+
+def test_PackageCache_materialize(tmp_path):
+    cache = PackageCache(tmp_path / "cache")
+    sha256 = _add_to_cache(cache, tmp_path, b"PACKAGE")
+
+    assert cache.materialize(sha256, tmp_path / "pkg.tar.bz2")
+    assert (tmp_path / "pkg.tar.bz2").read_bytes() == b"PACKAGE"
+    assert not cache.materialize("0" * 64, tmp_path / "missing.tar.bz2")
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_PackagePool_links_channels_and_gc(tmp_path):
+    pool = PackagePool(tmp_path / "pool")
+    channel_a = tmp_path / "a" / "linux-64"
+    channel_b = tmp_path / "b" / "linux-64"
+    channel_a.mkdir(parents=True)
+    channel_b.mkdir(parents=True)
+    for channel in (channel_a, channel_b):
+        pool.register_channel(channel.parent)
+
+    downloaded = channel_a / "pkg.conda"
+    downloaded.write_bytes(b"PACKAGE")
+    sha256 = hashlib.sha256(b"PACKAGE").hexdigest()
+    entry = pool.add(sha256, downloaded)
+    assert pool.materialize(sha256, channel_b / "pkg.conda")
+
+    assert entry.stat().st_nlink == 3
+    assert (channel_b / "pkg.conda").read_bytes() == b"PACKAGE"
+    assert pool.gc() == []
+
+    (channel_a / "pkg.conda").unlink()
+    (channel_b / "pkg.conda").unlink()
+    assert pool.gc(dry_run=True) == [(entry, 7)]
+    assert entry.exists()
+    assert pool.gc() == [(entry, 7)]
+    assert not entry.exists()
+
+
+def test_PackagePool_symlink_fallback_keeps_entry(tmp_path):
+    pool = PackagePool(tmp_path / "pool")
+    channel = tmp_path / "channel" / "noarch"
+    channel.mkdir(parents=True)
+    pool.register_channel(channel.parent)
+    sha256 = _add_to_cache(PackageCache(tmp_path / "pool"), tmp_path, b"PACKAGE")
+    (tmp_path / f"src-{sha256}").unlink()
+
+    with patch("os.link", side_effect=OSError), patch("conda_vendor.cache._reflink", side_effect=OSError):
+        assert pool.materialize(sha256, channel / "pkg.conda")
+
+    assert (channel / "pkg.conda").is_symlink()
+    assert pool.gc() == []
+    (channel / "pkg.conda").unlink()
+    assert [entry for entry, _ in pool.gc()] == [pool.path_for(sha256)]
+
+
+def test_PackageCache_evicts_least_recently_used(tmp_path):
+    cache = PackageCache(tmp_path / "cache", max_size=20)
+    old = _add_to_cache(cache, tmp_path, b"A" * 10)
+    used = _add_to_cache(cache, tmp_path, b"B" * 10)
+    new = _add_to_cache(cache, tmp_path, b"C" * 10)
+    os.utime(cache.path_for(old), (1, 1))
+    os.utime(cache.path_for(used), (2, 2))
+    os.utime(cache.path_for(new), (3, 3))
+    cache.get(used)
+
+    assert cache.evict() == [cache.path_for(old)]
+    assert cache.size() == 20
+
+
+@patch("conda_vendor.conda_vendor.improved_download")
+def test_download_solved_pkgs_uses_cache(mock, tmp_path):
+    content = b"PACKAGE"
+    mock.return_value = mock_response(content=content)
+    fetch_actions = [{
+        "fn": "pkg.tar.bz2",
+        "url": "https://NOT_REAL.com/linux-64/pkg.tar.bz2",
+        "sha256": hashlib.sha256(content).hexdigest(),
+        "subdir": "linux-64",
+    }]
+    cache = PackageCache(tmp_path / "cache")
+    for run in ("first", "second"):
+        (tmp_path / run / "linux-64").mkdir(parents=True)
+        download_solved_pkgs(fetch_actions, tmp_path / run, "linux-64", cache=cache)
+        assert (tmp_path / run / "linux-64" / "pkg.tar.bz2").read_bytes() == content
+
+    assert mock.call_count == 1
+    assert cache.hits == 1
+
+
+class _FakeRepodataServer:
+    def __init__(self, body, etag):
+        self.body = body
+        self.etag = etag
+        self.requests = []
+
+    def get(self, url, stream=False, headers=None):
+        self.requests.append(headers)
+        if headers.get("If-None-Match") == self.etag:
+            return mock_response(status=304)
+        response = mock_response(content=self.body)
+        response.headers = {"ETag": self.etag, "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"}
+        return response
+
+
+def test_RepodataCache_conditional_get(tmp_path):
+    server = _FakeRepodataServer(b'{"packages": {}}', '"v1"')
+    cache = RepodataCache(tmp_path)
+    url = "https://NOT_REAL.com/linux-64/repodata.json"
+
+    first = cache.fetch(url, server)
+    second = cache.fetch(url, server)
+
+    assert first == second
+    assert second.read_bytes() == b'{"packages": {}}'
+    assert server.requests[0] == {}
+    assert server.requests[1]["If-None-Match"] == '"v1"'
+    assert server.requests[1]["If-Modified-Since"] == "Mon, 01 Jan 2024 00:00:00 GMT"
+    assert (cache.downloads, cache.revalidated) == (1, 1)
+
+
+def test_RepodataCache_max_age_and_offline(tmp_path):
+    server = _FakeRepodataServer(b"{}", '"v1"')
+    url = "https://NOT_REAL.com/noarch/repodata.json"
+
+    with pytest.raises(RuntimeError):
+        RepodataCache(tmp_path, offline=True).fetch(url, server)
+    RepodataCache(tmp_path).fetch(url, server)
+    RepodataCache(tmp_path, max_age=3600).fetch(url, server)
+    RepodataCache(tmp_path, offline=True).fetch(url, server)
+
+    assert len(server.requests) == 1
@@ -0,0 +1,77 @@
+import hashlib
+import json
+
+import pytest
+
+from conda_vendor.channel_index import channeldata, current_repodata, write_channeldata, write_shards
+from conda_vendor.repodata import zstd
+
+
+def _entry(name, version, timestamp, **extra):
+    return {"name": name, "version": version, "build": "0", "timestamp": timestamp, "sha256": hashlib.sha256(f"{name}{version}".encode()).hexdigest(), **extra}
+
+
+REPODATA = {
+    "info": {"subdir": "linux-64"},
+    "packages": {
+        "python-3.10.0-0.tar.bz2": _entry("python", "3.10.0", 100, license="PSF"),
+        "zlib-1.2.13-0.tar.bz2": _entry("zlib", "1.2.13", 50),
+    },
+    "packages.conda": {
+        "python-3.11.0-0.conda": _entry("python", "3.11.0", 200, license="PSF-2.0"),
+        "python-3.11.0-1.conda": _entry("python", "3.11.0", 150, license="PSF-2.0"),
+    },
+}
+
+
+def test_current_repodata_keeps_newest_version():
+    current = current_repodata(REPODATA)
+
+    assert current["info"] == {"subdir": "linux-64"}
+    assert list(current["packages"]) == ["zlib-1.2.13-0.tar.bz2"]
+    assert sorted(current["packages.conda"]) == ["python-3.11.0-0.conda", "python-3.11.0-1.conda"]
+
+
+def test_current_repodata_orders_by_version_not_timestamp():
+    repodata = {"packages.conda": {
+        "python-3.12.0-0.conda": _entry("python", "3.12.0", 100),
+        # a backport built after the newer release
+        "python-3.8.19-0.conda": _entry("python", "3.8.19", 200),
+        "zlib-1.3-0.conda": _entry("zlib", "1.3", 300, build_number=0),
+        "zlib-1.3-1.conda": _entry("zlib", "1.3", 100, build_number=1),
+    }}
+
+    current = current_repodata(repodata)
+
+    assert sorted(current["packages.conda"]) == ["python-3.12.0-0.conda", "zlib-1.3-0.conda", "zlib-1.3-1.conda"]
+    assert channeldata({"linux-64": repodata})["packages"]["zlib"]["timestamp"] == 100
+
+
+def test_channeldata(tmp_path):
+    noarch = {"info": {"subdir": "noarch"}, "packages": {}, "packages.conda": {"tzdata-2024a-0.conda": _entry("tzdata", "2024a", 10)}}
+    write_channeldata(tmp_path, {"linux-64": REPODATA, "noarch": noarch})
+
+    data = json.loads((tmp_path / "channeldata.json").read_text())
+    assert data == channeldata({"linux-64": REPODATA, "noarch": noarch})
+    assert data["subdirs"] == ["linux-64", "noarch"]
+    assert data["packages"]["python"] == {"subdirs": ["linux-64"], "version": "3.11.0", "timestamp": 200, "license": "PSF-2.0"}
+    assert data["packages"]["tzdata"]["subdirs"] == ["noarch"]
+
+
+@pytest.mark.skipif(zstd is None, reason="zstd is not available")
+def test_write_shards(tmp_path):
+    msgpack = pytest.importorskip("msgpack")
+    (tmp_path / "shards").mkdir()
+    (tmp_path / "shards" / "stale.msgpack.zst").write_bytes(b"")
+
+    write_shards(tmp_path, REPODATA)
+
+    index = msgpack.unpackb(zstd.decompress((tmp_path / "repodata_shards.msgpack.zst").read_bytes()))
+    assert index["info"]["subdir"] == "linux-64"
+    assert sorted(index["shards"]) == ["python", "zlib"]
+    shard_path = tmp_path / "shards" / f"{index['shards']['python'].hex()}.msgpack.zst"
+    assert hashlib.sha256(shard_path.read_bytes()).digest() == index["shards"]["python"]
+    shard = msgpack.unpackb(zstd.decompress(shard_path.read_bytes()))
+    assert sorted(shard["packages.conda"]) == ["python-3.11.0-0.conda", "python-3.11.0-1.conda"]
+    assert shard["packages"]["python-3.10.0-0.tar.bz2"]["sha256"] == bytes.fromhex(REPODATA["packages"]["python-3.10.0-0.tar.bz2"]["sha256"])
+    assert not (tmp_path / "shards" / "stale.msgpack.zst").exists()
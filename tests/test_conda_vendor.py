@@ -2,10 +2,22 @@ from requests.adapters import urldefragauth
 from conda_vendor.conda_vendor import (
         get_conda_platform,
         reconstruct_repodata_json,
+        download_solved_pkgs,
+        stream_download,
+        diff_vendored_channel,
+        hotfix_vendored_repodata_json,
+        vendor,
+        vendor_batch,
         )
+from conda_vendor import events
+from conda_vendor.lock_file import make_lock, write_lock
+from click.testing import CliRunner
 import pytest
-from requests import Response
+from requests import HTTPError, Response
+from requests.exceptions import ChunkedEncodingError
+import bz2
 import hashlib
+import io
 import json
 from ruamel.yaml import YAML
 from requests import Response
@@ -14,6 +26,10 @@ from unittest.mock import Mock, patch, call, mock_open
 from yaml import safe_load
 from yaml.loader import SafeLoader
 import os
+import threading
+import time
+
+from .conftest import mock_response
 
 
 @patch("struct.calcsize")
@@ -35,3 +51,495 @@ def test_get_conda_platform_custom():
 
 
     
+
+
+def _fake_fetch_action(fn, content, subdir="linux-64"):
+    return {
+        "fn": fn,
+        "url": f"https://NOT_REAL.com/{subdir}/{fn}",
+        "sha256": hashlib.sha256(content).hexdigest(),
+        "subdir": subdir,
+    }
+
+
+@patch("conda_vendor.conda_vendor.improved_download")
+def test_download_solved_pkgs_concurrent(mock, tmp_path) -> None:
+    contents = {f"pkg-{i}.tar.bz2": f"DATA-{i}".encode() for i in range(8)}
+    mock.side_effect = lambda url, **kwargs: mock_response(content=contents[url.rsplit("/", 1)[1]])
+    fetch_actions = [_fake_fetch_action(fn, data) for fn, data in contents.items()]
+    fetch_actions.append(_fake_fetch_action("noarch-pkg.tar.bz2", b"NOARCH", subdir="noarch"))
+    contents["noarch-pkg.tar.bz2"] = b"NOARCH"
+    (tmp_path / "linux-64").mkdir()
+    (tmp_path / "noarch").mkdir()
+
+    download_solved_pkgs(fetch_actions, tmp_path, "linux-64", jobs=4)
+
+    assert mock.call_count == 9
+    for fn, data in contents.items():
+        subdir = "noarch" if fn.startswith("noarch") else "linux-64"
+        assert (tmp_path / subdir / fn).read_bytes() == data
+
+
+@patch("conda_vendor.conda_vendor.improved_download")
+def test_download_solved_pkgs_checksum_mismatch(mock, tmp_path) -> None:
+    mock.return_value = mock_response(content=b"TAMPERED")
+    fetch_actions = [_fake_fetch_action("pkg.tar.bz2", b"EXPECTED")]
+    (tmp_path / "linux-64").mkdir()
+
+    with pytest.raises(SystemExit, match="SHA256 Checksum Validation Failed"):
+        download_solved_pkgs(fetch_actions, tmp_path, "linux-64", jobs=2)
+    assert list((tmp_path / "linux-64").iterdir()) == []
+
+
+@patch("conda_vendor.conda_vendor.improved_download")
+def test_download_solved_pkgs_http_error(mock, tmp_path) -> None:
+    mock.return_value = mock_response(status=404)
+    fetch_actions = [_fake_fetch_action("pkg.tar.bz2", b"EXPECTED")]
+    (tmp_path / "linux-64").mkdir()
+
+    # not reported as a checksum failure
+    with pytest.raises(SystemExit, match="Failed to download pkg.tar.bz2: .* failed with HTTP 404"):
+        download_solved_pkgs(fetch_actions, tmp_path, "linux-64")
+
+
+@patch("conda_vendor.conda_vendor.improved_download")
+def test_download_solved_pkgs_failure_stops_downloads_in_flight(mock, tmp_path) -> None:
+    def _slow_chunks():
+        # about ten seconds of data unless the download is cancelled
+        for _ in range(200):
+            time.sleep(0.05)
+            yield b"A" * 10
+
+    def _download(url, **kwargs):
+        if url.endswith("big.tar.bz2"):
+            response = mock_response()
+            response.iter_content = Mock(return_value=_slow_chunks())
+            return response
+        return mock_response(content=b"TAMPERED")
+
+    mock.side_effect = _download
+    fetch_actions = [dict(_fake_fetch_action("big.tar.bz2", b"A" * 2000), size=2000),
+                     dict(_fake_fetch_action("small.tar.bz2", b"EXPECTED"), size=8)]
+    (tmp_path / "linux-64").mkdir()
+
+    start = time.perf_counter()
+    with pytest.raises(SystemExit):
+        download_solved_pkgs(fetch_actions, tmp_path, "linux-64", jobs=2)
+    assert time.perf_counter() - start < 5
+    # the interrupted download can be resumed by the next run
+    assert (tmp_path / "linux-64" / "big.tar.bz2.part").exists()
+
+
+@patch("conda_vendor.conda_vendor.improved_download")
+def test_stream_download_hashes_chunks(mock, tmp_path) -> None:
+    chunks = [b"A" * 10, b"B" * 10, b"C" * 5]
+    response = mock_response()
+    response.iter_content = Mock(return_value=iter(chunks))
+    mock.return_value = response
+    expected_hash = hashlib.sha256(b"".join(chunks)).hexdigest()
+
+    stream_download("https://NOT_REAL.com/pkg.conda", tmp_path / "pkg.conda", expected_hash)
+
+    assert (tmp_path / "pkg.conda").read_bytes() == b"".join(chunks)
+    assert mock.call_args == call("https://NOT_REAL.com/pkg.conda", stream=True, client=None, headers={})
+    assert response.close.call_count == 1
+    assert [p.name for p in tmp_path.iterdir()] == ["pkg.conda"]
+
+
+@patch("conda_vendor.conda_vendor.improved_download")
+def test_reconstruct_repodata_json(mock, tmp_path) -> None:
+    fake_live_repodata_json = {
+        "info": {"subdir": "linux-64"},
+        "packages": {
+            "file1.tar.bz2": {"id": 1},
+            "badfile1.tar.bz2": {"id": 2},
+        },
+        "packages.conda": {
+            "file3.conda": {"id": 5},
+            "badfile3.conda": {"id": 6},
+        },
+    }
+    def _fake_download(url, **kwargs):
+        # only the bz2 variant is published upstream
+        if not url.endswith(".bz2"):
+            not_found = mock_response(status=404)
+            not_found.raise_for_status.side_effect = HTTPError(response=not_found)
+            return not_found
+        response = mock_response()
+        response.raw = io.BytesIO(bz2.compress(json.dumps(fake_live_repodata_json).encode()))
+        return response
+    mock.side_effect = _fake_download
+    channel = "https://NOT_REAL.com/conda-forge/linux-64"
+    fetch_actions = [
+        {"fn": "file1.tar.bz2", "url": f"{channel}/file1.tar.bz2"},
+        {"fn": "file3.conda", "url": f"{channel}/file3.conda"},
+    ]
+    dest_dir = tmp_path / "linux-64"
+    dest_dir.mkdir()
+
+    reconstruct_repodata_json(f"{channel}/repodata.json", dest_dir, fetch_actions, compression_formats=["bz2"])
+
+    expected = {
+        "info": {"subdir": "linux-64"},
+        "packages": {"file1.tar.bz2": {"id": 1}},
+        "packages.conda": {"file3.conda": {"id": 5}},
+    }
+    TestCase().assertDictEqual(json.loads((dest_dir / "repodata.json").read_text()), expected)
+    TestCase().assertDictEqual(json.loads(bz2.decompress((dest_dir / "repodata.json.bz2").read_bytes())), expected)
+    assert mock.call_args_list[-1][0][0] == f"{channel}/repodata.json.bz2"
+
+
+def test_diff_vendored_channel(tmp_path) -> None:
+    kept = _fake_fetch_action("kept.tar.bz2", b"KEPT")
+    changed = _fake_fetch_action("changed.conda", b"NEW")
+    added = _fake_fetch_action("added.conda", b"ADDED", subdir="noarch")
+    (tmp_path / "linux-64").mkdir()
+    (tmp_path / "noarch").mkdir()
+    (tmp_path / "linux-64" / "kept.tar.bz2").write_bytes(b"KEPT")
+    (tmp_path / "linux-64" / "changed.conda").write_bytes(b"OLD")
+    (tmp_path / "linux-64" / "removed.tar.bz2").write_bytes(b"REMOVED")
+    (tmp_path / "linux-64" / "repodata.json").write_text(json.dumps({
+        "packages": {
+            "kept.tar.bz2": {"sha256": kept["sha256"]},
+            "removed.tar.bz2": {"sha256": "0" * 64},
+        },
+        "packages.conda": {"changed.conda": {"sha256": "1" * 64}},
+    }))
+
+    to_download, stale = diff_vendored_channel([kept, changed, added], tmp_path)
+
+    assert to_download == [changed, added]
+    assert stale == [tmp_path / "linux-64" / "removed.tar.bz2"]
+
+
+@patch("conda_vendor.conda_vendor.improved_download")
+def test_hotfix_merges_channels_concurrently(mock, tmp_path) -> None:
+    channels = {
+        "https://NOT_REAL.com/main/linux-64": "a-1.tar.bz2",
+        "https://NOT_REAL.com/conda-forge/linux-64": "b-1.conda",
+        "https://NOT_REAL.com/conda-forge/noarch": "c-1.conda",
+    }
+    # every upstream repodata.json must be requested before any is answered
+    barrier = threading.Barrier(len(channels), timeout=5)
+
+    def _get(url, **kwargs):
+        channel, suffix = url.rsplit("/", 1)
+        if suffix != "repodata.json":
+            not_found = mock_response(status=404)
+            not_found.raise_for_status.side_effect = HTTPError(response=not_found)
+            return not_found
+        barrier.wait()
+        fn = channels[channel]
+        section = "packages.conda" if fn.endswith(".conda") else "packages"
+        response = mock_response()
+        response.raw = io.BytesIO(json.dumps({section: {fn: {"channel": channel}, "unused.conda": {}}}).encode())
+        return response
+    mock.side_effect = _get
+
+    for subdir in ("linux-64", "noarch"):
+        (tmp_path / subdir).mkdir()
+    fetch_actions = [
+        {"channel": channel, "subdir": channel.rsplit("/", 1)[1], "fn": fn, "url": f"{channel}/{fn}", "sha256": "0", "timestamp": 0}
+        for channel, fn in channels.items()
+    ]
+    hotfix_vendored_repodata_json(fetch_actions, tmp_path)
+
+    linux = json.loads((tmp_path / "linux-64" / "repodata.json").read_text())
+    noarch = json.loads((tmp_path / "noarch" / "repodata.json").read_text())
+    assert list(linux["packages"]) == ["a-1.tar.bz2"]
+    assert list(linux["packages.conda"]) == ["b-1.conda"]
+    assert list(noarch["packages.conda"]) == ["c-1.conda"]
+
+
+class _FakeChannel:
+    def __init__(self, channel, packages):
+        self.channel = channel
+        self.packages = packages
+        self.downloads = []
+
+    def fetch_actions(self, *fns):
+        return [dict(_fake_fetch_action(fn, self.packages[fn]), channel=self.channel, url=f"{self.channel}/{fn}", timestamp=0) for fn in fns]
+
+    def get(self, url, **kwargs):
+        fn = url.rsplit("/", 1)[1]
+        if fn == "repodata.json":
+            response = mock_response()
+            response.raw = io.BytesIO(json.dumps({"packages": {
+                name: {"sha256": hashlib.sha256(data).hexdigest()} for name, data in self.packages.items()
+            }}).encode())
+            return response
+        if fn not in self.packages:
+            not_found = mock_response(status=404)
+            not_found.raise_for_status.side_effect = HTTPError(response=not_found)
+            return not_found
+        self.downloads.append(fn)
+        return mock_response(content=self.packages[fn])
+
+
+@patch("conda_vendor.conda_vendor.improved_download")
+def test_vendor_update_from_lock(mock, tmp_path, monkeypatch) -> None:
+    channel = _FakeChannel("https://NOT_REAL.com/main/linux-64", {
+        "a-1.tar.bz2": b"A1", "b-1.tar.bz2": b"B1", "b-2.tar.bz2": b"B2",
+    })
+    mock.side_effect = lambda url, **kwargs: channel.get(url)
+    monkeypatch.chdir(tmp_path)
+    old_lock = tmp_path / "old.json"
+    new_lock = tmp_path / "new.json"
+    write_lock(old_lock, make_lock("env", "linux-64", "conda", [], [], channel.fetch_actions("a-1.tar.bz2", "b-1.tar.bz2")))
+    write_lock(new_lock, make_lock("env", "linux-64", "conda", [], [], channel.fetch_actions("a-1.tar.bz2", "b-2.tar.bz2")))
+
+    runner = CliRunner()
+    first = runner.invoke(vendor, ["--from-lock", str(old_lock), "--no-cache", "--jobs", "1"])
+    second = runner.invoke(vendor, ["--from-lock", str(new_lock), "--no-cache", "--jobs", "1", "--update", "--prune"])
+
+    assert first.exit_code == 0, first.output
+    assert second.exit_code == 0, second.output
+    assert channel.downloads == ["a-1.tar.bz2", "b-1.tar.bz2", "b-2.tar.bz2"]
+    assert sorted(p.name for p in (tmp_path / "env" / "linux-64").iterdir()) == ["a-1.tar.bz2", "b-2.tar.bz2", "current_repodata.json", "repodata.json"]
+    repodata = json.loads((tmp_path / "env" / "linux-64" / "repodata.json").read_text())
+    assert sorted(repodata["packages"]) == ["a-1.tar.bz2", "b-2.tar.bz2"]
+    assert json.loads((tmp_path / "env" / "noarch" / "repodata.json").read_text())["packages"] == {}
+
+
+@patch("conda_vendor.conda_vendor.improved_download")
+def test_vendor_update_prune_refreshes_compressed_repodata(mock, tmp_path, monkeypatch) -> None:
+    pytest.importorskip("msgpack")
+    channel = _FakeChannel("https://NOT_REAL.com/main/linux-64", {"a-1.tar.bz2": b"A1", "b-1.tar.bz2": b"B1"})
+    mock.side_effect = lambda url, **kwargs: channel.get(url)
+    monkeypatch.chdir(tmp_path)
+    old_lock = tmp_path / "old.json"
+    new_lock = tmp_path / "new.json"
+    write_lock(old_lock, make_lock("env", "linux-64", "conda", [], [], channel.fetch_actions("a-1.tar.bz2", "b-1.tar.bz2")))
+    write_lock(new_lock, make_lock("env", "linux-64", "conda", [], [], channel.fetch_actions("a-1.tar.bz2")))
+
+    runner = CliRunner()
+    first = runner.invoke(vendor, ["--from-lock", str(old_lock), "--no-cache", "--compress-repodata", "bz2", "--compress-repodata", "zst", "--shards"])
+    assert first.exit_code == 0, first.output
+    subdir = tmp_path / "env" / "linux-64"
+    assert (subdir / "repodata.json.zst").exists() and (subdir / "repodata_shards.msgpack.zst").exists()
+
+    second = runner.invoke(vendor, ["--from-lock", str(new_lock), "--no-cache", "--compress-repodata", "bz2", "--update", "--prune"])
+    assert second.exit_code == 0, second.output
+    assert sorted(json.loads(bz2.decompress((subdir / "repodata.json.bz2").read_bytes()))["packages"]) == ["a-1.tar.bz2"]
+    # indexes this run did not write would still list b-1.tar.bz2
+    assert not (subdir / "repodata.json.zst").exists()
+    assert not (subdir / "repodata_shards.msgpack.zst").exists()
+    assert not (subdir / "shards").exists()
+
+
+@patch("conda_vendor.conda_vendor.improved_download")
+def test_vendor_metrics_json(mock, tmp_path, monkeypatch) -> None:
+    channel = _FakeChannel("https://NOT_REAL.com/main/linux-64", {"a-1.tar.bz2": b"A1", "b-1.tar.bz2": b"B1"})
+    mock.side_effect = lambda url, **kwargs: channel.get(url)
+    monkeypatch.chdir(tmp_path)
+    lock = tmp_path / "env.json"
+    write_lock(lock, make_lock("env", "linux-64", "conda", [], [], channel.fetch_actions("a-1.tar.bz2", "b-1.tar.bz2")))
+
+    runner = CliRunner()
+    result = runner.invoke(vendor, ["--from-lock", str(lock), "--no-cache", "--adaptive-jobs", "--metrics-json", "metrics.json"])
+
+    assert result.exit_code == 0, result.output
+    report = json.loads((tmp_path / "metrics.json").read_text())
+    assert {"total", "download_packages", "repodata_hotfix"} <= set(report["phases"])
+    assert report["phases"]["total"]["wall_time"] >= report["phases"]["download_packages"]["wall_time"]
+    assert report["download_latency"]["count"] == 2
+    assert report["http"]["requests"] == 0
+    assert report["http"]["errors"] == {}
+    assert report["concurrency"]["max"] == 4
+    assert report["peak_memory"]["self_bytes"] > 0
+
+
+@patch("conda_vendor.conda_vendor.improved_download")
+def test_vendor_ndjson_output(mock, tmp_path, monkeypatch) -> None:
+    channel = _FakeChannel("https://NOT_REAL.com/main/linux-64", {"a-1.tar.bz2": b"A1", "b-1.tar.bz2": b"B1"})
+    mock.side_effect = lambda url, **kwargs: channel.get(url)
+    monkeypatch.chdir(tmp_path)
+    lock = tmp_path / "env.json"
+    write_lock(lock, make_lock("env", "linux-64", "conda", [], [], channel.fetch_actions("a-1.tar.bz2", "b-1.tar.bz2")))
+
+    runner = CliRunner()
+    result = runner.invoke(vendor, ["--from-lock", str(lock), "--no-cache", "--output", "ndjson"])
+
+    assert result.exit_code == 0, result.output
+    records = [json.loads(line) for line in result.output.splitlines()]
+    names = [record["event"] for record in records]
+    assert names[0] == "vendor_start" and names[-1] == "vendor_complete"
+    assert sorted(r["fn"] for r in records if r["event"] == "package_verified") == ["a-1.tar.bz2", "b-1.tar.bz2"]
+    assert names.count("package") == 2
+    assert "repodata_fetch" in names
+
+
+@patch("conda_vendor.conda_vendor.improved_download")
+def test_vendor_ndjson_errors(mock, tmp_path, monkeypatch) -> None:
+    channel = _FakeChannel("https://NOT_REAL.com/main/linux-64", {"a-1.tar.bz2": b"A1"})
+    mock.side_effect = lambda url, **kwargs: channel.get(url)
+    monkeypatch.chdir(tmp_path)
+    lock = tmp_path / "env.json"
+    write_lock(lock, make_lock("env", "linux-64", "conda", [], [], channel.fetch_actions("a-1.tar.bz2")))
+    (tmp_path / "env").mkdir()
+
+    result = CliRunner().invoke(vendor, ["--from-lock", str(lock), "--no-cache", "--output", "ndjson"])
+
+    assert result.exit_code != 0
+    # everything but the exit message is an event
+    *lines, message = result.output.splitlines()
+    records = [json.loads(line) for line in lines]
+    assert records[-1]["event"] == "error" and "File exists" in records[-1]["error"]
+    assert message == 'Directory "env" already exists'
+
+
+@patch("conda_vendor.conda_vendor.improved_download")
+def test_download_solved_pkgs_reports_unexpected_failure(mock, tmp_path) -> None:
+    mock.side_effect = OSError("disk full")
+    (tmp_path / "linux-64").mkdir()
+
+    with events.capture() as captured, pytest.raises(OSError):
+        download_solved_pkgs([_fake_fetch_action("pkg.tar.bz2", b"DATA")], tmp_path, "linux-64")
+    failed = [record for record, _, _ in captured if record["event"] == "package_failed"]
+    assert failed[0]["fn"] == "pkg.tar.bz2" and failed[0]["error"] == "disk full"
+
+
+def test_vendor_ironbank_gen_ndjson(tmp_path, monkeypatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    lock = tmp_path / "env.json"
+    write_lock(lock, make_lock("env", "linux-64", "conda", [], [], [_fake_fetch_action("a-1.tar.bz2", b"A1")]))
+    bad_lock = tmp_path / "bad.lock.json"
+    bad_lock.write_text("{")
+    runner = CliRunner()
+
+    result = runner.invoke(vendor, ["--from-lock", str(lock), "--dry-run", "true", "--ironbank-gen", "true", "--no-cache", "--output", "ndjson"])
+    assert result.exit_code == 0
+    records = [json.loads(line) for line in result.output.splitlines()]
+    assert {"event": "ironbank_manifest", "path": "ib_manifest.yaml", "resources": 1}.items() <= records[-1].items()
+    assert (tmp_path / "ib_manifest.yaml").exists()
+
+    result = runner.invoke(vendor, ["--from-lock", str(bad_lock), "--no-cache", "--output", "ndjson"])
+    assert result.exit_code != 0
+    names = [json.loads(line)["event"] for line in result.output.splitlines()[:-1]]
+    assert names[-1] == "error"
+
+
+@patch("conda_vendor.conda_vendor.vendor_fetch_actions")
+@patch("conda_vendor.conda_vendor.resolve_environments")
+def test_vendor_batch_merges_environments(mock_resolve, mock_vendor, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    env_dir = tmp_path / "envs"
+    env_dir.mkdir()
+    (env_dir / "a.yaml").write_text("name: env-a\n")
+    (env_dir / "b.yml").write_text("name: env-b\n")
+    shared = {"fn": "python-3.9.5-0.tar.bz2", "subdir": "linux-64", "sha256": "0" * 64}
+    only_b = {"fn": "numpy-1.26.0-0.conda", "subdir": "linux-64", "sha256": "1" * 64}
+    mock_resolve.return_value = [
+        make_lock("env-a", "linux-64", "conda", [], [], [shared]),
+        make_lock("env-b", "linux-64", "conda", [], [], [shared, only_b]),
+    ]
+
+    result = CliRunner().invoke(vendor_batch, ["--dir", str(env_dir), "--name", "merged", "-p", "linux-64", "--no-cache"])
+
+    assert result.exit_code == 0, result.output
+    assert mock_vendor.call_args[0][0] == [shared, only_b]
+    manifest = json.loads((tmp_path / "merged" / "environments" / "env-b.json").read_text())
+    assert [pkg["fn"] for pkg in manifest["packages"]] == ["python-3.9.5-0.tar.bz2", "numpy-1.26.0-0.conda"]
+    assert (tmp_path / "merged" / "environments" / "env-a.json").exists()
+
+
+@patch("conda_vendor.conda_vendor.improved_download")
+def test_vendor_quiet_drops_banners(mock, tmp_path, monkeypatch) -> None:
+    channel = _FakeChannel("https://NOT_REAL.com/main/linux-64", {"a-1.tar.bz2": b"A1"})
+    mock.side_effect = lambda url, **kwargs: channel.get(url)
+    monkeypatch.chdir(tmp_path)
+    lock = tmp_path / "env.json"
+    write_lock(lock, make_lock("env", "linux-64", "conda", [], [], channel.fetch_actions("a-1.tar.bz2")))
+
+    runner = CliRunner()
+    result = runner.invoke(vendor, ["--from-lock", str(lock), "--no-cache", "--quiet"])
+
+    assert result.exit_code == 0, result.output
+    assert "Package: a-1.tar.bz2" not in result.output
+    assert "Vendoring Complete!" in result.output
+
+
+def _write_part(tmp_path, content, offset, sha256, etag='"v1"'):
+    (tmp_path / "pkg.conda.part").write_bytes(content[:offset])
+    (tmp_path / "pkg.conda.part.json").write_text(json.dumps({
+        "url": "https://NOT_REAL.com/pkg.conda", "sha256": sha256, "etag": etag, "offset": offset,
+    }))
+
+
+@patch("conda_vendor.conda_vendor.improved_download")
+def test_stream_download_resumes_part_file(mock, tmp_path) -> None:
+    content = b"0123456789" * 10
+    expected_hash = hashlib.sha256(content).hexdigest()
+    _write_part(tmp_path, content, 40, expected_hash)
+    response = mock_response(status=206, content=content[40:])
+    response.headers = {"Content-Range": "bytes 40-99/100", "ETag": '"v1"'}
+    mock.return_value = response
+
+    stream_download("https://NOT_REAL.com/pkg.conda", tmp_path / "pkg.conda", expected_hash)
+
+    assert mock.call_args.kwargs["headers"] == {"Range": "bytes=40-", "If-Range": '"v1"'}
+    assert (tmp_path / "pkg.conda").read_bytes() == content
+    assert [p.name for p in tmp_path.iterdir()] == ["pkg.conda"]
+
+
+@patch("conda_vendor.conda_vendor.improved_download")
+def test_stream_download_restarts_without_range_support(mock, tmp_path) -> None:
+    content = b"0123456789" * 10
+    expected_hash = hashlib.sha256(content).hexdigest()
+    _write_part(tmp_path, b"X" * 40, 40, expected_hash)
+    mock.return_value = mock_response(status=200, content=content)
+
+    stream_download("https://NOT_REAL.com/pkg.conda", tmp_path / "pkg.conda", expected_hash)
+
+    assert (tmp_path / "pkg.conda").read_bytes() == content
+
+
+@patch("conda_vendor.conda_vendor.improved_download")
+def test_stream_download_resumes_after_interruption(mock, tmp_path) -> None:
+    content = b"0123456789" * 10
+    expected_hash = hashlib.sha256(content).hexdigest()
+
+    def _interrupted(chunk_size=None):
+        yield content[:30]
+        raise ChunkedEncodingError("connection reset")
+
+    interrupted = mock_response(content=content)
+    interrupted.headers = {"ETag": '"v1"'}
+    interrupted.iter_content = Mock(side_effect=_interrupted)
+    resumed = mock_response(status=206, content=content[30:])
+    resumed.headers = {"Content-Range": "bytes 30-99/100", "ETag": '"v1"'}
+    mock.side_effect = [interrupted, resumed]
+
+    stream_download("https://NOT_REAL.com/pkg.conda", tmp_path / "pkg.conda", expected_hash)
+
+    assert mock.call_args_list[1].kwargs["headers"]["Range"] == "bytes=30-"
+    assert (tmp_path / "pkg.conda").read_bytes() == content
+
+
+@patch("conda_vendor.conda_vendor.improved_download")
+def test_stream_download_keeps_part_file_on_error_response(mock, tmp_path) -> None:
+    content = b"0123456789" * 10
+    expected_hash = hashlib.sha256(content).hexdigest()
+    _write_part(tmp_path, content, 40, expected_hash)
+    mock.return_value = mock_response(status=503, content=b"Service Unavailable")
+
+    with pytest.raises(RuntimeError, match="HTTP 503"):
+        stream_download("https://NOT_REAL.com/pkg.conda", tmp_path / "pkg.conda", expected_hash)
+
+    assert (tmp_path / "pkg.conda.part").read_bytes() == content[:40]
+    assert json.loads((tmp_path / "pkg.conda.part.json").read_text())["offset"] == 40
+
+
+@patch("conda_vendor.conda_vendor.improved_download")
+def test_stream_download_refetches_on_wrong_content_range(mock, tmp_path) -> None:
+    content = b"0123456789" * 10
+    expected_hash = hashlib.sha256(content).hexdigest()
+    _write_part(tmp_path, content, 40, expected_hash)
+    wrong_range = mock_response(status=206, content=content[20:])
+    wrong_range.headers = {"Content-Range": "bytes 20-99/100"}
+    mock.side_effect = [wrong_range, mock_response(status=200, content=content)]
+
+    stream_download("https://NOT_REAL.com/pkg.conda", tmp_path / "pkg.conda", expected_hash)
+
+    assert mock.call_args_list[1].kwargs["headers"] == {}
+    assert (tmp_path / "pkg.conda").read_bytes() == content
@@ -0,0 +1,34 @@
+import json
+
+from conda_vendor import events
+from conda_vendor.events import EventStream
+
+
+def test_ndjson_events_are_buffered(tmp_path, monkeypatch):
+    monkeypatch.setattr(events, "BUFFER_SIZE", 200)
+    out = tmp_path / "events.ndjson"
+    with events.event_stream("ndjson", out) as stream:
+        events.emit("package_verified", "ignored in ndjson", fn="a-1.tar.bz2")
+        assert out.read_text() == ""
+        for i in range(10):
+            events.emit("package_verified", fn=f"pkg-{i}.conda")
+        assert out.read_text() != ""
+
+    lines = out.read_text().splitlines()
+    assert len(lines) == 11
+    assert json.loads(lines[0])["fn"] == "a-1.tar.bz2"
+    assert events._stream is not stream
+
+
+def test_quiet_and_capture(tmp_path):
+    out = tmp_path / "events.ndjson"
+    with out.open("w") as f:
+        stream = EventStream("ndjson", f, quiet=True)
+        with stream.capture() as captured:
+            stream.emit("package", "banner", banner=True, fn="a")
+            stream.emit("solve_complete", "Successfull Solve", platform="linux-64")
+        assert len(captured) == 1
+        stream.replay(captured)
+        stream.flush()
+
+    assert [json.loads(line)["event"] for line in out.read_text().splitlines()] == ["solve_complete"]
@@ -0,0 +1,109 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import pytest
+from requests import Response
+
+from conda_vendor.http_client import DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT, HttpClient, classify_error
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = self.path.encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="function")
+def local_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_HttpClient_reuses_connections(local_server) -> None:
+    with HttpClient(pool_size=2) as client:
+        for i in range(5):
+            response = client.get(f"{local_server}/pkg-{i}")
+            assert response.content == f"/pkg-{i}".encode()
+        stats = client.connection_stats()
+    assert stats == {"hosts": 1, "connections": 1, "requests": 5, "reused": 4}
+
+
+@patch("requests.Session.get")
+def test_HttpClient_applies_timeout(mock) -> None:
+    mock.return_value = Response()
+    client = HttpClient(timeout=3.5)
+    client.get("https://NOT_REAL.com", stream=True)
+    assert mock.call_args.kwargs == {"timeout": 3.5, "stream": True}
+
+
+def test_HttpClient_default_deadlines() -> None:
+    assert HttpClient().timeout == (DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT)
+    assert HttpClient(connect_timeout=1, read_timeout=2).timeout == (1, 2)
+
+
+class _FlakyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    failures = {}
+
+    def do_GET(self):
+        remaining = self.failures.get(self.path, [])
+        if remaining:
+            status = remaining.pop(0)
+            if status == "stall":
+                threading.Event().wait(1)
+                return
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.send_header("Retry-After", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"OK")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="function")
+def flaky_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FlakyHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_HttpClient_classifies_retried_errors(flaky_server) -> None:
+    _FlakyHandler.failures.update({"/throttled": [429, 503], "/missing": [404], "/stalled": ["stall"]})
+    with HttpClient(retries=2, backoff_factor=0, read_timeout=0.2) as client:
+        assert client.get(f"{flaky_server}/throttled").content == b"OK"
+        # client errors are not retried
+        assert client.get(f"{flaky_server}/missing").status_code == 404
+        assert client.get(f"{flaky_server}/stalled").content == b"OK"
+        assert client.error_counts() == {"throttled": 1, "server": 1, "read_timeout": 1}
+
+
+def test_classify_error() -> None:
+    from requests import exceptions
+    assert classify_error(status=429) == "throttled"
+    assert classify_error(status=502) == "server"
+    assert classify_error(exceptions.ConnectTimeout()) == "connect_timeout"
+    assert classify_error(exceptions.ChunkedEncodingError()) == "reset"
+    assert classify_error(exceptions.ConnectionError()) == "connect"
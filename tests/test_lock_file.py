@@ -0,0 +1,171 @@
+import json
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from click.testing import CliRunner
+
+from conda_vendor.cache import SolveCache
+from conda_vendor.conda_vendor import (
+    ironbank_gen,
+    merge_fetch_actions,
+    platform_lock_path,
+    resolve_environment,
+    vendor,
+)
+from conda_vendor.lock_file import make_lock, read_lock, solve_key, write_lock
+
+FAKE_FETCH_ACTIONS = [{
+    "fn": "python-3.9.5-h12debd9_4.tar.bz2",
+    "name": "python",
+    "url": "https://repo.anaconda.com/pkgs/main/linux-64/python-3.9.5-h12debd9_4.tar.bz2",
+    "sha256": "0" * 64,
+    "subdir": "linux-64",
+}]
+
+
+@pytest.fixture(scope="function")
+def lock_file(tmp_path):
+    lock = make_lock("minimal_env", "linux-64", "conda", ["main"], ["python==3.9.5"], FAKE_FETCH_ACTIONS)
+    path = tmp_path / "minimal_env.lock.json"
+    write_lock(path, lock)
+    return path
+
+
+def test_solve_key_ignores_spec_order():
+    key = solve_key(["python", "pip"], ["main"], "linux-64", "conda")
+    assert key == solve_key(["pip", "python"], ["main"], "linux-64", "conda")
+    assert key != solve_key(["pip", "python"], ["main"], "linux-64", "mamba")
+    assert key != solve_key(["pip", "python"], ["main"], "osx-64", "conda")
+
+
+def test_read_lock_round_trip(lock_file):
+    lock = read_lock(lock_file)
+    assert lock["name"] == "minimal_env"
+    assert lock["fetch_actions"] == FAKE_FETCH_ACTIONS
+
+
+@patch("conda_vendor.conda_vendor.get_fetch_actions")
+@patch("conda_vendor.conda_vendor.solve_environment")
+@patch("conda_vendor.conda_vendor.get_lock_spec_for_environment_file")
+def test_resolve_environment_reuses_cached_solve(mock_lock_spec, mock_solve, mock_fetch, python_main_environment, tmp_path):
+    dependency = SimpleNamespace(name="python", version="3.9.5")
+    mock_lock_spec.return_value = SimpleNamespace(
+        dependencies={"linux-64": [dependency]},
+        channels=[SimpleNamespace(url="main")])
+    mock_fetch.return_value = FAKE_FETCH_ACTIONS
+    solve_cache = SolveCache(tmp_path)
+
+    first = resolve_environment(python_main_environment, "conda", "linux-64", solve_cache)
+    second = resolve_environment(python_main_environment, "conda", "linux-64", solve_cache)
+
+    assert first == second
+    assert second["fetch_actions"] == FAKE_FETCH_ACTIONS
+    assert mock_solve.call_count == 1
+
+
+@patch("conda_vendor.conda_vendor.get_fetch_actions")
+@patch("conda_vendor.conda_vendor.solve_environment")
+@patch("conda_vendor.conda_vendor.get_lock_spec_for_environment_file")
+def test_resolve_environment_expired_solve(mock_lock_spec, mock_solve, mock_fetch, python_main_environment, tmp_path, monkeypatch):
+    mock_lock_spec.return_value = SimpleNamespace(
+        dependencies={"linux-64": [SimpleNamespace(name="python", version="3.9.5")]},
+        channels=[SimpleNamespace(url="main")])
+    mock_fetch.return_value = FAKE_FETCH_ACTIONS
+
+    first = resolve_environment(python_main_environment, "conda", "linux-64", SolveCache(tmp_path, max_age=3600))
+    assert first["solved_at"] <= time.time()
+    # an hour and a bit later
+    now = first["solved_at"] + 3601
+    monkeypatch.setattr("conda_vendor.cache.time.time", lambda: now)
+    resolve_environment(python_main_environment, "conda", "linux-64", SolveCache(tmp_path, max_age=7200))
+    assert mock_solve.call_count == 1
+    resolve_environment(python_main_environment, "conda", "linux-64", SolveCache(tmp_path, max_age=3600))
+    assert mock_solve.call_count == 2
+    # max_age=0 always solves again
+    resolve_environment(python_main_environment, "conda", "linux-64", SolveCache(tmp_path, max_age=0))
+    assert mock_solve.call_count == 3
+
+
+@patch("conda_vendor.conda_vendor.get_fetch_actions")
+@patch("conda_vendor.conda_vendor.solve_environment")
+@patch("conda_vendor.conda_vendor.get_lock_spec_for_environment_file")
+def test_resolve_environment_cached_solve_keeps_name(mock_lock_spec, mock_solve, mock_fetch, tmp_path):
+    mock_lock_spec.return_value = SimpleNamespace(
+        dependencies={"linux-64": [SimpleNamespace(name="python", version="3.9.5")]},
+        channels=[SimpleNamespace(url="main")])
+    mock_fetch.return_value = FAKE_FETCH_ACTIONS
+    env_files = []
+    for name in ("env-a", "env-b"):
+        env_file = tmp_path / f"{name}.yaml"
+        env_file.write_text(f"name: {name}\nchannels:\n- main\ndependencies:\n- python=3.9.5\n")
+        env_files.append(env_file)
+    solve_cache = SolveCache(tmp_path / "cache")
+
+    first = resolve_environment(env_files[0], "conda", "linux-64", solve_cache)
+    second = resolve_environment(env_files[1], "conda", "linux-64", solve_cache)
+
+    assert mock_solve.call_count == 1
+    assert (first["name"], second["name"]) == ("env-a", "env-b")
+    assert second["fetch_actions"] == first["fetch_actions"]
+
+
+@patch("conda_vendor.conda_vendor.solve_environment")
+def test_vendor_dry_run_from_lock(mock_solve, lock_file):
+    runner = CliRunner()
+    result = runner.invoke(vendor, ["--from-lock", str(lock_file), "--dry-run", "True"])
+    assert result.exit_code == 0
+    fetch_actions = json.loads(result.output.split("Dry Run Complete!", 1)[1])
+    assert fetch_actions == FAKE_FETCH_ACTIONS
+    assert mock_solve.call_count == 0
+
+
+def test_ironbank_gen_from_lock(lock_file, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    runner = CliRunner()
+    result = runner.invoke(ironbank_gen, ["--from-lock", str(lock_file)])
+    assert result.exit_code == 0
+    assert "python-3.9.5-h12debd9_4.tar.bz2" in (tmp_path / "ib_manifest.yaml").read_text()
+
+
+def test_vendor_requires_file_or_lock():
+    result = CliRunner().invoke(vendor, [])
+    assert result.exit_code != 0
+    assert "Exactly one of --file or --from-lock is required" in result.output
+
+
+def test_merge_fetch_actions_dedupes_noarch():
+    noarch = {"fn": "tzdata-2024a-h0c530f3_0.conda", "subdir": "noarch", "sha256": "0" * 64}
+    linux = {"fn": "python-3.9.5-h12debd9_4.tar.bz2", "subdir": "linux-64", "sha256": "1" * 64}
+    osx = {"fn": "python-3.9.5-h12debd9_4.tar.bz2", "subdir": "osx-arm64", "sha256": "2" * 64}
+    locks = [
+        {"fetch_actions": [linux, dict(noarch)]},
+        {"fetch_actions": [osx, dict(noarch)]},
+    ]
+    assert merge_fetch_actions(locks) == [linux, noarch, osx]
+
+
+def test_vendor_dry_run_from_several_locks(lock_file, tmp_path):
+    osx_lock = make_lock("minimal_env", "osx-arm64", "conda", ["main"], ["python==3.9.5"], [
+        dict(FAKE_FETCH_ACTIONS[0], subdir="osx-arm64"),
+    ])
+    osx_lock_file = tmp_path / "osx.lock.json"
+    write_lock(osx_lock_file, osx_lock)
+
+    result = CliRunner().invoke(vendor, ["--from-lock", str(lock_file), "--from-lock", str(osx_lock_file), "--dry-run", "True"])
+
+    assert result.exit_code == 0
+    fetch_actions = json.loads(result.output.split("Dry Run Complete!", 1)[1])
+    assert [pkg["subdir"] for pkg in fetch_actions] == ["linux-64", "osx-arm64"]
+
+
+def test_platform_lock_path():
+    assert platform_lock_path("out/env.lock.json", "linux-64").as_posix() == "out/env.lock.linux-64.json"
+
+
+def test_merge_fetch_actions_rejects_conflicting_files():
+    pkg = {"fn": "python-3.9.5-0.tar.bz2", "subdir": "linux-64", "sha256": "0" * 64}
+    other = dict(pkg, sha256="1" * 64)
+    with pytest.raises(ValueError):
+        merge_fetch_actions([{"fetch_actions": [pkg]}, {"fetch_actions": [other]}])
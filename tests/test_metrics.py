@@ -0,0 +1,61 @@
+import io
+import sys
+
+from conda_vendor.metrics import CountingReader, Metrics, phase
+
+
+def test_phases_add_up():
+    metrics = Metrics()
+    with metrics.phase("solve[linux-64]"):
+        pass
+    metrics.add_phase("solve[linux-64]", 1.5, 0.5)
+    with phase(None, "ignored"):
+        pass
+
+    report = metrics.report()
+
+    assert list(report["phases"]) == ["solve[linux-64]"]
+    assert report["phases"]["solve[linux-64]"]["wall_time"] >= 1.5
+    assert report["phases"]["solve[linux-64]"]["cpu_time"] >= 0.5
+
+
+def test_transfers_and_latency():
+    metrics = Metrics()
+    metrics.record_transfer("https://conda.anaconda.org/main/linux-64/a.conda", 100)
+    metrics.record_transfer("https://conda.anaconda.org/main/noarch/b.conda", 50)
+    metrics.record_transfer("http://mirror.local:8080/main/repodata.json", 10)
+    for seconds in (0.01, 0.2, 0.3, 7):
+        metrics.record_download(seconds)
+    metrics.record_cache("packages", 3, 1)
+
+    report = metrics.report()
+
+    assert report["bytes_by_host"] == {"conda.anaconda.org": 150, "mirror.local:8080": 10}
+    assert report["bytes_total"] == 160
+    latency = report["download_latency"]
+    assert latency["count"] == 4
+    assert latency["p50"] == 0.3
+    assert latency["max"] == 7
+    assert sum(bucket["count"] for bucket in latency["histogram"]) == 4
+    assert report["caches"]["packages"]["hit_rate"] == 0.75
+
+
+def test_counting_reader():
+    metrics = Metrics()
+    reader = io.BufferedReader(CountingReader(io.BytesIO(b"x" * 1000), "https://host/repodata.json", metrics))
+
+    assert reader.read() == b"x" * 1000
+    assert metrics.report()["bytes_by_host"] == {"host": 1000}
+
+
+def test_report_without_resource_module(monkeypatch):
+    # as on windows, where the resource module does not exist
+    monkeypatch.setitem(sys.modules, "resource", None)
+    metrics = Metrics()
+    with metrics.phase("total"):
+        pass
+
+    report = metrics.report()
+
+    assert report["phases"]["total"]["cpu_time"] >= 0
+    assert report["peak_memory"] == {"self_bytes": None, "children_bytes": None}
@@ -0,0 +1,152 @@
+import hashlib
+import os
+import time
+from unittest.mock import patch
+
+import pytest
+
+from benchmarks.channel_server import ChannelServer
+from conda_vendor.conda_vendor import hedged_download
+from conda_vendor.http_client import HttpClient
+from conda_vendor.mirrors import MirrorSet, parse_mirror
+
+PACKAGE = "chan/linux-64/pkg-1.0-0.conda"
+
+
+def _serve(root, content):
+    path = root / PACKAGE
+    path.parent.mkdir(parents=True)
+    path.write_bytes(content)
+    return root
+
+
+def test_parse_mirror():
+    assert parse_mirror("https://conda.anaconda.org/main/=https://mirror/main") == ("https://conda.anaconda.org/main", "https://mirror/main")
+    with pytest.raises(ValueError):
+        parse_mirror("https://mirror/main")
+
+
+def test_candidates_rank_by_measurements():
+    mirrors = MirrorSet({"https://upstream/chan": ["https://fast/chan", "https://down/chan"]})
+    assert mirrors.candidates("https://other/chan/linux-64/a.conda") == ["https://other/chan/linux-64/a.conda"]
+
+    mirrors.record_transfer("https://upstream/chan/linux-64/a.conda", 1000, 1.0)
+    mirrors.record_transfer("https://fast/chan/linux-64/a.conda", 1000, 0.1)
+    mirrors.record_failure("https://down/chan/linux-64/a.conda")
+
+    # urls on a mirror map back to the same file on the others
+    assert mirrors.candidates("https://fast/chan/noarch/b.conda") == [
+        "https://fast/chan/noarch/b.conda",
+        "https://upstream/chan/noarch/b.conda",
+        "https://down/chan/noarch/b.conda",
+    ]
+
+
+def test_hedge_delay_from_observed_rates():
+    mirrors = MirrorSet({}, hedge_percentile=95, min_hedge_delay=0)
+    assert mirrors.hedge_delay(1000) is None
+    for seconds in (1, 1, 1, 1, 10):
+        mirrors.record_transfer("https://upstream/chan/a.conda", 1000, seconds)
+    # only the 100 bytes/sec transfer is slower than the 1000 bytes/sec ones
+    assert mirrors.hedge_delay(1000) == pytest.approx(10)
+    assert mirrors.hedge_delay() == 1
+
+
+def test_failover_to_mirror(tmp_path):
+    content = b"PACKAGE"
+    with ChannelServer(_serve(tmp_path / "mirror", content)) as mirror:
+        down = ChannelServer(tmp_path)
+        down_url = down.url
+        down.server_close()
+
+        mirrors = MirrorSet({f"{down_url}/chan": [f"{mirror.url}/chan"]})
+        with HttpClient(retries=0, mirrors=mirrors) as client:
+            response = client.get(f"{down_url}/{PACKAGE}")
+            assert response.content == content
+
+    report = mirrors.report()[f"{down_url}/chan"]
+    assert report[down_url + "/chan"]["failures"] == 1
+    assert report[mirror.url + "/chan"]["requests"] == 1
+
+
+def test_hedged_request_races_slow_mirror(tmp_path):
+    content = b"PACKAGE"
+    with ChannelServer(_serve(tmp_path / "slow", content), delay=2.0) as slow, \
+            ChannelServer(_serve(tmp_path / "fast", content), delay=0.1) as fast:
+        mirrors = MirrorSet({f"{slow.url}/chan": [f"{fast.url}/chan"]}, min_hedge_delay=0)
+        # the slow server looked best so far, responses took 100ms
+        mirrors.record_latency(f"{slow.url}/chan/linux-64/earlier.conda", 0.01)
+        mirrors.record_latency(f"{fast.url}/chan/linux-64/earlier.conda", 0.5)
+        with HttpClient(mirrors=mirrors) as client:
+            client.latencies.extend([0.1] * 5)
+            start = time.perf_counter()
+            response = client.get(f"{slow.url}/{PACKAGE}")
+            elapsed = time.perf_counter() - start
+
+    assert response.content == content
+    assert response.url == f"{fast.url}/{PACKAGE}"
+    assert elapsed < 1.5
+    assert mirrors.report()[f"{slow.url}/chan"][f"{fast.url}/chan"]["hedges"] == 1
+
+
+def test_hedged_download_races_slow_mirror(tmp_path):
+    content = os.urandom(256 * 1024)
+    sha256 = hashlib.sha256(content).hexdigest()
+    with ChannelServer(_serve(tmp_path / "slow", content), delay=2.0) as slow, \
+            ChannelServer(_serve(tmp_path / "fast", content)) as fast:
+        mirrors = MirrorSet({f"{slow.url}/chan": [f"{fast.url}/chan"]}, min_hedge_delay=0)
+        # earlier transfers made the slow server look best
+        for _ in range(5):
+            mirrors.record_transfer(f"{slow.url}/chan/linux-64/earlier.conda", 1024 * 1024, 1.0)
+        mirrors.record_transfer(f"{fast.url}/chan/linux-64/earlier.conda", 1024 * 1024, 2.0)
+        (tmp_path / "dest").mkdir()
+        dest = tmp_path / "dest" / "pkg-1.0-0.conda"
+
+        with HttpClient(mirrors=mirrors) as client:
+            used = hedged_download(f"{slow.url}/{PACKAGE}", dest, sha256, client, size=len(content))
+
+    assert used == f"{fast.url}/{PACKAGE}"
+    assert dest.read_bytes() == content
+    assert mirrors.report()[f"{slow.url}/chan"][f"{fast.url}/chan"]["hedges"] == 1
+    # the losing attempt stops and removes its .part files
+    deadline = time.monotonic() + 5
+    while len(list(dest.parent.iterdir())) > 1 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert [p.name for p in dest.parent.iterdir()] == [dest.name]
+
+
+def test_hedged_download_verifies_every_mirror(tmp_path):
+    content = b"PACKAGE"
+    with ChannelServer(_serve(tmp_path / "tampered", b"TAMPERED")) as tampered, \
+            ChannelServer(_serve(tmp_path / "good", content)) as good:
+        mirrors = MirrorSet({f"{tampered.url}/chan": [f"{good.url}/chan"]})
+        (tmp_path / "dest").mkdir()
+        dest = tmp_path / "dest" / "pkg-1.0-0.conda"
+
+        with HttpClient(mirrors=mirrors) as client:
+            used = hedged_download(f"{tampered.url}/{PACKAGE}", dest, hashlib.sha256(content).hexdigest(), client)
+
+    assert used == f"{good.url}/{PACKAGE}"
+    assert dest.read_bytes() == content
+    assert [p.name for p in dest.parent.iterdir()] == [dest.name]
+    assert mirrors.report()[f"{tampered.url}/chan"][f"{tampered.url}/chan"]["failures"] == 1
+
+
+def test_hedged_download_removes_failed_attempts(tmp_path):
+    mirrors = MirrorSet({"https://upstream/chan": ["https://mirror/chan"]})
+    dest = tmp_path / "pkg-1.0-0.conda"
+
+    def _stream_download(url, target, sha256, client=None, cancel=None):
+        if url.startswith("https://upstream/"):
+            # interrupted after resumable state was written
+            target.with_name(f"{target.name}.part").write_bytes(b"PACK")
+            target.with_name(f"{target.name}.part.json").write_text("{}")
+            raise ConnectionError("reset")
+        target.write_bytes(b"PACKAGE")
+
+    with patch("conda_vendor.conda_vendor.stream_download", side_effect=_stream_download), HttpClient(mirrors=mirrors) as client:
+        used = hedged_download("https://upstream/chan/linux-64/pkg-1.0-0.conda", dest, "0" * 64, client)
+
+    assert used == "https://mirror/chan/linux-64/pkg-1.0-0.conda"
+    assert [p.name for p in tmp_path.iterdir()] == [dest.name]
+
@@ -0,0 +1,69 @@
+import io
+import json
+import pytest
+
+from conda_vendor.repodata import (
+    COMPRESSION_FORMATS,
+    iter_repodata_entries,
+    open_compressed,
+    write_compressed_repodata,
+    zstd,
+)
+
+FAKE_REPODATA = {
+    # numbers skipped at the top level, cut at every chunk boundary by chunk_size=1
+    "scale": 1.5e3,
+    "offset": -2.25e-12,
+    "info": {"subdir": "linux-64"},
+    "packages": {
+        "file1.tar.bz2": {"id": 1, "depends": ["python >=3.8"]},
+        "badfile1.tar.bz2": {"id": 2, "size": 12345678901234},
+        "file2.tar.bz2": {"id": 3, "score": 0.125},
+    },
+    "packages.conda": {
+        "file3.conda": {"id": 5, "license": "BSD-3-Clause"},
+        "badfile3.conda": {"id": 6},
+    },
+    "removed": ["old.tar.bz2"],
+    "repodata_version": 1,
+}
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 4096])
+def test_iter_repodata_entries(chunk_size):
+    fp = io.StringIO(json.dumps(FAKE_REPODATA, indent=2))
+    entries = list(iter_repodata_entries(fp, chunk_size=chunk_size))
+    assert entries == [
+        ("packages", "file1.tar.bz2", {"id": 1, "depends": ["python >=3.8"]}),
+        ("packages", "badfile1.tar.bz2", {"id": 2, "size": 12345678901234}),
+        ("packages", "file2.tar.bz2", {"id": 3, "score": 0.125}),
+        ("packages.conda", "file3.conda", {"id": 5, "license": "BSD-3-Clause"}),
+        ("packages.conda", "badfile3.conda", {"id": 6}),
+    ]
+
+
+def test_iter_repodata_entries_stops_early():
+    content = json.dumps(FAKE_REPODATA)
+    # everything after the wanted entry is garbage that must never be read
+    truncated = content[:content.index('"badfile1.tar.bz2"')] + "NOT JSON"
+    entries = list(iter_repodata_entries(io.StringIO(truncated), {"file1.tar.bz2"}))
+    assert entries == [("packages", "file1.tar.bz2", {"id": 1, "depends": ["python >=3.8"]})]
+
+
+def test_iter_repodata_entries_empty_sections():
+    fp = io.StringIO('{"info": {}, "packages": {}, "packages.conda": {}}')
+    assert list(iter_repodata_entries(fp)) == []
+
+
+@pytest.mark.parametrize("fmt", COMPRESSION_FORMATS)
+def test_write_compressed_repodata_round_trip(fmt, tmp_path):
+    if fmt == "zst" and zstd is None:
+        pytest.skip("zstd support is not installed")
+    repodata_path = tmp_path / "repodata.json"
+    repodata_path.write_text(json.dumps(FAKE_REPODATA))
+
+    (compressed_path,) = write_compressed_repodata(repodata_path, [fmt])
+
+    assert compressed_path.name == f"repodata.json.{fmt}"
+    with compressed_path.open("rb") as fp, open_compressed(fp, f".{fmt}") as decompressed:
+        assert json.load(decompressed) == FAKE_REPODATA
@@ -0,0 +1,120 @@
+import threading
+
+from conda_vendor.scheduler import ConcurrencyController, DownloadScheduler
+
+
+def _pkg(fn, size, host="a.example.com"):
+    return {"fn": fn, "url": f"https://{host}/linux-64/{fn}", "size": size}
+
+
+def test_largest_first():
+    pkgs = [_pkg("small", 10), _pkg("unknown", None), _pkg("huge", 1000), _pkg("medium", 100)]
+    scheduler = DownloadScheduler(pkgs)
+
+    order = []
+    while (pkg := scheduler.next()) is not None:
+        order.append(pkg["fn"])
+        scheduler.done(pkg)
+
+    assert order == ["huge", "medium", "small", "unknown"]
+    assert scheduler.total_bytes == 1110
+
+
+def test_host_limit_skips_busy_host():
+    pkgs = [_pkg("a-big", 1000), _pkg("a-small", 10), _pkg("b-medium", 100, host="b.example.com")]
+    scheduler = DownloadScheduler(pkgs, host_limit=1)
+
+    first = scheduler.next()
+    # a.example.com is busy, so the smaller package from b goes next
+    second = scheduler.next()
+    assert (first["fn"], second["fn"]) == ("a-big", "b-medium")
+
+    # the last package waits until a.example.com has a free slot
+    taken = []
+    waiter = threading.Thread(target=lambda: taken.append(scheduler.next()))
+    waiter.start()
+    waiter.join(0.1)
+    assert taken == []
+    scheduler.done(first)
+    waiter.join(5)
+    assert taken[0]["fn"] == "a-small"
+    assert scheduler.next() is None
+
+
+def test_eta_from_throughput(monkeypatch):
+    clock = iter([0.0, 10.0])
+    monkeypatch.setattr("conda_vendor.scheduler.time.monotonic", lambda: next(clock))
+    scheduler = DownloadScheduler([_pkg("big", 300), _pkg("small", 100)])
+
+    big = scheduler.next()
+    scheduler.done(big)
+
+    # 300 bytes in 10 seconds leaves 100 bytes, about 3.3 seconds
+    assert round(scheduler.eta(), 1) == 3.3
+
+
+def test_eta_unknown_before_any_download():
+    assert DownloadScheduler([_pkg("pkg", 100)]).eta() is None
+
+
+def _latencies(samples):
+    return lambda start: samples[start:]
+
+
+def test_controller_additive_increase():
+    samples = []
+    controller = ConcurrencyController(4, latencies=_latencies(samples), initial=2)
+
+    for latency, limit in ((0.1, 2), (0.1, 3), (0.1, 3), (0.1, 3), (0.1, 4), (0.1, 4)):
+        samples.append(latency)
+        controller.observe()
+        assert controller.limit == limit
+    # packages from the cache do not count towards a window
+    controller.observe(network=False)
+    assert [d["limit"] for d in controller.decisions] == [3, 4]
+    assert controller.decisions[-1]["reason"] == "latency held"
+
+
+def test_controller_ignores_package_sizes():
+    # largest first scheduling makes throughput fall over a run, latency stays put
+    samples = []
+    controller = ConcurrencyController(6, latencies=_latencies(samples))
+    for _ in range(30):
+        samples.append(0.2)
+        controller.observe()
+    assert controller.limit == 6
+    assert controller.decisions == []
+
+
+def test_controller_multiplicative_decrease():
+    samples = []
+    errors = {}
+    controller = ConcurrencyController(8, errors=lambda: errors, latencies=_latencies(samples))
+    assert controller.limit == 8
+
+    errors["read_timeout"] = 2
+    controller.observe()
+    assert controller.limit == 4
+    assert controller.decisions[-1]["reason"] == "errors read_timeout=2"
+
+    # a window at 100ms sets the baseline, one at 500ms halves the limit
+    for latency in (0.1,) * 4 + (0.5,) * 5:
+        samples.append(latency)
+        controller.observe()
+    assert controller.limit == 2
+    assert controller.decisions[-1]["reason"] == "latency rose"
+
+
+def test_scheduler_follows_controller_limit():
+    controller = ConcurrencyController(4, initial=1)
+    scheduler = DownloadScheduler([_pkg("a", 100), _pkg("b", 10)], controller=controller)
+
+    first = scheduler.next()
+    taken = []
+    waiter = threading.Thread(target=lambda: taken.append(scheduler.next()))
+    waiter.start()
+    waiter.join(0.1)
+    assert taken == []
+    scheduler.done(first)
+    waiter.join(5)
+    assert taken[0]["fn"] == "b"
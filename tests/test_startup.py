@@ -0,0 +1,16 @@
+import os
+
+from benchmarks.bench_startup import imported_heavy_modules, measure_startup
+
+# seconds, generous enough for slow CI machines while still catching an
+# eagerly imported solver or HTTP stack (which costs well over a second)
+STARTUP_BUDGET = float(os.environ.get("CONDA_VENDOR_STARTUP_BUDGET", "0.8"))
+
+
+def test_help_does_not_import_heavy_modules():
+    assert imported_heavy_modules() == []
+
+
+def test_startup_within_budget():
+    assert measure_startup(["--help"], runs=3) < STARTUP_BUDGET
+    assert measure_startup(["--version"], runs=3) < STARTUP_BUDGET
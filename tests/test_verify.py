@@ -0,0 +1,56 @@
+import hashlib
+import json
+
+from click.testing import CliRunner
+
+from conda_vendor.conda_vendor import verify
+from conda_vendor.verify import hash_file, verify_channel
+
+
+def _channel(tmp_path):
+    packages = {"ok-1.conda": b"OK", "corrupt-1.tar.bz2": b"GOOD", "missing-1.conda": b"GONE", "resized-1.conda": b"SIZE"}
+    linux = tmp_path / "channel" / "linux-64"
+    linux.mkdir(parents=True)
+    repodata = {"packages": {}, "packages.conda": {}}
+    for fn, content in packages.items():
+        section = "packages" if fn.endswith(".tar.bz2") else "packages.conda"
+        repodata[section][fn] = {"sha256": hashlib.sha256(content).hexdigest(), "size": len(content)}
+    (linux / "repodata.json").write_text(json.dumps(repodata))
+    (linux / "ok-1.conda").write_bytes(b"OK")
+    (linux / "corrupt-1.tar.bz2").write_bytes(b"EVIL")
+    (linux / "resized-1.conda").write_bytes(b"RESIZED")
+    (linux / "extra-1.conda").write_bytes(b"EXTRA")
+    return linux.parent
+
+
+def test_hash_file(tmp_path):
+    (tmp_path / "empty").write_bytes(b"")
+    (tmp_path / "data").write_bytes(b"DATA" * 1000)
+
+    assert hash_file(tmp_path / "empty") == hashlib.sha256(b"").hexdigest()
+    assert hash_file(tmp_path / "data") == hashlib.sha256(b"DATA" * 1000).hexdigest()
+    assert hash_file(tmp_path / "missing") is None
+
+
+def test_verify_channel(tmp_path):
+    report = verify_channel(_channel(tmp_path), jobs=2)
+
+    assert report["verified"] == 1
+    assert report["expected"] == 4
+    assert report["missing"] == ["linux-64/missing-1.conda"]
+    assert report["corrupt"] == ["linux-64/corrupt-1.tar.bz2", "linux-64/resized-1.conda"]
+    assert report["extra"] == ["linux-64/extra-1.conda"]
+
+
+def test_verify_command_fails_on_corrupt_channel(tmp_path):
+    channel = _channel(tmp_path)
+    runner = CliRunner()
+
+    result = runner.invoke(verify, [str(channel), "--jobs", "1", "--output", "ndjson"])
+
+    assert result.exit_code == 1
+    # the runner echoes the sys.exit message to stdout, a real run prints it to stderr
+    records = [json.loads(line) for line in result.stdout.splitlines() if line.startswith("{")]
+    assert records[-1]["event"] == "verify_complete"
+    assert records[-1]["corrupt"] == 2
+    assert [r["path"] for r in records if r["event"] == "file_extra"] == ["linux-64/extra-1.conda"]